@@ -0,0 +1,206 @@
+# Imports every rogue of a guild and evaluates them all in one go.
+#
+# The roster comes from a single guild request. Characters are then fetched
+# concurrently (at most --requests in flight), the items and gems of all of
+# them are fetched in one batch through the item cache, so an item several
+# members wear is only requested once, and the profiles are evaluated on a
+# process pool through jsonbatch. A member that can't be imported or modeled
+# shows up in the report with the reason instead of stopping the run.
+#
+#     python guild_import.py us Doomhammer "Some Guild" -w 4
+#
+# --domain sends every request to a local stand-in server instead of
+# battle.net, e.g. a wowapi.fixtures server replaying a recorded guild, so
+# runs can be timed offline:
+#
+#     python -m wowapi.fixtures fixtures -u us.battle.net -p 8080
+#     python guild_import.py us Doomhammer "Some Guild" -d 127.0.0.1:8080
+import json
+import optparse
+import StringIO
+import sys
+import time
+
+import import_character
+from import_character import CharacterData
+from wowapi.api import WoWApi
+from wowapi.exceptions import APIError
+
+from shadowcraft.core import jsonbatch
+from shadowcraft.objects import proc_data
+
+rogue_class = 4
+
+buffs = [
+    'short_term_haste_buff',
+    'stat_multiplier_buff',
+    'crit_chance_buff',
+    'mastery_buff',
+    'melee_haste_buff',
+    'spell_haste_buff',
+    'attack_power_buff',
+    'armor_debuff',
+    'physical_vulnerability_debuff',
+    'spell_damage_debuff',
+    'agi_flask_mop',
+    'food_300_agi'
+]
+
+# The settings of the single character scripts for each spec.
+spec_settings = {
+    'assassination': {'type': 'assassination', 'cycle': {'min_envenom_size_non_execute': 4, 'min_envenom_size_execute': 5}},
+    'combat': {'type': 'combat', 'cycle': {'use_rupture': True, 'ksp_immediately': True, 'revealing_strike_pooling': True}},
+    'subtlety': {'type': 'subtlety', 'cycle': {'raid_crits_per_second': 5, 'use_hemorrhage': '24'}}
+}
+
+def get_rogues(region, realm, guild, min_level=90):
+    # (realm, name) of every rogue of the guild at min_level or above.
+    roster = import_character.wowapi.get_guild(region, realm, guild, ['members'])
+    rogues = []
+    for member in roster['data'][u'members']:
+        character = member[u'character']
+        if character[u'class'] == rogue_class and character[u'level'] >= min_level:
+            rogues.append((character.get(u'realm', realm), character[u'name']))
+    return sorted(rogues)
+
+def import_characters(region, members):
+    # CharacterData for every (realm, name) of members, or the APIError its
+    # request or the request of one of its items raised.
+    results = import_character.wowapi.get_characters(region, members, ['talents', 'items', 'stats'])
+    characters = {}
+    item_ids = []
+    for member in members:
+        if isinstance(results[member], APIError):
+            characters[member] = results[member]
+            continue
+        character_data = CharacterData(region, member[0], member[1])
+        character_data.raw_data = results[member]
+        characters[member] = character_data
+        item_ids.extend(character_data.get_item_ids())
+    failures = import_character.get_items_cached(region, item_ids)
+    for member, character_data in characters.items():
+        if isinstance(character_data, APIError):
+            continue
+        failed = sorted(set(character_data.get_item_ids()) & set(failures))
+        if failed:
+            characters[member] = failures[failed[0]]
+    return characters
+
+def get_spec(character_data):
+    spec = character_data.get_current_spec_data().get(u'spec', {})
+    return spec.get(u'name', u'').lower()
+
+def get_profile(character_data):
+    # The jsoninput profile of an imported character.
+    mh = character_data.get_mh()
+    oh = character_data.get_oh()
+    gear_buffs = character_data.get_gear_buffs() + ['leather_specialization', 'virmens_bite', 'virmens_bite_prepot']
+    gear_stats = character_data.get_gear_stats()
+    if character_data.has_chaotic_metagem():
+        gear_buffs.append('chaotic_metagem')
+    profile_stats = dict((stat, int(value)) for stat, value in gear_stats.iteritems())
+    profile_stats.update({
+        'mh': {'damage': mh[0], 'speed': mh[1], 'type': mh[2], 'enchant': mh[3]},
+        'oh': {'damage': oh[0], 'speed': oh[1], 'type': oh[2], 'enchant': oh[3]},
+        'procs': [proc for proc in character_data.get_procs() if proc in proc_data.allowed_procs],
+        'gear_buffs': gear_buffs
+    })
+    settings = dict(spec_settings[get_spec(character_data)])
+    settings.update({'response_time': .5, 'duration': 360, 'dmg_poison': 'dp', 'utl_poison': 'lp'})
+    return {
+        'id': character_data.name + '-' + character_data.realm,
+        'level': 90,
+        'race': character_data.get_race(),
+        'talents': character_data.get_talents(),
+        'glyphs': character_data.get_glyphs(),
+        'buffs': buffs,
+        'stats': profile_stats,
+        'settings': settings
+    }
+
+def evaluate_guild(region, realm, guild, kinds=('dps', 'ep'), workers=None, min_level=90):
+    # Returns the report: the guild and, for every rogue, its spec and
+    # results or the error that kept it out.
+    start = time.time()
+    members = get_rogues(region, realm, guild, min_level)
+    characters = import_characters(region, members)
+    import_time = time.time() - start
+
+    entries = {}
+    lines = []
+    for member in members:
+        character_data = characters[member]
+        entry = {'name': member[1], 'realm': member[0]}
+        entries[member[1] + '-' + member[0]] = entry
+        if isinstance(character_data, APIError):
+            entry['error'] = 'Import failed: ' + ' '.join(str(arg) for arg in character_data.args)
+            continue
+        try:
+            entry['spec'] = get_spec(character_data)
+            lines.append(json.dumps(get_profile(character_data)))
+        except (APIError, KeyError, IndexError, TypeError) as e:
+            entry['error'] = 'Unsupported gear or spec: ' + repr(e)
+
+    output = StringIO.StringIO()
+    jsonbatch.evaluate_stream(lines, output, kinds, workers)
+    for line in output.getvalue().splitlines():
+        record = json.loads(line)
+        entry = entries[record['id']]
+        if 'error' in record:
+            entry['error'] = record['error']
+        else:
+            entry.update(record['results'])
+    return {
+        'region': region,
+        'realm': realm,
+        'guild': guild,
+        'members': sorted(entries.values(), key=lambda entry: (-entry.get('dps', 0), entry['name'])),
+        'import_time': import_time,
+        'total_time': time.time() - start
+    }
+
+def format_report(report):
+    lines = ['%s <%s> (%s), %d rogues' % (report['guild'], report['realm'], report['region'], len(report['members']))]
+    width = max([len(entry['name']) for entry in report['members']] + [4])
+    for entry in report['members']:
+        if 'error' in entry:
+            lines.append('%s  %-13s  %s' % (entry['name'].ljust(width), entry.get('spec', ''), entry['error']))
+            continue
+        line = '%s  %-13s  %10.1f' % (entry['name'].ljust(width), entry['spec'], entry.get('dps', 0))
+        if 'ep' in entry:
+            ep = sorted(entry['ep'].iteritems(), key=lambda value: -value[1])
+            line += '  ' + ' '.join('%s %.2f' % value for value in ep if value[1])
+        lines.append(line)
+    lines.append('imported in %.2fs, done in %.2fs' % (report['import_time'], report['total_time']))
+    return '\n'.join(lines)
+
+def main(argv=None):
+    parser = optparse.OptionParser(usage='%prog [options] region realm guild')
+    parser.add_option('-k', '--kinds', default='dps,ep', help='comma separated results to compute (default dps,ep)')
+    parser.add_option('-w', '--workers', type='int', default=None, help='evaluate in a pool of this many processes')
+    parser.add_option('-r', '--requests', type='int', default=16, help='API requests in flight at once')
+    parser.add_option('-l', '--min-level', type='int', default=90, help='skip rogues below this level')
+    parser.add_option('-d', '--domain', default=None, help='host:port to send the requests of the region to')
+    parser.add_option('-j', '--json', action='store_true', default=False, help='print the report as JSON')
+    options, args = parser.parse_args(argv)
+    if len(args) != 3:
+        parser.error('region, realm and guild are required')
+    region, realm, guild = args
+
+    domains = None
+    if options.domain:
+        domains = {region: options.domain}
+    import_character.wowapi = WoWApi(workers=options.requests, domains=domains)
+    try:
+        report = evaluate_guild(region, realm, guild, options.kinds.split(','), options.workers, options.min_level)
+    finally:
+        import_character.wowapi.close()
+    if options.json:
+        print json.dumps(report, sort_keys=True, indent=4)
+    else:
+        print format_report(report)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
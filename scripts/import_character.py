@@ -4,14 +4,20 @@ from os import path
 from types import *
 import sys
 import pprint
-import shelve
+import atexit
+import datetime
+import json
 import math
+import sqlite3
+import threading
+import time
 
 sys.path.append(path.abspath(path.join(path.dirname(__file__), '..')))
 
 from wowapi.api import WoWApi
+from wowapi.exceptions import APIError, NotModified
 
-wowapi = WoWApi()
+wowapi = WoWApi(workers=16)
 pp = pprint.PrettyPrinter(indent=4)
 
 
@@ -22,6 +28,14 @@ class ItemDB:
     def get_item(self, id):
         return None
 
+    def get_items(self, ids):
+        items = {}
+        for id in ids:
+            item = self.get_item(id)
+            if item:
+                items[id] = item
+        return items
+
     def add_item(self, id, item):
         pass
 
@@ -30,31 +44,143 @@ class ItemDB:
 
 
 
-class SimpleItemDB(ItemDB):
-    def __init__(self, path):
+class SQLiteItemDB(ItemDB):
+    # Items as returned by wowapi.get_item, stored in SQLite. New items are
+    # buffered and written batch_size at a time (and on sync/close) in a
+    # single transaction. The file is in WAL mode so other processes can read
+    # it while one writes. Every item keeps its Last-Modified date and the
+    # time it was last fetched or revalidated, so stale entries can be checked
+    # with a conditional request instead of fetched again. The file is only
+    # opened on first use.
+    def __init__(self, path, batch_size=100, timeout=10.):
         self.path = path
-        self.db = shelve.open(path, writeback = True)
+        self.batch_size = batch_size
+        self.timeout = timeout
+        self.local = threading.local()
+        self.lock = threading.RLock()
+        self.pending = {}
+        self.created = False
+
+    def get_connection(self):
+        connection = getattr(self.local, 'connection', None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=self.timeout, isolation_level=None)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            self.local.connection = connection
+            self.lock.acquire()
+            try:
+                if not self.created:
+                    connection.execute('CREATE TABLE IF NOT EXISTS items (id INTEGER PRIMARY KEY, data TEXT, lastmodified TEXT, checked REAL)')
+                    connection.execute('CREATE INDEX IF NOT EXISTS items_checked ON items (checked)')
+                    self.created = True
+            finally:
+                self.lock.release()
+        return connection
 
     def get_item(self, id):
-        str_id = str(id)
-        if str_id in self.db:
-            return self.db[str_id]
-        else:
-            return None
+        return self.get_items([id]).get(id)
+
+    def get_items(self, ids):
+        ids = [int(id) for id in ids]
+        items = {}
+        self.lock.acquire()
+        try:
+            for id in ids:
+                if id in self.pending:
+                    items[id] = self.pending[id][0]
+        finally:
+            self.lock.release()
+        missing = [id for id in set(ids) if id not in items]
+        connection = self.get_connection()
+        # SQLite allows 999 parameters per statement.
+        for i in range(0, len(missing), 500):
+            chunk = missing[i:i + 500]
+            query = 'SELECT id, data, lastmodified FROM items WHERE id IN (%s)' % ','.join('?' * len(chunk))
+            for id, data, lastmodified in connection.execute(query, chunk):
+                items[id] = {'lastmodified': parse_lastmodified(lastmodified), 'data': json.loads(data)}
+        return items
+
+    def get_lastmodified(self, ids):
+        return dict((id, item['lastmodified']) for id, item in self.get_items(ids).iteritems())
+
+    def get_stale_ids(self, max_age):
+        # Ids of the items not fetched or revalidated in the last max_age
+        # seconds.
+        self.sync()
+        rows = self.get_connection().execute('SELECT id FROM items WHERE checked < ?', (time.time() - max_age,))
+        return [row[0] for row in rows]
 
     def add_item(self, id, item):
-        str_id = str(id)
-        self.db[str_id] = item
-        self.sync() # FIXME
+        self.add_items({id: item})
+
+    def add_items(self, items):
+        self.lock.acquire()
+        try:
+            for id, item in items.iteritems():
+                self.pending[int(id)] = (item, time.time())
+            if len(self.pending) >= self.batch_size:
+                self.sync()
+        finally:
+            self.lock.release()
+
+    def touch(self, ids):
+        # Marks items as revalidated (the server answered Not Modified).
+        if not ids:
+            return
+        self.sync()
+        connection = self.get_connection()
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            connection.executemany('UPDATE items SET checked = ? WHERE id = ?', [(time.time(), int(id)) for id in ids])
+            connection.execute('COMMIT')
+        except:
+            connection.execute('ROLLBACK')
+            raise
+
+    def sync(self):
+        self.lock.acquire()
+        try:
+            pending = self.pending
+            self.pending = {}
+        finally:
+            self.lock.release()
+        if not pending:
+            return
+        rows = []
+        for id, (item, checked) in pending.iteritems():
+            rows.append((id, json.dumps(item['data']), format_lastmodified(item.get('lastmodified')), checked))
+        connection = self.get_connection()
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            connection.executemany('INSERT OR REPLACE INTO items (id, data, lastmodified, checked) VALUES (?, ?, ?, ?)', rows)
+            connection.execute('COMMIT')
+        except:
+            connection.execute('ROLLBACK')
+            raise
 
     def close(self):
-        self.db.close()
+        self.sync()
+        connection = getattr(self.local, 'connection', None)
+        if connection is not None:
+            connection.close()
+            self.local.connection = None
 
-    def sync(self):
-        self.db.sync()
 
+LASTMODIFIED_FORMAT = '%Y-%m-%d %H:%M:%S'
 
-item_db = SimpleItemDB('item_db')
+def format_lastmodified(lastmodified):
+    if lastmodified is None:
+        return None
+    return lastmodified.strftime(LASTMODIFIED_FORMAT)
+
+def parse_lastmodified(lastmodified):
+    if lastmodified is None:
+        return None
+    return datetime.datetime.strptime(lastmodified, LASTMODIFIED_FORMAT)
+
+item_db = SQLiteItemDB('item_db.sqlite')
+atexit.register(item_db.close)
 
 
 def get_item_cached(region, id):
@@ -66,6 +192,31 @@ def get_item_cached(region, id):
         item_db.add_item(id, item)
         return item
 
+def get_items_cached(region, ids, max_age=None):
+    # Fetches every item of ids that isn't cached yet in one concurrent batch.
+    # With max_age, cached items older than that many seconds are revalidated
+    # in the same batch with If-Modified-Since. Every item that came back is
+    # stored; returns a dict of id to the APIError of the ones that didn't.
+    ids = set(int(id) for id in ids)
+    lastmodified = item_db.get_lastmodified(ids)
+    fetch = ids - set(lastmodified)
+    if max_age is not None:
+        fetch |= ids & set(item_db.get_stale_ids(max_age))
+    fetch = sorted(fetch)
+    items = wowapi.get_items(region, fetch, lastmodified)
+    not_modified = []
+    failures = {}
+    for id in fetch:
+        if isinstance(items[id], NotModified):
+            not_modified.append(id)
+        elif isinstance(items[id], APIError):
+            failures[id] = items[id]
+        else:
+            item_db.add_item(id, items[id])
+    item_db.touch(not_modified)
+    item_db.sync()
+    return failures
+
 class CharacterData:
     races = {1 : 'human',
              2 : 'orc',
@@ -246,6 +397,23 @@ class CharacterData:
 
     def do_import(self):
         self.raw_data = wowapi.get_character(self.region , self.realm, self.name, ['talents', 'items', 'stats'])
+        # An item that fails here is requested again, and raises, when the
+        # gear is read.
+        get_items_cached(self.region, self.get_item_ids())
+
+    def get_item_ids(self):
+        # The ids of every equipped item and gem.
+        ids = []
+        for slot, item_data in self.raw_data['data'][u'items'].iteritems():
+            if slot in ('averageItemLevelEquipped', 'averageItemLevel'):
+                continue
+            ids.append(item_data[u'id'])
+            params = item_data.get(u'tooltipParams', {})
+            for gemNumber in range(3):
+                gemId = 'gem' + str(gemNumber)
+                if gemId in params:
+                    ids.append(params[gemId])
+        return ids
 
     def get_race(self):
         return CharacterData.races[self.raw_data[u'data'][u'race']]
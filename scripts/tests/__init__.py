@@ -0,0 +1,153 @@
+from os import path
+import BaseHTTPServer
+import SocketServer
+import gzip
+import json
+import os
+import shutil
+import StringIO
+import tempfile
+import threading
+import unittest
+import urllib
+import sys
+sys.path.append(path.abspath(path.join(path.dirname(__file__), '..', '..')))
+sys.path.append(path.abspath(path.join(path.dirname(__file__), '..', 'wowapi')))
+
+import import_character
+from import_character import SQLiteItemDB
+from wowapi.api import WoWApi
+from wowapi.fixtures import FixtureServer
+from wowapi.utilities import http_datetime
+
+# A stand-in for the battle.net API serving one guild, Rogues <Doomhammer>:
+# Aa (combat), Bb (assassination), Dd (subtlety, which the model can't
+# evaluate yet), Ee (character not found) and a warrior. Items are served for
+# any id, except the ones in missing_items, which are not found. Record it
+# through a wowapi.fixtures.FixtureServer to replay it; ReplayTestCase points
+# import_character at such a server and a fresh item cache.
+#
+# Run the script tests from this directory's parent:
+#
+#     python -m unittest discover tests
+
+members = [('Aa', 4), ('Bb', 4), ('Cc', 1), ('Dd', 4), ('Ee', 4)]
+specs = {'Aa': 'Combat', 'Bb': 'Assassination', 'Dd': 'Subtlety'}
+slots = ['head', 'shoulder', 'chest', 'hands', 'legs', 'trinket1', 'trinket2', 'mainHand', 'offHand', 'neck']
+fist, dagger, meta_gem = 90001, 90002, 76884
+
+def get_character(name):
+    items = {'averageItemLevel': 500, 'averageItemLevelEquipped': 500}
+    for position, slot in enumerate(slots):
+        item_id = 1000 + position
+        tooltip_params = {}
+        if slot in ('mainHand', 'offHand'):
+            item_id = [fist, dagger][name != 'Aa']
+            tooltip_params = {'enchant': 4444}
+        if slot == 'head':
+            tooltip_params = {'gem0': meta_gem}
+        items[slot] = {'id': item_id, 'name': 'Item %d' % item_id, 'tooltipParams': tooltip_params}
+    talents = [{'tier': tier, 'column': int(column) - 1} for tier, column in enumerate('322213')]
+    return {
+        'name': name, 'race': 24, 'class': 4, 'level': 90,
+        'stats': {'agi': 20000, 'str': 80, 'attackPower': 40000, 'critRating': 3000, 'hitRating': 2550, 'expertiseRating': 2550, 'hasteRating': 10000, 'masteryRating': 6000},
+        'talents': [
+            {'selected': True, 'spec': {'name': specs[name]}, 'talents': talents, 'glyphs': {'major': [{'name': 'Glyph of Recuperate'}], 'minor': []}},
+            {'talents': [], 'glyphs': {'major': [], 'minor': []}}
+        ],
+        'items': items
+    }
+
+def get_item(item_id):
+    if item_id == meta_gem:
+        return {'id': item_id, 'name': 'Meta', 'gemInfo': {'type': {'type': 'META'}, 'bonus': {'name': '+216 Agility and 3% Increased Critical Effect'}}}
+    item = {'id': item_id, 'name': 'Item %d' % item_id, 'itemSubClass': 13, 'bonusStats': [{'stat': 3, 'amount': 500}, {'stat': 36, 'amount': 300}]}
+    if item_id == fist:
+        item['weaponInfo'] = {'damage': {'min': 9000, 'max': 12000}, 'weaponSpeed': 2.6}
+    elif item_id == dagger:
+        item['weaponInfo'] = {'damage': {'min': 6000, 'max': 9000}, 'weaponSpeed': 1.8}
+        item['itemSubClass'] = 15
+    return item
+
+class GuildHandler(BaseHTTPServer.BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        self.server.paths.append(self.path)
+        parts = urllib.unquote(self.path.split('?')[0]).split('/')
+        if parts[3] == 'guild':
+            roster = [{'character': {'name': name, 'class': character_class, 'level': 90, 'realm': parts[4]}, 'rank': 1} for name, character_class in members]
+            return self.send(200, {'name': parts[5], 'members': roster})
+        if parts[3] == 'character' and parts[5] in specs:
+            return self.send(200, get_character(parts[5]))
+        if parts[3] == 'item' and int(parts[4]) not in self.server.missing_items:
+            return self.send(200, get_item(int(parts[4])))
+        self.send(404, {'status': 'nok', 'reason': 'Not found'})
+
+    def send(self, code, data):
+        buffer = StringIO.StringIO()
+        gzipped = gzip.GzipFile(fileobj=buffer, mode='wb')
+        gzipped.write(json.dumps(data))
+        gzipped.close()
+        body = buffer.getvalue()
+        self.send_response(code)
+        self.send_header('Content-Encoding', 'gzip')
+        self.send_header('Content-Length', str(len(body)))
+        self.send_header('Last-Modified', self.server.last_modified)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+class GuildServer(SocketServer.ThreadingMixIn, BaseHTTPServer.HTTPServer):
+    daemon_threads = True
+
+    def __init__(self):
+        BaseHTTPServer.HTTPServer.__init__(self, ('127.0.0.1', 0), GuildHandler)
+        self.paths = []
+        self.missing_items = set()
+        self.last_modified = http_datetime()
+
+    @property
+    def domain(self):
+        return '127.0.0.1:%d' % self.server_address[1]
+
+    def start(self):
+        thread = threading.Thread(target=self.serve_forever)
+        thread.daemon = True
+        thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+class ReplayTestCase(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.fixtures = os.path.join(self.directory, 'fixtures')
+        self.upstream = GuildServer().start()
+        self.server = None
+        self.saved = import_character.wowapi, import_character.item_db
+        import_character.item_db = SQLiteItemDB(os.path.join(self.directory, 'items.sqlite'))
+        self.replay(self.upstream.domain)
+
+    def replay(self, upstream=None):
+        # Restarts the API with a fresh item cache; without upstream only
+        # what was recorded so far is served.
+        if self.server is not None:
+            import_character.wowapi.close()
+            self.server.stop()
+            import_character.item_db.close()
+            import_character.item_db = SQLiteItemDB(os.path.join(self.directory, 'items-%d.sqlite' % len(os.listdir(self.directory))))
+        self.server = FixtureServer(self.fixtures, upstream=upstream).start()
+        import_character.wowapi = WoWApi(backoff=.01, domains={'us': self.server.domain})
+
+    def tearDown(self):
+        import_character.wowapi.close()
+        import_character.item_db.close()
+        import_character.wowapi, import_character.item_db = self.saved
+        self.server.stop()
+        self.upstream.stop()
+        shutil.rmtree(self.directory)
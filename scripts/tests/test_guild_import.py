@@ -0,0 +1,40 @@
+from tests import ReplayTestCase
+
+import guild_import
+
+class TestGuildImport(ReplayTestCase):
+    def get_members(self, report):
+        return dict((entry['name'], entry) for entry in report['members'])
+
+    def test_evaluate_guild(self):
+        recorded = guild_import.evaluate_guild('us', 'Doomhammer', 'Rogues')
+        self.assertEqual(['Aa', 'Bb', 'Dd', 'Ee'], sorted(self.get_members(recorded)))
+        # Replayed offline, with nothing cached, it comes out the same.
+        paths = len(self.upstream.paths)
+        self.replay()
+        report = guild_import.evaluate_guild('us', 'Doomhammer', 'Rogues', workers=2)
+        self.assertEqual(paths, len(self.upstream.paths))
+        members = self.get_members(report)
+        recorded_members = self.get_members(recorded)
+        # Ee's error names the server it came from.
+        for name in ('Aa', 'Bb', 'Dd'):
+            self.assertEqual(recorded_members[name], members[name])
+        self.assertEqual('combat', members['Aa']['spec'])
+        self.assertEqual('assassination', members['Bb']['spec'])
+        for name in ('Aa', 'Bb'):
+            self.assertTrue(members[name]['dps'] > 0)
+            self.assertTrue(members[name]['ep']['agi'] > 0)
+        # The subtlety model fails on Dd, which the report shows without
+        # losing the others.
+        self.assertEqual('subtlety', members['Dd']['spec'])
+        self.assertTrue('error' in members['Dd'])
+        self.assertTrue(members['Ee']['error'].startswith('Import failed'))
+        self.assertTrue('Aa' in guild_import.format_report(report))
+
+    def test_missing_item(self):
+        self.upstream.missing_items.add(90001)
+        members = self.get_members(guild_import.evaluate_guild('us', 'Doomhammer', 'Rogues', kinds=('dps',)))
+        # Only Aa wields the fist weapon.
+        self.assertTrue(members['Aa']['error'].startswith('Import failed'))
+        self.assertTrue('90001' in members['Aa']['error'])
+        self.assertTrue(members['Bb']['dps'] > 0)
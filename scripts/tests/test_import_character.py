@@ -0,0 +1,95 @@
+import datetime
+import os
+import shutil
+import sqlite3
+import tempfile
+import time
+import unittest
+from tests import ReplayTestCase, get_item
+
+import import_character
+from import_character import SQLiteItemDB
+from wowapi.exceptions import NotFound
+
+class TestSQLiteItemDB(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'items.sqlite')
+        self.item_db = SQLiteItemDB(self.path, batch_size=3)
+
+    def tearDown(self):
+        self.item_db.close()
+        shutil.rmtree(self.directory)
+
+    def get_item(self, id):
+        return {'lastmodified': datetime.datetime(2013, 9, 10, 12, 30), 'data': get_item(id)}
+
+    def count_rows(self):
+        connection = sqlite3.connect(self.path)
+        try:
+            return connection.execute('SELECT COUNT(*) FROM items').fetchone()[0]
+        finally:
+            connection.close()
+
+    def test_lazy_open(self):
+        self.assertFalse(os.path.exists(self.path))
+        self.assertEqual({}, self.item_db.get_items([1]))
+        self.assertTrue(os.path.exists(self.path))
+
+    def test_batched_commit(self):
+        self.assertEqual({}, self.item_db.get_items([1]))
+        self.item_db.add_items({1: self.get_item(1), 2: self.get_item(2)})
+        self.assertEqual(0, self.count_rows())
+        self.assertEqual(self.get_item(2), self.item_db.get_item(2))
+        self.item_db.add_item(3, self.get_item(3))
+        self.assertEqual(3, self.count_rows())
+        self.item_db.add_item(4, self.get_item(4))
+        self.item_db.sync()
+        self.assertEqual(4, self.count_rows())
+        self.assertEqual(self.get_item(4), SQLiteItemDB(self.path).get_item(4))
+
+    def test_get_items(self):
+        ids = range(1, 1201)
+        self.item_db.batch_size = 2000
+        self.item_db.add_items(dict((id, self.get_item(id)) for id in ids))
+        self.item_db.sync()
+        items = self.item_db.get_items(ids + [5000])
+        self.assertEqual(ids, sorted(items))
+        self.assertEqual(self.get_item(1200), items[1200])
+        self.assertEqual(dict((id, self.get_item(id)['lastmodified']) for id in ids), self.item_db.get_lastmodified(ids))
+
+    def test_touch(self):
+        self.item_db.add_items({1: self.get_item(1), 2: self.get_item(2)})
+        self.assertEqual([], self.item_db.get_stale_ids(60))
+        time.sleep(.05)
+        self.assertEqual([1, 2], sorted(self.item_db.get_stale_ids(.05)))
+        self.item_db.touch([2])
+        self.assertEqual([1], self.item_db.get_stale_ids(.05))
+
+class TestItemsCached(ReplayTestCase):
+    def test_failures(self):
+        self.upstream.missing_items.add(1002)
+        failures = import_character.get_items_cached('us', range(1000, 1006))
+        self.assertEqual([1002], failures.keys())
+        self.assertTrue(isinstance(failures[1002], NotFound))
+        # Everything else got stored.
+        items = import_character.item_db.get_items(range(1000, 1006))
+        self.assertEqual([1000, 1001, 1003, 1004, 1005], sorted(items))
+        self.assertEqual(get_item(1005), items[1005]['data'])
+        # Only the missing one is requested again.
+        requests = self.server.counters['requests']
+        self.assertEqual([1002], import_character.get_items_cached('us', range(1000, 1006)).keys())
+        self.assertEqual(requests + 1, self.server.counters['requests'])
+
+    def test_stale_revalidation(self):
+        self.assertEqual({}, import_character.get_items_cached('us', [1000, 1001]))
+        requests = self.server.counters['requests']
+        self.assertEqual({}, import_character.get_items_cached('us', [1000, 1001], max_age=60))
+        self.assertEqual(requests, self.server.counters['requests'])
+        time.sleep(.05)
+        self.assertEqual([1000, 1001], sorted(import_character.item_db.get_stale_ids(.05)))
+        # Both come back Not Modified and count as checked again.
+        self.assertEqual({}, import_character.get_items_cached('us', [1000, 1001], max_age=.05))
+        self.assertEqual(requests + 2, self.server.counters['requests'])
+        self.assertEqual([], import_character.item_db.get_stale_ids(.05))
+        self.assertEqual(get_item(1000), import_character.item_db.get_item(1000)['data'])
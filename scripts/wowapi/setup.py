@@ -1,7 +1,7 @@
 from distutils.core import setup
 
 setup(name='wowapi',
-     version='0.3.0',
+     version='0.4.0',
      description='Python module to access the WoW Api',
      author='Dorwido',
      author_email='darkz@gmx.de',
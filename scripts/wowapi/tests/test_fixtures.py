@@ -0,0 +1,84 @@
+# -*- coding: utf-8 -*-
+import datetime
+import shutil
+import tempfile
+import threading
+import time
+from wowapi.api import WoWApi
+from wowapi.exceptions import NotModified,NotFound
+from wowapi.fixtures import FixtureServer
+from .test_pool import Server,Handler
+
+try:
+    import unittest2 as unittest
+except ImportError:
+    import unittest as unittest
+
+class Test_Fixtures(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.upstream = Server(('127.0.0.1',0),Handler)
+        self.upstream.connections = 0
+        self.upstream.paths = []
+        self.upstream.failures = {}
+        self.upstream.resets = {}
+        self.upstream.latency = 0
+        thread = threading.Thread(target=self.upstream.serve_forever)
+        thread.daemon = True
+        thread.start()
+        self.servers = []
+
+    def tearDown(self):
+        for server in self.servers:
+            server.stop()
+        self.upstream.shutdown()
+        self.upstream.server_close()
+        shutil.rmtree(self.directory)
+
+    def start(self,**options):
+        server = FixtureServer(self.directory,**options).start()
+        self.servers.append(server)
+        wowapi = WoWApi(backoff=0.01,workers=8,domains={'eu':server.domain})
+        self.addCleanup(wowapi.close)
+        return server,wowapi
+
+    def record(self):
+        server,wowapi = self.start(upstream='127.0.0.1:%d' % self.upstream.server_address[1])
+        items = wowapi.get_items('eu',[1,2,3,404])
+        self.assertEqual(server.counters['recorded'],4)
+        self.assertEqual(wowapi.get_item('eu',1),items[1])
+        self.assertEqual(server.counters['recorded'],4)
+        return items
+
+    def test_replay(self):
+        recorded = self.record()
+        self.upstream.paths = []
+        server,wowapi = self.start()
+        self.assertEqual(wowapi.get_item('eu',2),recorded[2])
+        self.assertRaises(NotFound,wowapi.get_item,'eu',404)
+        self.assertEqual(self.upstream.paths,[])
+        self.assertEqual(sorted(server.store.paths()),['/api/wow/item/%d' % itemid for itemid in (1,2,3,404)])
+
+    def test_not_modified(self):
+        recorded = self.record()
+        server,wowapi = self.start()
+        self.assertRaises(NotModified,wowapi.get_item,'eu',1,recorded[1]['lastmodified'])
+        earlier = recorded[1]['lastmodified']-datetime.timedelta(days=1)
+        self.assertEqual(wowapi.get_item('eu',1,earlier)['data'],recorded[1]['data'])
+
+    def test_missing(self):
+        server,wowapi = self.start()
+        self.assertRaises(NotFound,wowapi.get_item,'eu',5)
+        self.assertEqual(server.counters['requests'],1)
+        self.assertTrue(isinstance(wowapi.get_items('eu',[5])[5],NotFound))
+
+    def test_latency(self):
+        self.record()
+        server,wowapi = self.start(latency=0.05,max_concurrency=2)
+        start = time.time()
+        wowapi.get_items('eu',[1,2,3,404])
+        elapsed = time.time()-start
+        self.assertGreaterEqual(elapsed,0.1)
+        self.assertLess(elapsed,0.2)
+        self.assertEqual(server.counters['max_in_flight'],2)
@@ -0,0 +1,167 @@
+# -*- coding: utf-8 -*-
+import BaseHTTPServer
+import SocketServer
+import datetime
+import gzip
+import errno
+import httplib
+import json
+import socket
+import StringIO
+import threading
+import time
+from wowapi.api import WoWApi
+from wowapi.exceptions import APIError,NotModified,NotFound
+from wowapi.utilities import http_datetime
+
+try:
+    import unittest2 as unittest
+except ImportError:
+    import unittest as unittest
+
+class Handler(BaseHTTPServer.BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def setup(self):
+        BaseHTTPServer.BaseHTTPRequestHandler.setup(self)
+        self.server.connections += 1
+
+    def do_GET(self):
+        self.server.paths.append(self.path)
+        if self.path.startswith('/api/wow/item/'):
+            itemid = int(self.path.split('/')[-1].split('?')[0])
+            if itemid in self.server.resets and self.server.resets[itemid] > 0:
+                # Drop the connection without an answer
+                self.server.resets[itemid] -= 1
+                self.close_connection = 1
+                return
+            if itemid == 301:
+                return self.redirect('/api/wow/item/3')
+            if itemid == 302:
+                return self.redirect(self.path)
+            if itemid in self.server.failures and self.server.failures[itemid] > 0:
+                self.server.failures[itemid] -= 1
+                return self.send(503,{'status':'nok','reason':'Busy'})
+            if itemid == 404:
+                return self.send(404,{'status':'nok','reason':'Unable to get item information.'})
+            if 'If-Modified-Since' in self.headers:
+                return self.send(304,None)
+            time.sleep(self.server.latency)
+            return self.send(200,{'id':itemid,'name':'Item %d' % itemid})
+        self.send(400,{'status':'nok','reason':'Bad request'})
+
+    def redirect(self,location):
+        self.send_response(301)
+        self.send_header('Location',location)
+        self.send_header('Content-Length','0')
+        self.end_headers()
+
+    def send(self,code,data):
+        body = ''
+        if data is not None:
+            buffer = StringIO.StringIO()
+            gzipped = gzip.GzipFile(fileobj=buffer,mode='wb')
+            gzipped.write(json.dumps(data))
+            gzipped.close()
+            body = buffer.getvalue()
+        self.send_response(code)
+        if body:
+            self.send_header('Content-Encoding','gzip')
+        self.send_header('Content-Length',str(len(body)))
+        self.send_header('Last-Modified',http_datetime())
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self,*args):
+        pass
+
+class Server(SocketServer.ThreadingMixIn,BaseHTTPServer.HTTPServer):
+    daemon_threads = True
+
+class Test_Pool(unittest.TestCase):
+
+    def setUp(self):
+        self.server = Server(('127.0.0.1',0),Handler)
+        self.server.connections = 0
+        self.server.paths = []
+        self.server.failures = {}
+        self.server.resets = {}
+        self.server.latency = 0
+        thread = threading.Thread(target=self.server.serve_forever)
+        thread.daemon = True
+        thread.start()
+        self.wowapi = WoWApi(backoff=0.01,workers=4,domains={'eu':'127.0.0.1:%d' % self.server.server_address[1]})
+
+    def tearDown(self):
+        self.wowapi.close()
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_keep_alive(self):
+        for itemid in range(1,6):
+            self.assertEqual(self.wowapi.get_item('eu',itemid)['data']['name'],'Item %d' % itemid)
+        self.assertEqual(self.server.connections,1)
+        self.assertEqual(self.wowapi.pool.created,1)
+
+    def test_get_items(self):
+        self.server.latency = 0.1
+        start = time.time()
+        items = self.wowapi.get_items('eu',range(1,9))
+        self.assertLess(time.time()-start,0.6)
+        self.assertEqual(sorted(items),range(1,9))
+        self.assertEqual(items[3]['data']['id'],3)
+        self.assertLessEqual(self.server.connections,4)
+        self.wowapi.get_items('eu',range(9,17))
+        self.assertLessEqual(self.server.connections,4)
+
+    def test_errors(self):
+        items = self.wowapi.get_items('eu',[1,404],{1:datetime.datetime.utcnow()})
+        self.assertTrue(isinstance(items[1],NotModified))
+        self.assertTrue(isinstance(items[404],NotFound))
+        self.assertRaises(NotFound,self.wowapi.get_item,'eu',404)
+        self.assertEqual(self.wowapi.get_item('eu',2)['lastmodified'].year,datetime.datetime.utcnow().year)
+
+    def test_retry(self):
+        self.server.failures[7] = 2
+        self.assertEqual(self.wowapi.get_item('eu',7)['data']['id'],7)
+        self.assertEqual(self.server.paths.count('/api/wow/item/7'),3)
+        self.server.failures[8] = 4
+        try:
+            self.wowapi.get_item('eu',8)
+        except APIError, e:
+            self.assertEqual(e.args[:2],(503,'Busy'))
+        else:
+            self.fail('No APIError')
+        self.assertEqual(self.server.paths.count('/api/wow/item/8'),4)
+
+    def test_reset(self):
+        self.server.resets[9] = 1
+        self.assertEqual(self.wowapi.get_item('eu',9)['data']['id'],9)
+        self.assertEqual(self.server.paths.count('/api/wow/item/9'),2)
+
+    def test_no_retry(self):
+        # Nothing listens on a port just given back, so the connection is refused
+        unused = socket.socket()
+        unused.bind(('127.0.0.1',0))
+        port = unused.getsockname()[1]
+        unused.close()
+        wowapi = WoWApi(backoff=10,domains={'eu':'127.0.0.1:%d' % port})
+        start = time.time()
+        self.assertRaises(APIError,wowapi.get_item,'eu',1)
+        self.assertLess(time.time()-start,5)
+        wowapi.close()
+        self.assertFalse(wowapi._is_reset(socket.gaierror(socket.EAI_NONAME,'Name or service not known')))
+        self.assertFalse(wowapi._is_reset(socket.timeout('timed out')))
+        self.assertTrue(wowapi._is_reset(socket.error(errno.ECONNRESET,'Connection reset by peer')))
+        self.assertTrue(wowapi._is_reset(httplib.BadStatusLine("''")))
+
+    def test_redirect(self):
+        self.assertEqual(self.wowapi.get_item('eu',301)['data']['id'],3)
+        self.assertEqual(self.server.paths[-2:],['/api/wow/item/301','/api/wow/item/3'])
+        try:
+            self.wowapi.get_item('eu',302)
+        except APIError, e:
+            self.assertEqual(e.args[:2],(301,'Too many redirects'))
+        else:
+            self.fail('No APIError')
+        self.assertEqual(self.server.paths.count('/api/wow/item/302'),self.wowapi.max_redirects+1)
@@ -1,5 +1,9 @@
-from urllib2 import Request, urlopen, URLError,quote
+from urllib2 import quote
+from urlparse import urljoin
+import errno
 import gzip
+import httplib
+import socket
 import StringIO
 try:
     import simplejson as json
@@ -9,7 +13,11 @@ import datetime
 import base64
 import hmac
 import hashlib
+import threading
+import time
+from multiprocessing.pool import ThreadPool
 from .exceptions import APIError,NotModified,NotFound
+from .pool import ConnectionPool
 from .utilities import parse_http_datetime,http_datetime
 
 regions = {
@@ -106,9 +114,18 @@ datatypes = {
 }
 
 class WoWApi():
-    
-
-    def __init__(self,privatekey=None,publickey=None,ssl=None):
+    """
+    Requests go through a pool of persistent connections per region domain. Server
+    errors (5xx) and connections reset by the server are retried up to retries times,
+    waiting backoff seconds and doubling it each time; any other failure to connect
+    (unknown host, refused, timed out) raises right away. Redirects (301, 302, 303,
+    307) are followed up to max_redirects times. workers is the number of requests
+    batch calls like :meth:`get_items` keep in flight at once. domains maps a region
+    to the host:port to talk to instead of its battle.net domain, e.g. a local
+    stand-in server
+    """
+
+    def __init__(self,privatekey=None,publickey=None,ssl=None,timeout=10,retries=3,backoff=0.5,workers=8,domains=None,max_redirects=5):
         self.privkey = privatekey
         self.pubkey = publickey
         if ssl is None:
@@ -118,10 +135,31 @@ class WoWApi():
                 self.ssl = False
         else:
             self.ssl = ssl
-        
-
+        self.retries = retries
+        self.backoff = backoff
+        self.max_redirects = max_redirects
+        self.workers = workers
+        self.domains = domains or {}
+        self.pool = ConnectionPool(timeout,max(workers,1))
+        self.threads = None
+        self.lock = threading.Lock()
 
+    def close(self):
+        """
+        .. versionadded:: 0.4.0
 
+        Closes the pooled connections and stops the batch threads
+        """
+        self.lock.acquire()
+        try:
+            threads = self.threads
+            self.threads = None
+        finally:
+            self.lock.release()
+        if threads is not None:
+            threads.close()
+            threads.join()
+        self.pool.close()
 
     def _decode_response(self,response):
         
@@ -129,30 +167,84 @@ class WoWApi():
  	        response = gzip.GzipFile(fileobj=StringIO.StringIO(response.read()))
         try:
             data = json.loads(unicode(response.read(),'UTF-8'))
-        except json.JSONDecodeError:
+        except ValueError:
             raise APIError('Non-JSON Response')
         return data
 
+    def _error_reason(self,response):
+        try:
+            return self._decode_response(response).get('reason')
+        except (APIError,AttributeError,IOError):
+            return None
+
+    def _is_reset(self,error):
+        # A connection the server dropped; worth another try, unlike a host that
+        # doesn't resolve or doesn't answer
+        if isinstance(error,(httplib.BadStatusLine,httplib.IncompleteRead)):
+            return True
+        if isinstance(error,socket.error) and not isinstance(error,(socket.gaierror,socket.herror,socket.timeout)):
+            return error.errno in (errno.ECONNRESET,errno.ECONNABORTED,errno.EPIPE)
+        return False
+
+    def _do_request(self,url,header):
+        attempt = 0
+        redirects = 0
+        while True:
+            scheme,address = url.split('://',1)
+            if '/' in address:
+                host,path = address.split('/',1)
+                path = '/'+path
+            else:
+                host,path = address,'/'
+            try:
+                response = self.pool.request(scheme,host,path,header)
+            except (httplib.HTTPException,IOError), e:
+                error = APIError(str(e) or e.__class__.__name__,url)
+                if not self._is_reset(e):
+                    raise error
+            else:
+                if response.status < 300:
+                    return response
+                elif response.status == 304:
+                    raise NotModified(url)
+                elif response.status in (301,302,303,307) and response.info().get('location'):
+                    if redirects >= self.max_redirects:
+                        raise APIError(response.status,'Too many redirects',url)
+                    url = urljoin(url,response.info()['location'])
+                    redirects += 1
+                    continue
+                elif response.status == 404:
+                    raise NotFound(url)
+                elif response.status < 500:
+                    raise APIError(response.status,self._error_reason(response),url)
+                error = APIError(response.status,self._error_reason(response),url)
+            if attempt >= self.retries:
+                raise error
+            time.sleep(self.backoff*2**attempt)
+            attempt += 1
+
+    def _call(self,args):
+        function,args = args
+        try:
+            return function(*args)
+        except APIError, e:
+            return e
 
-    def _do_request(self,request):
+    def _map(self,function,calls):
+        """
+        Runs function for every argument tuple of calls, workers at a time. The API
+        errors of a call come back in place of its result
+        """
+        if self.workers <= 1 or len(calls) <= 1:
+            return [self._call((function,args)) for args in calls]
+        self.lock.acquire()
         try:
-            response = urlopen(request)
-        except URLError, e:
-            if hasattr(e, 'reason'):
-                raise APIError(e.reason,request.get_full_url())
-            elif hasattr(e, 'code'):
-                if e.code == 304:
-                    raise NotModified(request.get_full_url())
-                elif e.code == 404:
-                    raise NotFound(request.get_full_url())
-                else:
-                    error_response = self._decode_response(e)
-                    if error_response['reason']:
-                        raise APIError(e.code,error_response['reason'],request.get_full_url())
-                    else:
-                        raise APIError(e.code,None,request.get_full_url())
-        else:
-            return response
+            if self.threads is None:
+                self.threads = ThreadPool(self.workers)
+            threads = self.threads
+        finally:
+            self.lock.release()
+        return threads.map(self._call,[(function,args) for args in calls],1)
 
     def _sign_request(self,path,date):
         stringtosign = "GET\n"+date+"\n"+path+"\n"
@@ -181,7 +273,7 @@ class WoWApi():
         else:
             url = 'http://'
 
-        url += regions[region]['domain']+'/api/wow/'+data
+        url += self.domains.get(region,regions[region]['domain'])+'/api/wow/'+data
         header = {
             'Accept-Encoding': 'gzip',
             'Date' : httpdate
@@ -193,9 +285,7 @@ class WoWApi():
         if lastmodified:
             header['If-Modified-Since'] = http_datetime(lastmodified)
 
-        request = Request(url, None, header)
-
-        response = self._do_request(request)
+        response = self._do_request(url,header)
 
         rlastmodified = None
         if 'Last-Modified' in response.info():
@@ -216,6 +306,29 @@ class WoWApi():
             raise ValueError('Itemid must be a integer')
         return self._get_data(region,datatypes['item']['path'] % (itemid),None,lastmodified,lang)
 
+    def get_items(self,region,itemids,lastmodified=None,lang=None):
+        """
+        .. versionadded:: 0.4.0
+
+        Get infos about many items at once, keeping up to workers requests in flight.
+        Returns a dict of itemid to the result get_item would return, or to the
+        :class:`APIError` (e.g. :class:`NotModified`, :class:`NotFound`) it would raise.
+        lastmodified is either a date for every item or a dict of itemid to date
+
+        | ``Example:``
+        ::
+
+            get_items('eu',[25,35,36])
+        """
+        itemids = list(itemids)
+        calls = []
+        for itemid in itemids:
+            if isinstance(lastmodified,dict):
+                calls.append((region,itemid,lastmodified.get(itemid),lang))
+            else:
+                calls.append((region,itemid,lastmodified,lang))
+        return dict(zip(itemids,self._map(self.get_item,calls)))
+
 
     def get_character(self,region,realm,character,params=None,lastmodified=None,lang=None):
         """
@@ -228,6 +341,23 @@ class WoWApi():
         """
         return self._get_data(region,datatypes['character']['path'] % (quote(realm),quote(character)),params,lastmodified,lang,'character')
 
+    def get_characters(self,region,characters,params=None,lang=None):
+        """
+        .. versionadded:: 0.4.0
+
+        Get infos about many characters at once, keeping up to workers requests in
+        flight. characters is a list of (realm,character); returns a dict of those to
+        the result get_character would return, or to the :class:`APIError` it would raise
+
+        | ``Example:``
+        ::
+
+            get_characters('eu',[('Doomhammer','Thetotemlord')],['items'])
+        """
+        characters = list(characters)
+        calls = [(region,realm,character,params,None,lang) for realm,character in characters]
+        return dict(zip(characters,self._map(self.get_character,calls)))
+
     def get_guild(self,region,realm,guild,params=None,lastmodified=None,lang=None):
         """
         Get infos about an guild, params is a array taking optional fields to look up infos like achievements,members etc
@@ -260,9 +390,9 @@ class WoWApi():
             get_auction('eu','Doomhammer')
         """
         data = self._get_data(region,datatypes['auction']['path'] % (quote(realm)),None,lastmodified,lang)
-        request = Request(data['data']['files'][0]['url'], None, {'Accept-Encoding': 'gzip'})
+        response = self._do_request(data['data']['files'][0]['url'],{'Accept-Encoding': 'gzip'})
 
-        return {'lastmodified': data['lastmodified'],'data':self._decode_response(self._do_request(request))}
+        return {'lastmodified': data['lastmodified'],'data':self._decode_response(response)}
 
     def get_arena_team(self,region,realm,teamsize,teamname,lastmodified=None,lang=None):
         """
@@ -0,0 +1,247 @@
+import BaseHTTPServer
+import SocketServer
+import base64
+import hashlib
+import json
+import optparse
+import os
+import sys
+import tempfile
+import threading
+import time
+from .pool import ConnectionPool
+from .utilities import parse_http_datetime
+
+# Headers of the recorded responses that are replayed
+recorded_headers = ('content-type','content-encoding','last-modified')
+
+
+class FixtureStore(object):
+    """
+    .. versionadded:: 0.4.0
+
+    Recorded responses on disk, one JSON file per request path (query included)
+    holding the status, the headers and the raw, still gzipped, body
+    """
+
+    def __init__(self,directory):
+        self.directory = directory
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+
+    def _filename(self,path):
+        return os.path.join(self.directory,hashlib.sha1(path).hexdigest()+'.json')
+
+    def get(self,path):
+        """
+        Returns (status,headers,body) as recorded for path, None if it never was
+        """
+        try:
+            fixture = open(self._filename(path))
+        except IOError:
+            return None
+        try:
+            data = json.load(fixture)
+        finally:
+            fixture.close()
+        return data['status'],dict((str(k),str(v)) for k,v in data['headers'].iteritems()),base64.b64decode(data['body'])
+
+    def put(self,path,status,headers,body):
+        data = {'path':path,'status':status,'headers':headers,'body':base64.b64encode(body)}
+        descriptor,temporary = tempfile.mkstemp(dir=self.directory)
+        fixture = os.fdopen(descriptor,'w')
+        try:
+            json.dump(data,fixture,sort_keys=True,indent=1)
+        finally:
+            fixture.close()
+        # Atomic, so concurrent readers never see half a fixture
+        os.rename(temporary,self._filename(path))
+
+    def paths(self):
+        paths = []
+        for name in os.listdir(self.directory):
+            if name.endswith('.json'):
+                fixture = open(os.path.join(self.directory,name))
+                try:
+                    paths.append(json.load(fixture)['path'])
+                finally:
+                    fixture.close()
+        return sorted(paths)
+
+
+class FixtureHandler(BaseHTTPServer.BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def setup(self):
+        BaseHTTPServer.BaseHTTPRequestHandler.setup(self)
+        self.server.count('connections')
+
+    def do_GET(self):
+        server = self.server
+        server.count('requests')
+        if server.slots is not None:
+            server.slots.acquire()
+        server.enter()
+        try:
+            if server.latency:
+                time.sleep(server.latency)
+            fixture = server.store.get(self.path)
+            if fixture is None and server.upstream:
+                fixture = server.record(self.path,self.headers)
+            if fixture is None:
+                return self.reply(404,{'content-type':'application/json'},json.dumps({'status':'nok','reason':'No fixture for '+self.path}))
+            status,headers,body = fixture
+            if status == 200 and self.is_not_modified(headers):
+                return self.reply(304,dict((k,v) for k,v in headers.iteritems() if k == 'last-modified'),'')
+            self.reply(status,headers,body)
+        finally:
+            server.leave()
+            if server.slots is not None:
+                server.slots.release()
+
+    def is_not_modified(self,headers):
+        # Same rule as battle.net: not modified if it didn't change after If-Modified-Since
+        since = self.headers.get('If-Modified-Since')
+        if not since or 'last-modified' not in headers:
+            return False
+        try:
+            return parse_http_datetime(headers['last-modified']) <= parse_http_datetime(since)
+        except ValueError:
+            return False
+
+    def reply(self,status,headers,body):
+        self.send_response(status)
+        for name,value in sorted(headers.iteritems()):
+            self.send_header(name,value)
+        self.send_header('Content-Length',str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self,*args):
+        if self.server.verbose:
+            BaseHTTPServer.BaseHTTPRequestHandler.log_message(self,*args)
+
+
+class FixtureServer(SocketServer.ThreadingMixIn,BaseHTTPServer.HTTPServer):
+    """
+    .. versionadded:: 0.4.0
+
+    A local stand-in for the battle.net API. It replays the responses of a
+    :class:`FixtureStore` and, when given an upstream domain, first records the
+    requests it doesn't know by forwarding them there. Requests carrying
+    If-Modified-Since are answered 304 when the recorded Last-Modified is not newer,
+    and without an upstream the requests it doesn't know are answered 404, as
+    battle.net answers unknown items.
+    Every response is delayed by latency seconds and at most max_concurrency
+    requests are served at once, the rest wait. Point a client at it with
+
+    | ``Example:``
+    ::
+
+        server = FixtureServer('fixtures',upstream='eu.battle.net')
+        server.start()
+        WoWApi(domains={'eu':server.domain}).get_item('eu',25)
+    """
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self,directory,upstream=None,latency=0,max_concurrency=None,address=('127.0.0.1',0),ssl=False,verbose=False):
+        BaseHTTPServer.HTTPServer.__init__(self,address,FixtureHandler)
+        self.store = FixtureStore(directory)
+        self.upstream = upstream
+        self.scheme = 'https' if ssl else 'http'
+        self.latency = latency
+        self.verbose = verbose
+        self.slots = None
+        if max_concurrency:
+            self.slots = threading.Semaphore(max_concurrency)
+        self.pool = ConnectionPool()
+        self.lock = threading.Lock()
+        self.thread = None
+        self.reset()
+
+    @property
+    def domain(self):
+        host,port = self.server_address[:2]
+        return '%s:%d' % (host,port)
+
+    def reset(self):
+        self.lock.acquire()
+        try:
+            self.counters = {'requests':0,'connections':0,'recorded':0,'in_flight':0,'max_in_flight':0}
+        finally:
+            self.lock.release()
+
+    def count(self,counter,amount=1):
+        self.lock.acquire()
+        try:
+            self.counters[counter] += amount
+        finally:
+            self.lock.release()
+
+    def enter(self):
+        self.lock.acquire()
+        try:
+            self.counters['in_flight'] += 1
+            self.counters['max_in_flight'] = max(self.counters['max_in_flight'],self.counters['in_flight'])
+        finally:
+            self.lock.release()
+
+    def leave(self):
+        self.count('in_flight',-1)
+
+    def record(self,path,headers):
+        # Always fetched unconditionally, so there is a body to replay later
+        forwarded = {'Accept-Encoding':'gzip'}
+        for name in ('Date','Authorization'):
+            if headers.get(name):
+                forwarded[name] = headers.get(name)
+        response = self.pool.request(self.scheme,self.upstream,path,forwarded)
+        if response.status >= 500:
+            return response.status,{},response.read()
+        kept = {}
+        for name in recorded_headers:
+            value = response.info().get(name)
+            if value:
+                kept[name] = value
+        self.store.put(path,response.status,kept,response.read())
+        self.count('recorded')
+        return response.status,kept,response.read()
+
+    def start(self):
+        self.thread = threading.Thread(target=self.serve_forever)
+        self.thread.daemon = True
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+        self.pool.close()
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
+
+
+def main(argv=None):
+    parser = optparse.OptionParser(usage='%prog [options] directory')
+    parser.add_option('-u','--upstream',default=None,help='record unknown requests from this domain, e.g. us.battle.net')
+    parser.add_option('-s','--ssl',action='store_true',default=False,help='talk https to the upstream domain')
+    parser.add_option('-p','--port',type='int',default=8080,help='port to listen on')
+    parser.add_option('-l','--latency',type='float',default=0,help='seconds to delay every response')
+    parser.add_option('-c','--max-concurrency',type='int',default=None,help='requests served at once')
+    parser.add_option('-v','--verbose',action='store_true',default=False,help='log every request')
+    options,args = parser.parse_args(argv)
+    if len(args) != 1:
+        parser.error('a fixture directory is required')
+    server = FixtureServer(args[0],options.upstream,options.latency,options.max_concurrency,('127.0.0.1',options.port),options.ssl,options.verbose)
+    sys.stderr.write('Serving %s on %s\n' % (args[0],server.domain))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    server.server_close()
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,111 @@
+import httplib
+import threading
+
+
+class Response(object):
+    """
+    .. versionadded:: 0.4.0
+
+    A fully read response, so its connection can go back to the pool right away.
+    ``info()`` and ``read()`` behave like the ones of the urllib2 responses
+    """
+
+    def __init__(self,url,status,reason,headers,body):
+        self.url = url
+        self.status = status
+        self.reason = reason
+        self.headers = headers
+        self.body = body
+
+    def info(self):
+        return self.headers
+
+    def read(self):
+        return self.body
+
+    def geturl(self):
+        return self.url
+
+
+class ConnectionPool(object):
+    """
+    .. versionadded:: 0.4.0
+
+    Keeps idle HTTP/1.1 connections per scheme and host, so consecutive requests to
+    a region domain reuse the same sockets. It is safe to share between threads;
+    at most maxsize idle connections are kept per host
+    """
+
+    def __init__(self,timeout=10,maxsize=8):
+        self.timeout = timeout
+        self.maxsize = maxsize
+        self.idle = {}
+        self.lock = threading.Lock()
+        self.created = 0
+
+    def _connect(self,scheme,host):
+        self.lock.acquire()
+        try:
+            self.created += 1
+        finally:
+            self.lock.release()
+        if scheme == 'https':
+            return httplib.HTTPSConnection(host,timeout=self.timeout)
+        return httplib.HTTPConnection(host,timeout=self.timeout)
+
+    def get(self,scheme,host):
+        """
+        Returns (connection,reused), an idle connection to host if there is one
+        """
+        self.lock.acquire()
+        try:
+            connections = self.idle.get((scheme,host))
+            if connections:
+                return connections.pop(),True
+        finally:
+            self.lock.release()
+        return self._connect(scheme,host),False
+
+    def put(self,scheme,host,connection):
+        self.lock.acquire()
+        try:
+            connections = self.idle.setdefault((scheme,host),[])
+            if len(connections) < self.maxsize:
+                connections.append(connection)
+                return
+        finally:
+            self.lock.release()
+        connection.close()
+
+    def request(self,scheme,host,path,headers):
+        """
+        Sends a GET for path and returns a :class:`Response`. A reused connection the
+        server has closed in the meantime is replaced by a fresh one once
+        """
+        while True:
+            connection,reused = self.get(scheme,host)
+            try:
+                connection.request('GET',path,None,headers)
+                response = connection.getresponse()
+                body = response.read()
+            except (httplib.HTTPException,IOError):
+                connection.close()
+                if reused:
+                    continue
+                raise
+            if response.getheader('connection','').lower() == 'close' or response.version < 11:
+                connection.close()
+            else:
+                self.put(scheme,host,connection)
+            return Response(scheme+'://'+host+path,response.status,response.reason,response.msg,body)
+
+    def close(self):
+        self.lock.acquire()
+        try:
+            idle = self.idle
+            self.idle = {}
+        finally:
+            self.lock.release()
+        for connections in idle.itervalues():
+            for connection in connections:
+                connection.close()
@@ -0,0 +1,192 @@
+import itertools
+import multiprocessing
+import time
+
+from shadowcraft.calcs import what_if
+from shadowcraft.core import exceptions
+
+# Searches talent and glyph builds for the best DPS. A build is one talent
+# (or none) per tier plus up to glyph_slots glyphs, evaluated as a what_if
+# delta against the calculator, which itself is never touched.
+#
+# A single-flip pass first values every talent and glyph on its own against a
+# build with neither. Anything that doesn't change the DPS is pruned: the
+# search only picks between the talents and glyphs the model reacts to, and a
+# tier where nothing matters is left at 0 in the talent string. Candidates go
+# out in order of their single-flip estimate, so a search cut short by the
+# time budget has still looked at the likeliest builds. Evaluations are
+# memoized by delta for the life of the optimizer, and workers > 1 spreads
+# each chunk of candidates over a process pool.
+
+def _pooled_build_helper(args):
+    # Runs in a worker process on its own pickled copy of the calculator.
+    calculator, deltas = args
+    return evaluate_builds(calculator, deltas)
+
+def evaluate_builds(calculator, deltas):
+    # DPS for each delta; None for builds the model rejects.
+    dps_values = []
+    for delta in deltas:
+        try:
+            dps_values.append(calculator.evaluate(delta))
+        except exceptions.InvalidInputException:
+            dps_values.append(None)
+    return dps_values
+
+class BuildOptimizer(object):
+
+    def __init__(self, calculator, glyph_slots=3, talent_list=None, glyph_list=None, workers=None, chunk_size=64):
+        self.calculator = calculator
+        self.glyph_slots = glyph_slots
+        self.workers = workers
+        self.chunk_size = chunk_size
+        self.tiers = [tuple(tier) for tier in calculator.talents.class_talents[:calculator.talents.get_top_tier()]]
+        self.talent_list = [talent for tier in self.tiers for talent in tier if talent_list is None or talent in talent_list]
+        if glyph_list is None:
+            glyph_list = sorted(calculator.glyphs.allowed_glyphs)
+        for glyph in glyph_list:
+            if glyph not in calculator.glyphs.allowed_glyphs:
+                raise exceptions.InvalidInputException(_('Invalid glyph {glyph}').format(glyph=glyph))
+        self.glyph_list = list(glyph_list)
+        self.evaluated = {}
+        self.single_flips = None
+        self.complete = False
+        self.total = 0
+
+    def get_delta(self, talents, glyphs):
+        # Turns a build (chosen talents, chosen glyphs) into a delta that also
+        # clears every other talent and glyph.
+        talent_flags = dict((talent, False) for tier in self.tiers for talent in tier)
+        for talent in talents:
+            talent_flags[talent] = True
+        glyph_flags = dict((glyph, False) for glyph in self.calculator.glyphs.allowed_glyphs)
+        for glyph in glyphs:
+            glyph_flags[glyph] = True
+        return what_if.Delta(talents=talent_flags, glyphs=glyph_flags)
+
+    def get_talent_string(self, talents):
+        talent_string = ''
+        for tier in self.tiers:
+            choice = '0'
+            for position, talent in enumerate(tier):
+                if talent in talents:
+                    choice = str(position + 1)
+            talent_string += choice
+        return talent_string
+
+    def evaluate(self, builds, pool=None):
+        # Fills self.evaluated for builds, skipping the ones already there.
+        pending = []
+        for build in builds:
+            if build not in self.evaluated and build not in pending:
+                pending.append(build)
+        if not pending:
+            return
+        deltas = [self.get_delta(*build) for build in pending]
+        if pool is not None and len(deltas) > 1:
+            chunks = [deltas[i::self.workers] for i in xrange(self.workers)]
+            chunk_results = pool.map(_pooled_build_helper, [(self.calculator, chunk) for chunk in chunks if chunk], 1)
+            results = {}
+            for chunk, chunk_result in zip(chunks, chunk_results):
+                results.update(zip(chunk, chunk_result))
+            dps_values = [results[delta] for delta in deltas]
+        else:
+            dps_values = evaluate_builds(self.calculator, deltas)
+        self.evaluated.update(zip(pending, dps_values))
+
+    def get_single_flips(self, pool=None):
+        # DPS change from each talent and glyph on its own; None for the
+        # ones the model rejects.
+        if self.single_flips is None:
+            empty = ((), ())
+            builds = [empty]
+            builds.extend(((talent,), ()) for talent in self.talent_list)
+            builds.extend(((), (glyph,)) for glyph in self.glyph_list)
+            self.evaluate(builds, pool)
+            baseline_dps = self.evaluated[empty]
+            if baseline_dps is None:
+                raise exceptions.InvalidInputException(_('The model can\'t evaluate a build without talents or glyphs'))
+            single_flips = {}
+            for talents, glyphs in builds[1:]:
+                dps = self.evaluated[(talents, glyphs)]
+                if dps is not None:
+                    dps -= baseline_dps
+                single_flips[(talents + glyphs)[0]] = dps
+            self.single_flips = single_flips
+        return self.single_flips
+
+    def get_candidates(self, pool=None):
+        # Every pruned build, best single-flip estimate first.
+        single_flips = self.get_single_flips(pool)
+        tier_choices = []
+        for tier in self.tiers:
+            choices = [()]
+            for talent in tier:
+                if single_flips.get(talent):
+                    choices.append((talent,))
+            tier_choices.append(choices)
+        glyphs = [glyph for glyph in self.glyph_list if single_flips.get(glyph)]
+        glyph_choices = []
+        for count in xrange(min(self.glyph_slots, len(glyphs)) + 1):
+            glyph_choices.extend(itertools.combinations(glyphs, count))
+
+        candidates = []
+        for talent_choice in itertools.product(*tier_choices):
+            talents = sum(talent_choice, ())
+            for glyph_choice in glyph_choices:
+                estimate = sum([single_flips[name] for name in talents + glyph_choice])
+                candidates.append((-estimate, talents, glyph_choice))
+        candidates.sort()
+        return [(talents, glyph_choice) for estimate, talents, glyph_choice in candidates]
+
+    def optimize(self, top=5, time_budget=None, progress=None):
+        # Returns the top builds as (dps, talent string, glyphs) tuples, best
+        # first. With a time_budget (in seconds) the search stops after the
+        # first chunk that goes over it and self.complete is False. progress
+        # is called as progress(evaluated, total) after every chunk.
+        start = time.time()
+        pool = None
+        if self.workers and self.workers > 1:
+            pool = multiprocessing.Pool(self.workers)
+        try:
+            candidates = self.get_candidates(pool)
+            self.total = len(candidates)
+            self.complete = True
+            done = 0
+            for i in xrange(0, len(candidates), self.chunk_size):
+                if time_budget is not None and time.time() - start > time_budget:
+                    self.complete = False
+                    break
+                chunk = candidates[i:i + self.chunk_size]
+                self.evaluate(chunk, pool)
+                done += len(chunk)
+                if progress is not None:
+                    progress(done, self.total)
+        finally:
+            if pool is not None:
+                pool.close()
+                pool.join()
+
+        results = []
+        for talents, glyphs in candidates:
+            dps = self.evaluated.get((talents, glyphs))
+            if dps is not None:
+                results.append((dps, self.get_talent_string(talents), glyphs))
+        results.sort(key=lambda result: -result[0])
+        return results[:top]
+
+def optimize_specs(calculators, top=5, time_budget=None, progress=None, **options):
+    # Top builds for each of calculators, a dict of spec name to a calculator
+    # set up for that spec. The time budget is split evenly between specs and
+    # progress is called as progress(spec, evaluated, total).
+    results = {}
+    for spec in sorted(calculators):
+        spec_budget = None
+        if time_budget is not None:
+            spec_budget = float(time_budget) / len(calculators)
+        spec_progress = None
+        if progress is not None:
+            spec_progress = lambda evaluated, total, spec=spec: progress(spec, evaluated, total)
+        optimizer = BuildOptimizer(calculators[spec], **options)
+        results[spec] = optimizer.optimize(top, spec_budget, spec_progress)
+    return results
@@ -0,0 +1,173 @@
+import sys
+import threading
+
+from shadowcraft.core import exceptions
+from shadowcraft.objects import flags
+
+# Bounded LRU cache for calculator results. Keys are content fingerprints
+# (see DamageCalculator.fingerprint), so one cache can be shared by every
+# calculator in the process: two calculators built from the same inputs hit
+# the same entries.
+#
+# The cache holds at most max_entries entries and, when max_bytes is set, at
+# most that many bytes, measured by get_size on every key and value as it goes
+# in. An entry bigger than max_bytes on its own is not stored at all.
+
+class ResultCache(object):
+
+    def __init__(self, max_entries=1024, max_bytes=None):
+        self.check_bounds(max_entries, max_bytes)
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        self.clear()
+
+    def check_bounds(self, max_entries, max_bytes):
+        if max_entries < 1:
+            raise exceptions.InvalidInputException(_('A result cache must hold at least one entry'))
+        if max_bytes is not None and max_bytes < 1:
+            raise exceptions.InvalidInputException(_('A result cache must hold at least one byte'))
+
+    def clear(self):
+        # The entries form a circular doubly linked list around a sentinel so
+        # both a refresh and an eviction are O(1). Links are
+        # [previous, next, key, value, size]; the sentinel's next is the
+        # oldest.
+        self.lock.acquire()
+        try:
+            self.root = []
+            self.root[:] = [self.root, self.root, None, None, 0]
+            self.links = {}
+            self.bytes = 0
+            self.hits = 0
+            self.misses = 0
+            self.evictions = 0
+        finally:
+            self.lock.release()
+
+    def __len__(self):
+        return len(self.links)
+
+    def __contains__(self, key):
+        return key in self.links
+
+    def get(self, key, default=None):
+        self.lock.acquire()
+        try:
+            link = self.links.get(key)
+            if link is None:
+                self.misses += 1
+                return default
+            self.hits += 1
+            self._unlink(link)
+            self._append(link)
+            return link[3]
+        finally:
+            self.lock.release()
+
+    def put(self, key, value):
+        size = 0
+        if self.max_bytes is not None:
+            size = get_size(key) + get_size(value)
+        self.lock.acquire()
+        try:
+            link = self.links.pop(key, None)
+            if link is not None:
+                self._unlink(link)
+                self.bytes -= link[4]
+            if self.max_bytes is not None and size > self.max_bytes:
+                return
+            link = [None, None, key, value, size]
+            self._append(link)
+            self.links[key] = link
+            self.bytes += size
+            self._evict()
+        finally:
+            self.lock.release()
+
+    def resize(self, max_entries, max_bytes=None):
+        self.check_bounds(max_entries, max_bytes)
+        self.lock.acquire()
+        try:
+            if max_bytes is not None and self.max_bytes is None:
+                # Sizes weren't measured while there was no byte bound.
+                self.bytes = 0
+                for link in self.links.itervalues():
+                    link[4] = get_size(link[2]) + get_size(link[3])
+                    self.bytes += link[4]
+            self.max_entries = max_entries
+            self.max_bytes = max_bytes
+            self._evict()
+        finally:
+            self.lock.release()
+
+    def get_counters(self):
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'entries': len(self.links),
+            'max_entries': self.max_entries,
+            'bytes': self.bytes,
+            'max_bytes': self.max_bytes
+        }
+
+    def _evict(self):
+        while len(self.links) > self.max_entries or (self.max_bytes is not None and self.bytes > self.max_bytes):
+            oldest = self.root[1]
+            self._unlink(oldest)
+            del self.links[oldest[2]]
+            self.bytes -= oldest[4]
+            self.evictions += 1
+
+    def _unlink(self, link):
+        previous, next = link[0], link[1]
+        previous[1] = next
+        next[0] = previous
+
+    def _append(self, link):
+        newest = self.root[0]
+        link[0] = newest
+        link[1] = self.root
+        newest[1] = link
+        self.root[0] = link
+
+def get_size(value, seen=None):
+    # Bytes taken by value and everything it holds, counting an object it
+    # refers to more than once only once. Objects other than the builtin
+    # containers count as their own size.
+    if seen is None:
+        seen = set()
+    if id(value) in seen:
+        return 0
+    seen.add(id(value))
+    size = sys.getsizeof(value)
+    if isinstance(value, dict):
+        for key, item in value.iteritems():
+            size += get_size(key, seen) + get_size(item, seen)
+    elif isinstance(value, (list, tuple, set, frozenset)):
+        for item in value:
+            size += get_size(item, seen)
+    return size
+
+def canonical(value):
+    # Turns settings-like objects into nested tuples that can be hashed and
+    # compared, so equal inputs give equal keys.
+    if isinstance(value, dict):
+        return tuple(sorted((key, canonical(item)) for key, item in value.iteritems()))
+    if isinstance(value, (list, tuple)):
+        return tuple(canonical(item) for item in value)
+    if isinstance(value, (set, frozenset)):
+        return tuple(sorted(value))
+    if hasattr(value, '__dict__'):
+        return (value.__class__.__name__, canonical(value.__dict__))
+    return value
+
+def active_flags(container, allowed):
+    # Names of the flags set on one of the flag containers (Buffs, GearBuffs,
+    # Glyphs, Talents, ...). The bitset ones list their own; for the rest
+    # (Weapon enchants) they're read from the instance dict instead of probing
+    # every allowed name.
+    if isinstance(container, flags.FlagSet):
+        return tuple(name for name in container.get_active_flags() if name in allowed)
+    return tuple(sorted(name for name, value in container.__dict__.iteritems() if value and name in allowed))
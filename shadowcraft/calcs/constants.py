@@ -0,0 +1,87 @@
+import threading
+
+# Process-wide tables of derived game constants. Everything a calculator
+# derives from its level, its target and whether it is in pvp (armor
+# parameters, base miss rates, spell coefficients...) is the same for every
+# calculator built with those inputs, so it is worked out once per process
+# and shared: calculators only look their entry up and copy it in.
+#
+# Entries are read-only once built. A build that raises (e.g. an unsupported
+# target level) stores nothing, so the same error comes up every time.
+
+class Constants(object):
+    __slots__ = ('values',)
+
+    def __init__(self, values):
+        object.__setattr__(self, 'values', dict(values))
+
+    def __reduce__(self):
+        return (Constants, (self.values,))
+
+    def __getattr__(self, name):
+        try:
+            return object.__getattribute__(self, 'values')[name]
+        except KeyError:
+            raise AttributeError(name)
+
+    def __setattr__(self, name, value):
+        raise AttributeError(_('Shared constants are read-only'))
+
+    def __delattr__(self, name):
+        raise AttributeError(_('Shared constants are read-only'))
+
+    def __getitem__(self, name):
+        return self.values[name]
+
+    def __contains__(self, name):
+        return name in self.values
+
+    def __len__(self):
+        return len(self.values)
+
+    def keys(self):
+        return self.values.keys()
+
+    def items(self):
+        return self.values.items()
+
+    def apply(self, target):
+        # Straight into the instance dict: this is what keeps building a
+        # calculator cheap, and none of these names has a setter side effect.
+        target.__dict__.update(self.values)
+
+class ConstantsTable(object):
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.entries = {}
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __contains__(self, key):
+        return key in self.entries
+
+    def get(self, key, build):
+        # build is only called, under the lock, the first time key is asked
+        # for; it returns a dict of the constants.
+        entry = self.entries.get(key)
+        if entry is None:
+            self.lock.acquire()
+            try:
+                entry = self.entries.get(key)
+                if entry is None:
+                    entry = Constants(build())
+                    self.entries[key] = entry
+            finally:
+                self.lock.release()
+        return entry
+
+    def clear(self):
+        self.lock.acquire()
+        try:
+            self.entries.clear()
+        finally:
+            self.lock.release()
+
+level_constants = ConstantsTable()
@@ -0,0 +1,142 @@
+import math
+
+# Dual numbers for forward-mode automatic differentiation. A Dual carries a
+# value plus its partial derivatives with respect to any number of named
+# inputs, e.g. Dual(20131, {'agi': 1.}). Arithmetic on Duals follows the usual
+# rules of differentiation, and comparisons only look at the value, so the
+# model code picks the same branches it would with plain floats. Anything that
+# converts to float (int(), round(), math.*) drops the derivatives, which is
+# fine for the constants that go through those paths.
+
+class Dual(object):
+    __slots__ = ('value', 'derivatives')
+
+    def __init__(self, value, derivatives=None):
+        self.value = value
+        if derivatives is None:
+            derivatives = {}
+        self.derivatives = derivatives
+
+    def derivative(self, name):
+        return self.derivatives.get(name, 0.)
+
+    def _combine(self, other, self_factor, other_factor):
+        derivatives = {}
+        for name, d in self.derivatives.iteritems():
+            derivatives[name] = d * self_factor
+        for name, d in other.derivatives.iteritems():
+            derivatives[name] = derivatives.get(name, 0.) + d * other_factor
+        return derivatives
+
+    def _scale(self, factor):
+        derivatives = {}
+        for name, d in self.derivatives.iteritems():
+            derivatives[name] = d * factor
+        return derivatives
+
+    def __add__(self, other):
+        if isinstance(other, Dual):
+            return Dual(self.value + other.value, self._combine(other, 1., 1.))
+        return Dual(self.value + other, dict(self.derivatives))
+
+    __radd__ = __add__
+
+    def __sub__(self, other):
+        if isinstance(other, Dual):
+            return Dual(self.value - other.value, self._combine(other, 1., -1.))
+        return Dual(self.value - other, dict(self.derivatives))
+
+    def __rsub__(self, other):
+        return Dual(other - self.value, self._scale(-1.))
+
+    def __mul__(self, other):
+        if isinstance(other, Dual):
+            return Dual(self.value * other.value, self._combine(other, other.value, self.value))
+        return Dual(self.value * other, self._scale(other))
+
+    __rmul__ = __mul__
+
+    def __div__(self, other):
+        if isinstance(other, Dual):
+            return Dual(self.value / other.value, self._combine(other, 1. / other.value, -self.value / (other.value * other.value)))
+        return Dual(self.value / other, self._scale(1. / other))
+
+    __truediv__ = __div__
+
+    def __rdiv__(self, other):
+        value = other / self.value
+        return Dual(value, self._scale(-value / self.value))
+
+    __rtruediv__ = __rdiv__
+
+    def __pow__(self, other):
+        if isinstance(other, Dual):
+            value = self.value ** other.value
+            if self.value > 0:
+                log_value = math.log(self.value)
+            else:
+                log_value = 0.
+            return Dual(value, self._combine(other, other.value * self.value ** (other.value - 1), value * log_value))
+        if other == 0:
+            return Dual(1., {})
+        return Dual(self.value ** other, self._scale(other * self.value ** (other - 1)))
+
+    def __rpow__(self, other):
+        value = other ** self.value
+        if other > 0:
+            return Dual(value, self._scale(value * math.log(other)))
+        return Dual(value, {})
+
+    def __neg__(self):
+        return Dual(-self.value, self._scale(-1.))
+
+    def __pos__(self):
+        return self
+
+    def __abs__(self):
+        if self.value < 0:
+            return -self
+        return self
+
+    def __float__(self):
+        return float(self.value)
+
+    def __int__(self):
+        return int(self.value)
+
+    def __nonzero__(self):
+        return bool(self.value)
+
+    def __hash__(self):
+        return hash(self.value)
+
+    def __eq__(self, other):
+        return self.value == value_of(other)
+
+    def __ne__(self, other):
+        return self.value != value_of(other)
+
+    def __lt__(self, other):
+        return self.value < value_of(other)
+
+    def __le__(self, other):
+        return self.value <= value_of(other)
+
+    def __gt__(self, other):
+        return self.value > value_of(other)
+
+    def __ge__(self, other):
+        return self.value >= value_of(other)
+
+    def __repr__(self):
+        return 'Dual({value!r}, {derivatives!r})'.format(value=self.value, derivatives=self.derivatives)
+
+def value_of(number):
+    if isinstance(number, Dual):
+        return number.value
+    return number
+
+def derivative_of(number, name):
+    if isinstance(number, Dual):
+        return number.derivative(name)
+    return 0.
@@ -0,0 +1,216 @@
+import collections
+
+from shadowcraft.core import exceptions
+
+# Fixed-point iteration for the attacks_per_second / proc uptime loop in
+# determine_stats. A solve starts from initial() (or from the last solution
+# stored under the same key when warm_start is set) and calls step() until the
+# attack rates it returns stop moving. step(attacks_per_second, crit_rates)
+# returns (state, attacks_per_second, crit_rates); whatever solve() hands back
+# always comes straight from a step() call, so extrapolated rates only ever
+# serve as the next guess.
+#
+# acceleration is None (plain iteration), 'aitken' (componentwise delta
+# squared every third iterate) or 'anderson' (Anderson mixing over the last
+# `memory` iterates). Every solve appends a record to the trace:
+#   {'key', 'iterations', 'residuals', 'converged', 'warm_started', 'acceleration'}
+# where residuals[i] is the largest change in any attack rate on iteration i.
+
+class FixedPointSolver(object):
+    allowed_accelerations = (None, 'aitken', 'anderson')
+
+    def __init__(self, max_iterations=20, precision=10 ** -7, warm_start=False, acceleration=None, memory=3, trace_length=100):
+        if acceleration not in self.allowed_accelerations:
+            raise exceptions.InvalidInputException(_('Unknown fixed-point acceleration {acceleration}').format(acceleration=acceleration))
+        if max_iterations < 1 or memory < 1:
+            raise exceptions.InvalidInputException(_('The fixed-point solver needs at least one iteration and one remembered iterate'))
+        self.max_iterations = max_iterations
+        self.precision = precision
+        self.warm_start = warm_start
+        self.acceleration = acceleration
+        self.memory = memory
+        self.trace = collections.deque(maxlen=trace_length)
+        self.solutions = {}
+
+    def clear(self):
+        self.trace.clear()
+        self.solutions.clear()
+
+    def get_trace(self):
+        return list(self.trace)
+
+    def solve(self, key, initial, step, accelerate=True):
+        # accelerate=False forces a cold, plain solve; callers use it when the
+        # rates carry derivatives that must converge along with the values.
+        warm_started = accelerate and self.warm_start and key in self.solutions
+        if warm_started:
+            attacks_per_second, crit_rates = self.solutions[key]
+            attacks_per_second, crit_rates = copy_rates(attacks_per_second), copy_rates(crit_rates)
+        else:
+            attacks_per_second, crit_rates = initial()
+        acceleration = None
+        if accelerate:
+            acceleration = self.acceleration
+
+        residuals = []
+        history = []
+        layout = None
+        converged = False
+        for iteration in range(self.max_iterations):
+            guess = attacks_per_second
+            state, attacks_per_second, crit_rates = step(guess, crit_rates)
+            residual = self.residual(guess, attacks_per_second)
+            residuals.append(residual)
+            if residual <= self.precision:
+                converged = True
+                break
+            if acceleration is None or iteration == self.max_iterations - 1:
+                continue
+
+            if layout != get_layout(attacks_per_second):
+                layout = get_layout(attacks_per_second)
+                history = []
+            output = flatten(attacks_per_second, layout)
+            if acceleration == 'aitken':
+                if not history:
+                    history.append(flatten(guess, layout))
+                history.append(output)
+                if len(history) < 3:
+                    continue
+                extrapolated = aitken(history)
+                history = []
+            else:
+                history.append((flatten(guess, layout), output))
+                history = history[-(self.memory + 1):]
+                extrapolated = anderson(history)
+            if extrapolated is not None:
+                attacks_per_second = unflatten(extrapolated, layout)
+
+        if accelerate:
+            self.solutions[key] = (copy_rates(attacks_per_second), copy_rates(crit_rates))
+        self.trace.append({
+            'key': key,
+            'iterations': len(residuals),
+            'residuals': residuals,
+            'converged': converged,
+            'warm_started': warm_started,
+            'acceleration': acceleration
+        })
+        return state, attacks_per_second, crit_rates
+
+    def residual(self, old_rates, new_rates):
+        # Same test as are_close_enough: only the keys of the new rates count,
+        # and a key the old rates lack means no convergence yet.
+        largest = 0.
+        for name, value in new_rates.iteritems():
+            if name not in old_rates:
+                return float('inf')
+            if hasattr(value, '__iter__'):
+                pairs = zip(value, old_rates[name])
+            else:
+                pairs = [(value, old_rates[name])]
+            for new, old in pairs:
+                difference = float(abs(new - old))
+                if difference > largest:
+                    largest = difference
+        return largest
+
+def copy_rates(rates):
+    copied = {}
+    for name, value in rates.iteritems():
+        if isinstance(value, list):
+            value = list(value)
+        copied[name] = value
+    return copied
+
+def get_layout(rates):
+    layout = []
+    for name in sorted(rates):
+        if hasattr(rates[name], '__iter__'):
+            layout.append((name, len(rates[name])))
+        else:
+            layout.append((name, None))
+    return tuple(layout)
+
+def flatten(rates, layout):
+    vector = []
+    for name, length in layout:
+        if length is None:
+            vector.append(float(rates.get(name, 0.)))
+        else:
+            vector.extend(float(value) for value in rates.get(name, [0.] * length))
+    return vector
+
+def unflatten(vector, layout):
+    # Rates can't be negative; an extrapolation that overshoots past zero is
+    # clamped rather than handed to the model.
+    rates = {}
+    position = 0
+    for name, length in layout:
+        if length is None:
+            rates[name] = max(vector[position], 0.)
+            position += 1
+        else:
+            rates[name] = [max(value, 0.) for value in vector[position:position + length]]
+            position += length
+    return rates
+
+def aitken(history):
+    # history is three consecutive iterates x0, x1 = g(x0), x2 = g(x1).
+    x0, x1, x2 = history
+    extrapolated = []
+    for a, b, c in zip(x0, x1, x2):
+        denominator = c - 2 * b + a
+        if abs(denominator) < 10 ** -12:
+            extrapolated.append(c)
+        else:
+            extrapolated.append(c - (c - b) ** 2 / denominator)
+    return extrapolated
+
+def anderson(history):
+    # history holds (x, g(x)) pairs, oldest first. Picks the mix of the
+    # remembered steps that minimises the residual g(x) - x in least squares
+    # and applies the same mix to the outputs.
+    if len(history) < 2:
+        return None
+    residuals = [[out - x for x, out in zip(guess, output)] for guess, output in history]
+    outputs = [output for guess, output in history]
+    delta_residuals = [[b - a for a, b in zip(residuals[i], residuals[i + 1])] for i in range(len(history) - 1)]
+    delta_outputs = [[b - a for a, b in zip(outputs[i], outputs[i + 1])] for i in range(len(history) - 1)]
+    last_residual = residuals[-1]
+    size = len(delta_residuals)
+    matrix = [[dot(delta_residuals[i], delta_residuals[j]) for j in range(size)] for i in range(size)]
+    for i in range(size):
+        matrix[i][i] += 10 ** -12 * (matrix[i][i] + 1)
+    vector = [dot(delta_residuals[i], last_residual) for i in range(size)]
+    gamma = solve_linear(matrix, vector)
+    if gamma is None:
+        return None
+    extrapolated = list(outputs[-1])
+    for weight, delta in zip(gamma, delta_outputs):
+        for index in range(len(extrapolated)):
+            extrapolated[index] -= weight * delta[index]
+    return extrapolated
+
+def dot(a, b):
+    return sum(x * y for x, y in zip(a, b))
+
+def solve_linear(matrix, vector):
+    # Gaussian elimination with partial pivoting; the systems here are at
+    # most memory x memory. Returns None for a singular system.
+    size = len(vector)
+    rows = [list(matrix[i]) + [vector[i]] for i in range(size)]
+    for column in range(size):
+        pivot = max(range(column, size), key=lambda row: abs(rows[row][column]))
+        if abs(rows[pivot][column]) < 10 ** -300:
+            return None
+        rows[column], rows[pivot] = rows[pivot], rows[column]
+        for row in range(column + 1, size):
+            factor = rows[row][column] / rows[column][column]
+            for index in range(column, size + 1):
+                rows[row][index] -= factor * rows[column][index]
+    solution = [0.] * size
+    for row in range(size - 1, -1, -1):
+        total = rows[row][size] - sum(rows[row][index] * solution[index] for index in range(row + 1, size))
+        solution[row] = total / rows[row][row]
+    return solution
@@ -0,0 +1,259 @@
+import itertools
+
+from shadowcraft.calcs import what_if
+from shadowcraft.core import exceptions
+
+# Picks gems for every socket and the pair of weapon enchants that maximize
+# get_dps.
+#
+# Gems come in the ui_data format, {name: (colors, stats)}, where colors are
+# the socket colors the gem matches (['meta'] for meta gems) and stats may
+# list gear buffs and procs under 'gear_buff' and 'proc'. Items are
+# {slot: item} with the sockets, bonus_stat and bonus_value of ui_data items,
+# as dicts or objects. A socket bonus applies when every socket of the item
+# holds a gem matching its color; prismatic sockets take any gem but the meta
+# ones. requirements maps a meta gem to {color: count}, the number of gems of
+# each color (a gem counts towards every color it matches) needed for it to
+# be active; metas without an entry are always active.
+#
+# Gem layouts are chosen on EP weights computed once per optimizer: for every
+# meta gem (and for no meta at all) the best layout that keeps the meta
+# active comes from a search over the color counts, both with hit and
+# expertise valued at their EP and with them ignored, since gems can push
+# either past its cap. Enchants are pruned per hand on exact single-hand
+# values. Every layout is then evaluated exactly with every remaining enchant
+# pair, as what_if deltas against the calculator (in a pool of workers
+# processes if asked to), so meta and enchant procs are valued by the model
+# itself.
+#
+# The calculator's stats have to hold the items with current_gems
+# ({slot: [gem per socket]}, none by default) and their socket bonuses.
+
+gem_colors = ('red', 'yellow', 'blue')
+ep_names = {'hit': 'yellow_hit', 'exp': 'dodge_exp'}
+capped_stats = ('hit', 'exp')
+
+class InvalidGemException(exceptions.InvalidInputException):
+    pass
+
+
+def get_item_value(item, name, default):
+    if isinstance(item, dict):
+        return item.get(name, default)
+    return getattr(item, name, default)
+
+def get_gem_stats(gem_data):
+    # The rating stats of a gem, without its gear buffs and procs.
+    colors, gem_stats = gem_data
+    return dict((stat, value) for stat, value in gem_stats.iteritems() if stat not in ('gear_buff', 'proc'))
+
+def fits(gem_data, socket):
+    colors = gem_data[0]
+    if socket == 'meta' or 'meta' in colors:
+        return socket == 'meta' and 'meta' in colors
+    return True
+
+def matches(gem_data, socket):
+    return socket == 'prismatic' or socket in gem_data[0]
+
+class GemOptimizer(object):
+    ep_stats = ('agi', 'str', 'ap', 'crit', 'haste', 'mastery', 'yellow_hit', 'dodge_exp')
+
+    def __init__(self, calculator, items, gems, requirements=None, current_gems=None, enchant_list=None, enchant_width=3, workers=None):
+        self.calculator = calculator
+        self.items = items
+        self.gems = gems
+        self.requirements = requirements or {}
+        self.enchant_width = enchant_width
+        self.workers = workers
+        self.slots = sorted(slot for slot in items if get_item_value(items[slot], 'sockets', []))
+        for gem in self.requirements:
+            if gem not in gems:
+                raise InvalidGemException(_('No data for gem {gem}').format(gem=gem))
+        if enchant_list is None:
+            enchant_list = sorted(calculator.stats.mh.allowed_melee_enchants)
+        for enchant in enchant_list:
+            if enchant not in calculator.stats.mh.allowed_melee_enchants:
+                raise InvalidGemException(_('Enchant {enchant} is not allowed.').format(enchant=enchant))
+        self.enchant_list = list(enchant_list)
+        self.metas = sorted(name for name in gems if 'meta' in gems[name][0])
+        self.current_stats = self.get_stats(current_gems or {})
+        self.weights = None
+
+    def get_weights(self):
+        if self.weights is None:
+            self.weights = self.calculator.get_ep(self.ep_stats, normalize_ep_stat='dps')
+        return self.weights
+
+    def get_value(self, gem_stats, weights):
+        value = 0
+        for stat, amount in gem_stats.iteritems():
+            value += weights.get(ep_names.get(stat, stat), 0) * amount
+        return value
+
+    def get_stats(self, layout):
+        # Rating stats from the gems of layout ({slot: [gem per socket]}) and
+        # the socket bonuses they earn.
+        totals = {}
+        for slot, slot_gems in layout.iteritems():
+            if slot not in self.items:
+                raise InvalidGemException(_('No item in slot {slot}').format(slot=slot))
+            item = self.items[slot]
+            sockets = get_item_value(item, 'sockets', [])
+            if len(slot_gems) != len(sockets):
+                raise InvalidGemException(_('Slot {slot} has {count} sockets').format(slot=slot, count=len(sockets)))
+            bonus = True
+            for gem, socket in zip(slot_gems, sockets):
+                if gem is None:
+                    bonus = False
+                    continue
+                if gem not in self.gems:
+                    raise InvalidGemException(_('No data for gem {gem}').format(gem=gem))
+                if not fits(self.gems[gem], socket):
+                    raise InvalidGemException(_('{gem} doesn\'t fit a {socket} socket').format(gem=gem, socket=socket))
+                bonus = bonus and matches(self.gems[gem], socket)
+                for stat, value in get_gem_stats(self.gems[gem]).iteritems():
+                    totals[stat] = totals.get(stat, 0) + value
+            bonus_stat = get_item_value(item, 'bonus_stat', '')
+            if bonus and bonus_stat:
+                totals[bonus_stat] = totals.get(bonus_stat, 0) + get_item_value(item, 'bonus_value', 0)
+        return totals
+
+    def get_color_counts(self, layout):
+        counts = dict((color, 0) for color in gem_colors)
+        for slot_gems in layout.itervalues():
+            for gem in slot_gems:
+                if gem is not None:
+                    for color in self.gems[gem][0]:
+                        if color in counts:
+                            counts[color] += 1
+        return counts
+
+    def is_active(self, meta, layout):
+        counts = self.get_color_counts(layout)
+        for color, count in self.requirements.get(meta, {}).iteritems():
+            if counts.get(color, 0) < count:
+                return False
+        return True
+
+    def get_item_options(self, slot, meta, weights, requirement):
+        # Every worthwhile way to gem slot with meta in its meta socket, as
+        # (value, color counts, gems). Only the best gem per combination of
+        # matched colors is tried in each socket.
+        item = self.items[slot]
+        sockets = get_item_value(item, 'sockets', [])
+        socket_choices = []
+        for socket in sockets:
+            if socket == 'meta':
+                socket_choices.append([meta])
+                continue
+            best = {}
+            for name in sorted(self.gems):
+                gem_data = self.gems[name]
+                if not fits(gem_data, socket):
+                    continue
+                key = (tuple(sorted(color for color in gem_data[0] if color in requirement)), matches(gem_data, socket))
+                value = self.get_value(get_gem_stats(gem_data), weights)
+                if key not in best or value > best[key][0]:
+                    best[key] = (value, name)
+            socket_choices.append(sorted(set(name for value, name in best.itervalues())))
+
+        options = {}
+        for choice in itertools.product(*socket_choices):
+            layout = {slot: list(choice)}
+            value = self.get_value(self.get_stats(layout), weights)
+            counts = self.get_color_counts(layout)
+            key = tuple(counts[color] for color in sorted(requirement))
+            if key not in options or value > options[key][0]:
+                options[key] = (value, choice)
+        return [(value, key, choice) for key, (value, choice) in options.iteritems()]
+
+    def get_layout(self, meta, weights):
+        # Best layout by weights with meta (or None) in the meta sockets,
+        # keeping meta active; None if no layout can.
+        requirement = self.requirements.get(meta, {})
+        colors = sorted(requirement)
+        needed = tuple(requirement[color] for color in colors)
+        # states maps capped color counts to the best (value, layout).
+        states = {tuple(0 for color in colors): (0, {})}
+        for slot in self.slots:
+            options = self.get_item_options(slot, meta, weights, requirement)
+            new_states = {}
+            for key, (value, layout) in states.iteritems():
+                for option_value, counts, choice in options:
+                    new_key = tuple(min(count + added, cap) for count, added, cap in zip(key, counts, needed))
+                    new_value = value + option_value
+                    if new_key not in new_states or new_value > new_states[new_key][0]:
+                        new_layout = dict(layout)
+                        new_layout[slot] = list(choice)
+                        new_states[new_key] = (new_value, new_layout)
+            states = new_states
+        if needed not in states:
+            return None
+        return states[needed][1]
+
+    def get_layouts(self):
+        # Candidate layouts, one per meta gem choice and weighting.
+        weights = self.get_weights()
+        uncapped_weights = dict(weights)
+        for stat in capped_stats:
+            uncapped_weights[ep_names[stat]] = 0
+        has_meta = False
+        for slot in self.slots:
+            if 'meta' in get_item_value(self.items[slot], 'sockets', []):
+                has_meta = True
+        metas = [None]
+        if has_meta:
+            metas.extend(self.metas)
+        layouts = []
+        for meta in metas:
+            for layout_weights in (weights, uncapped_weights):
+                layout = self.get_layout(meta, layout_weights)
+                if layout is not None and layout not in layouts:
+                    layouts.append(layout)
+        return layouts
+
+    def get_enchant_pairs(self):
+        # The enchant_width best enchants for each hand on their own, paired.
+        hand_choices = []
+        for hand in ('mh', 'oh'):
+            choices = [None] + self.enchant_list
+            deltas = [what_if.Delta(enchants={hand: enchant}) for enchant in choices]
+            dps_values = self.calculator.evaluate_deltas(deltas, workers=self.workers)
+            ranked = sorted(zip(dps_values, choices), key=lambda result: -result[0])
+            hand_choices.append([enchant for dps, enchant in ranked[:self.enchant_width]])
+        return list(itertools.product(*hand_choices))
+
+    def get_delta(self, layout, enchants):
+        stats = self.get_stats(layout)
+        changes = {}
+        for stat in set(stats) | set(self.current_stats):
+            change = stats.get(stat, 0) - self.current_stats.get(stat, 0)
+            if change:
+                changes[stat] = change
+        gear_buffs = {}
+        procs = {}
+        for name in self.metas:
+            meta_stats = self.gems[name][1]
+            active = False
+            for slot_gems in layout.itervalues():
+                if name in slot_gems and self.is_active(name, layout):
+                    active = True
+            for gear_buff in meta_stats.get('gear_buff', []):
+                gear_buffs[gear_buff] = active
+            for proc in meta_stats.get('proc', []):
+                procs[proc] = active
+        return what_if.Delta(stats=changes, gear_buffs=gear_buffs, procs=procs, enchants=dict(zip(('mh', 'oh'), enchants)))
+
+    def optimize(self):
+        # Returns (dps, gems, enchants): gems is {slot: [gem per socket]} and
+        # enchants is (mh enchant, oh enchant).
+        candidates = []
+        enchant_pairs = self.get_enchant_pairs()
+        for layout in self.get_layouts():
+            for enchants in enchant_pairs:
+                candidates.append((layout, enchants))
+        dps_values = self.calculator.evaluate_deltas([self.get_delta(*candidate) for candidate in candidates], workers=self.workers)
+        best = max(xrange(len(candidates)), key=lambda i: dps_values[i])
+        layout, enchants = candidates[best]
+        return dps_values[best], layout, enchants
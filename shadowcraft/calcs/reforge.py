@@ -0,0 +1,268 @@
+import math
+
+from shadowcraft.calcs import what_if
+from shadowcraft.core import exceptions
+
+# Picks a reforge (or none) for every item to maximize get_dps. Reforging
+# moves 40% (rounded down) of one secondary stat on an item into a secondary
+# stat the item doesn't have.
+#
+# The search runs in two passes. The first solves a linearized problem: crit,
+# haste and mastery are worth their EP, while hit and expertise are worth
+# their below-cap EP up to the breakpoints computed from the calculator and
+# less (or nothing) past them. Single-slot changes, then pairs of slots trading
+# hit or expertise, are applied until none of them gains anything. The second
+# pass takes the changes to hit and expertise that the linear model rates
+# closest to the current solution and evaluates them exactly (as what_if
+# deltas against the calculator, in a pool of workers processes when given),
+# keeping the best, for up to refine_rounds rounds.
+#
+# Items are given as {slot: stats}, where stats is a dict (the ui_data
+# format) or an object with one attribute per stat (ui_data.Item). The
+# calculator's stats have to hold the items as reforged by current_reforges
+# ({slot: (from_stat, to_stat)}, nothing reforged by default).
+
+reforgable_stats = ('crit', 'hit', 'exp', 'haste', 'mastery')
+reforge_rate = .4
+
+class InvalidReforgeException(exceptions.InvalidInputException):
+    pass
+
+
+def get_item_stats(item):
+    item_stats = {}
+    for stat in reforgable_stats:
+        if isinstance(item, dict):
+            item_stats[stat] = item.get(stat, 0)
+        else:
+            item_stats[stat] = getattr(item, stat, 0)
+    return item_stats
+
+def get_reforge_options(item_stats):
+    # Every reforge an item allows, as (from_stat, to_stat, amount).
+    options = []
+    for from_stat in reforgable_stats:
+        amount = int(math.floor(item_stats[from_stat] * reforge_rate))
+        if item_stats[from_stat] <= 0 or amount <= 0:
+            continue
+        for to_stat in reforgable_stats:
+            if item_stats[to_stat] == 0:
+                options.append((from_stat, to_stat, amount))
+    return options
+
+def capped_value(rating, segments):
+    # Value of rating under segments, a list of (upper bound, value per
+    # rating) in increasing order of bound; rating past the last bound is
+    # worth nothing.
+    value = 0
+    lower = 0
+    for upper, weight in segments:
+        if rating <= lower:
+            break
+        value += (min(rating, upper) - lower) * weight
+        lower = upper
+    return value
+
+def get_hit_chance_bonus(calculator):
+    # The bonus lives on the copy an evaluation runs on, set up by the
+    # calculator's set_constants when it has one.
+    if hasattr(calculator, 'set_constants'):
+        calculator.set_constants()
+    return calculator.hit_chance_bonus or 0
+
+class ReforgeOptimizer(object):
+    linear_stats = ('crit', 'haste', 'mastery')
+    capped_stats = ('hit', 'exp')
+    ep_stats = ('crit', 'haste', 'mastery', 'yellow_hit', 'white_hit', 'dodge_exp', 'parry_exp')
+
+    def __init__(self, calculator, items, current_reforges=None, refine_rounds=4, refine_width=16, workers=None):
+        self.calculator = calculator
+        self.refine_rounds = refine_rounds
+        self.refine_width = refine_width
+        self.slots = sorted(items)
+        self.options = {}
+        for slot in self.slots:
+            self.options[slot] = [None] + get_reforge_options(get_item_stats(items[slot]))
+
+        self.base_stats = {}
+        for stat in reforgable_stats:
+            self.base_stats[stat] = getattr(calculator.stats, stat)
+        for slot, reforge in (current_reforges or {}).iteritems():
+            if reforge is None:
+                continue
+            option = self.get_option(slot, *reforge)
+            self.base_stats[option[0]] += option[2]
+            self.base_stats[option[1]] -= option[2]
+
+        self.workers = workers
+        self.weights = None
+        self.segments = None
+
+    def get_option(self, slot, from_stat, to_stat):
+        if slot not in self.options:
+            raise InvalidReforgeException(_('No item in slot {slot}').format(slot=slot))
+        for option in self.options[slot][1:]:
+            if option[:2] == (from_stat, to_stat):
+                return option
+        raise InvalidReforgeException(_('Can\'t reforge {from_stat} to {to_stat} in slot {slot}').format(from_stat=from_stat, to_stat=to_stat, slot=slot))
+
+    def get_stat_changes(self, reforges):
+        # Total rating change from reforges ({slot: (from_stat, to_stat) or
+        # None}) against unreforged items.
+        changes = dict((stat, 0) for stat in reforgable_stats)
+        for slot, reforge in reforges.iteritems():
+            if reforge is not None:
+                from_stat, to_stat, amount = self.get_option(slot, *reforge)
+                changes[from_stat] -= amount
+                changes[to_stat] += amount
+        return changes
+
+    def get_caps(self):
+        # Rating breakpoints: the yellow and dual wield hit caps, and the
+        # dodge and parry expertise caps for each hand.
+        calculator = self.calculator
+        stats = calculator.stats
+        hit_rating = 100 * stats.melee_hit_rating_conversion
+        exp_rating = 100 * stats.expertise_rating_conversion
+        bonus_hit = calculator.race.get_racial_hit() + calculator.get_melee_hit_from_talents() + calculator.run_isolated(get_hit_chance_bonus)
+        caps = {
+            'yellow_hit': max(calculator.base_one_hand_miss_rate - bonus_hit, 0) * hit_rating,
+            'white_hit': max(calculator.base_dw_miss_rate - bonus_hit, 0) * hit_rating
+        }
+        for hand in ('mh', 'oh'):
+            racial_expertise = calculator.race.get_racial_expertise(getattr(stats, hand).type)
+            caps[hand + '_dodge_exp'] = max(calculator.base_dodge_chance - racial_expertise, 0) * exp_rating
+            caps[hand + '_parry_exp'] = max(calculator.base_dodge_chance + calculator.base_parry_chance - racial_expertise, 0) * exp_rating
+        return caps
+
+    def get_segments(self, weights):
+        caps = self.get_caps()
+        segments = {'hit': [(caps['yellow_hit'], weights['yellow_hit']), (caps['white_hit'], weights['white_hit'])]}
+        # Past one hand's cap expertise is only worth half as much, until the
+        # other hand's.
+        exp_segments = []
+        for kind in ('dodge_exp', 'parry_exp'):
+            bounds = sorted([caps['mh_' + kind], caps['oh_' + kind]])
+            exp_segments.append((bounds[0], weights[kind]))
+            exp_segments.append((bounds[1], weights[kind] / 2))
+        segments['exp'] = exp_segments
+        return segments
+
+    def prepare(self):
+        if self.weights is None:
+            self.weights = self.calculator.get_ep(self.ep_stats, normalize_ep_stat='dps')
+            self.segments = self.get_segments(self.weights)
+
+    def linear_value(self, changes):
+        # Linearized DPS gain of changes over the unreforged items.
+        value = 0
+        for stat in self.linear_stats:
+            value += self.weights[stat] * changes[stat]
+        for stat in self.capped_stats:
+            value += capped_value(self.base_stats[stat] + changes[stat], self.segments[stat])
+        return value
+
+    def get_moves(self, choices, capped_only=False):
+        # Every single-slot change to choices, as (slot, option, changes).
+        changes = self.get_changes(choices)
+        moves = []
+        for slot in self.slots:
+            current = choices[slot]
+            for option in self.options[slot]:
+                if option == current:
+                    continue
+                moved = dict(changes)
+                for reforge, sign in ((current, -1), (option, 1)):
+                    if reforge is not None:
+                        from_stat, to_stat, amount = reforge
+                        moved[from_stat] -= sign * amount
+                        moved[to_stat] += sign * amount
+                if capped_only and moved['hit'] == changes['hit'] and moved['exp'] == changes['exp']:
+                    continue
+                moves.append((slot, option, moved))
+        return moves
+
+    def get_changes(self, choices):
+        changes = dict((stat, 0) for stat in reforgable_stats)
+        for option in choices.itervalues():
+            if option is not None:
+                from_stat, to_stat, amount = option
+                changes[from_stat] -= amount
+                changes[to_stat] += amount
+        return changes
+
+    def solve_linear(self, choices=None):
+        # Hill-climbs the linearized problem from choices (no reforges by
+        # default) and returns the choices it ends on.
+        self.prepare()
+        if choices is None:
+            choices = dict((slot, None) for slot in self.slots)
+        choices = dict(choices)
+        value = self.linear_value(self.get_changes(choices))
+        while True:
+            best = None
+            for slot, option, moved in self.get_moves(choices):
+                moved_value = self.linear_value(moved)
+                if moved_value > value + 1e-9 and (best is None or moved_value > best[0]):
+                    best = (moved_value, ((slot, option),))
+            if best is None:
+                # No single change helps: try moving hit or expertise from
+                # one slot to another.
+                capped_moves = self.get_moves(choices, capped_only=True)
+                changes = self.get_changes(choices)
+                for i, (slot, option, moved) in enumerate(capped_moves):
+                    for other_slot, other_option, other_moved in capped_moves[i + 1:]:
+                        if other_slot == slot:
+                            continue
+                        both = dict((stat, moved[stat] + other_moved[stat] - changes[stat]) for stat in reforgable_stats)
+                        moved_value = self.linear_value(both)
+                        if moved_value > value + 1e-9 and (best is None or moved_value > best[0]):
+                            best = (moved_value, ((slot, option), (other_slot, other_option)))
+            if best is None:
+                return choices
+            value = best[0]
+            for slot, option in best[1]:
+                choices[slot] = option
+
+    def get_delta(self, choices):
+        changes = self.get_changes(choices)
+        stats = self.calculator.stats
+        increments = {}
+        for stat in reforgable_stats:
+            increments[stat] = self.base_stats[stat] + changes[stat] - getattr(stats, stat)
+        return what_if.Delta(stats=increments)
+
+    def refine(self, choices):
+        # Exact hill climb over the changes to hit and expertise the linear
+        # model rates best. Returns (dps, choices).
+        dps = self.calculator.evaluate(self.get_delta(choices))
+        for i in xrange(self.refine_rounds):
+            moves = self.get_moves(choices, capped_only=True)
+            moves.sort(key=lambda move: -self.linear_value(move[2]))
+            moves = moves[:self.refine_width]
+            if not moves:
+                break
+            candidates = []
+            for slot, option, moved in moves:
+                candidate = dict(choices)
+                candidate[slot] = option
+                candidates.append(candidate)
+            dps_values = self.calculator.evaluate_deltas([self.get_delta(candidate) for candidate in candidates], workers=self.workers)
+            best = max(xrange(len(candidates)), key=lambda j: dps_values[j])
+            if dps_values[best] <= dps:
+                break
+            dps = dps_values[best]
+            choices = candidates[best]
+        return dps, choices
+
+    def optimize(self):
+        # Returns (dps, reforges), reforges being {slot: (from_stat, to_stat)
+        # or None} for every item.
+        dps, choices = self.refine(self.solve_linear())
+        reforges = {}
+        for slot in self.slots:
+            option = choices[slot]
+            if option is not None:
+                option = option[:2]
+            reforges[slot] = option
+        return dps, reforges
@@ -2,10 +2,15 @@ import copy
 import gettext
 import __builtin__
 import math
+import operator
 
 __builtin__._ = gettext.gettext
 
+from shadowcraft.calcs import cache
+from shadowcraft.calcs import fixed_point
 from shadowcraft.calcs.rogue import RogueDamageCalculator
+from shadowcraft.calcs.rogue import combo_points
+from shadowcraft.calcs.rogue import triggers
 from shadowcraft.core import exceptions
 from shadowcraft.objects import procs
 from shadowcraft.objects import proc_data
@@ -24,6 +29,12 @@ class AldrianasRogueDamageCalculator(RogueDamageCalculator):
 
     def get_dps(self):
         super(AldrianasRogueDamageCalculator, self).get_dps()
+        return self.get_cached_result('dps', operator.methodcaller('compute_dps'))
+
+    def get_dps_breakdown(self):
+        return self.get_cached_result('dps_breakdown', operator.methodcaller('compute_dps_breakdown'))
+
+    def compute_dps(self):
         if self.settings.is_assassination_rogue():
             self.init_assassination()
             return self.assassination_dps_estimate()
@@ -34,7 +45,7 @@ class AldrianasRogueDamageCalculator(RogueDamageCalculator):
         else:
             raise InputNotModeledException(_('You must specify a spec.'))
 
-    def get_dps_breakdown(self):
+    def compute_dps_breakdown(self):
         if self.settings.is_assassination_rogue():
             self.init_assassination()
             return self.assassination_dps_breakdown()
@@ -51,6 +62,18 @@ class AldrianasRogueDamageCalculator(RogueDamageCalculator):
 
     PRECISION_REQUIRED = 10 ** -7
 
+    # The fixed_point.FixedPointSolver that determine_stats iterates with,
+    # made per calculator by get_solver; the copies get_ep evaluates share
+    # their calculator's. The default is cold and unaccelerated: the rogue
+    # solves converge in one or two steps, so neither warm_start nor
+    # acceleration has much to gain here.
+    solver = None
+
+    def get_solver(self):
+        if self.solver is None:
+            self.solver = fixed_point.FixedPointSolver(max_iterations=20, precision=self.PRECISION_REQUIRED)
+        return self.solver
+
     def are_close_enough(self, old_dist, new_dist, precision=PRECISION_REQUIRED):
         for item in new_dist:
             if item not in old_dist:
@@ -125,48 +148,24 @@ class AldrianasRogueDamageCalculator(RogueDamageCalculator):
         # Just average-casing for now.  Should fix that at some point.
         return 1 + .3 * self.heroism_uptime_per_fight()
 
-    def get_cp_distribution_for_cycle(self, cp_distribution_per_move, target_cp_quantity):
-        avg_cp_per_cpg = sum([key * cp_distribution_per_move[key] for key in cp_distribution_per_move])
-        if self.talents.anticipation:
-            # TODO: The combat model is not yet updated to figure the distribution
-            dist = {(5, 5 / avg_cp_per_cpg): 1}
-            time_spent_at_cp = [0, 0, 0, 0, 0, 1]
-            return dist, time_spent_at_cp, avg_cp_per_cpg
-
-        time_spent_at_cp = [0, 0, 0, 0, 0, 0]
-        cur_min_cp = 0
-        cur_dist = {(0, 0): 1}
-        while cur_min_cp < target_cp_quantity:
-            cur_min_cp += 1
-
-            new_dist = {}
-            for (cps, moves), prob in cur_dist.items():
-                if cps >= cur_min_cp:
-                    if (cps, moves) in new_dist:
-                        new_dist[(cps, moves)] += prob
-                    else:
-                        new_dist[(cps, moves)] = prob
-                else:
-                    for (move_cp, move_prob) in cp_distribution_per_move.items():
-                        total_cps = cps + move_cp
-                        if total_cps > 5:
-                            total_cps = 5
-                        dist_entry = (total_cps, moves + 1)
-                        time_spent_at_cp[total_cps] += move_prob * prob
-                        if dist_entry in new_dist:
-                            new_dist[dist_entry] += move_prob * prob
-                        else:
-                            new_dist[dist_entry] = move_prob * prob
-            cur_dist = new_dist
-
-        for (cps, moves), prob in cur_dist.items():
-            time_spent_at_cp[cps] += prob
-
-        total_weight = sum(time_spent_at_cp)
-        for i in xrange(6):
-            time_spent_at_cp[i] /= total_weight
+    # Combo point distributions depend only on their arguments and the
+    # anticipation talent, and the same few come up on every fixed-point
+    # iteration, so they are shared by all calculators in the process.
+    cp_distribution_cache = cache.ResultCache(1024)
 
-        return cur_dist, time_spent_at_cp, avg_cp_per_cpg
+    def get_cp_distribution_for_cycle(self, cp_distribution_per_move, target_cp_quantity):
+        anticipation = bool(self.talents.anticipation)
+        if isinstance(self.calculating_ep, frozenset):
+            # Probabilities carrying derivatives (get_ep_ad) would collide
+            # with plain floats in the cache.
+            return combo_points.cycle_distribution(cp_distribution_per_move, target_cp_quantity, anticipation)
+        key = (tuple(sorted(cp_distribution_per_move.items())), target_cp_quantity, anticipation)
+        result = self.cp_distribution_cache.get(key)
+        if result is None:
+            result = combo_points.cycle_distribution(cp_distribution_per_move, target_cp_quantity, anticipation)
+            self.cp_distribution_cache.put(key, result)
+        dist, time_spent_at_cp, avg_cp_per_cpg = result
+        return dict(dist), list(time_spent_at_cp), avg_cp_per_cpg
 
     def get_cp_per_cpg(self, base_cp_per_cpg=1, *probs):
         # Computes the combined probabilites of getting an additional cp from
@@ -249,7 +248,7 @@ class AldrianasRogueDamageCalculator(RogueDamageCalculator):
                 self.base_stats[boost['stat']] += boost['value'] * boost['duration'] * 1.0 / (boost['cooldown'] + self.settings.response_time)
 
         if getattr(self.stats.gear_buffs, 'synapse_springs'):
-            self.stats.gear_buffs.activated_boosts['synapse_springs']['stat'] = 'agi'
+            self.stats.gear_buffs.activated_boosts.writable('synapse_springs')['stat'] = 'agi'
         for proc in self.stats.procs.get_all_procs_for_stat('highest'):
             if 'agi' in proc.stats:
                 proc.stat = 'agi'
@@ -740,111 +739,12 @@ class AldrianasRogueDamageCalculator(RogueDamageCalculator):
             attacks_per_second['main_gauche'] = main_gauche_proc_rate * (attacks_per_second['mh_autoattack_hits'] + attacks_per_second['mh_shadow_blade'])
         
     def get_rppm_trinket_triggers_per_second(self, attacks_per_second, crit_rates, proc):
-        triggers_per_second = 0
-        if proc.procs_off_auto_attacks():
-            if proc.procs_off_crit_only():
-                if 'mh_autoattacks' in attacks_per_second:
-                    triggers_per_second += attacks_per_second['mh_autoattacks'] * crit_rates['mh_autoattacks']
-            else:
-                if 'mh_autoattack_hits' in attacks_per_second:
-                    triggers_per_second += attacks_per_second['mh_autoattack_hits']
-        if proc.procs_off_strikes():
-            for ability in ('mutilate', 'dispatch', 'backstab', 'revealing_strike', 'sinister_strike', 'ambush', 'hemorrhage', 'mh_killing_spree', 'main_gauche', 'mh_shadow_blade', 'shuriken_toss'):
-                if ability == 'main_gauche' and not proc.procs_off_procced_strikes():
-                    pass
-                elif ability in attacks_per_second:
-                    if proc.procs_off_crit_only():
-                        triggers_per_second += attacks_per_second[ability] * crit_rates[ability]
-                    else:
-                        triggers_per_second += attacks_per_second[ability]
-            for ability in ('envenom', 'eviscerate'):
-                if ability in attacks_per_second:
-                    if proc.procs_off_crit_only():
-                        triggers_per_second += sum(attacks_per_second[ability]) * crit_rates[ability]
-                    else:
-                        triggers_per_second += sum(attacks_per_second[ability])
-        if proc.procs_off_apply_debuff() and not proc.procs_off_crit_only():
-            if 'rupture' in attacks_per_second:
-                triggers_per_second += attacks_per_second['rupture']
-            if 'garrote' in attacks_per_second:
-                triggers_per_second += attacks_per_second['garrote']
-            if 'hemorrhage_ticks' in attacks_per_second:
-                triggers_per_second += attacks_per_second['hemorrhage']
-        if proc.procs_off_auto_attacks():
-            if proc.procs_off_crit_only():
-                if 'oh_autoattacks' in attacks_per_second:
-                    triggers_per_second += attacks_per_second['oh_autoattacks'] * crit_rates['oh_autoattacks']
-            else:
-                if 'oh_autoattack_hits' in attacks_per_second:
-                    triggers_per_second += attacks_per_second['oh_autoattack_hits']
-        if proc.procs_off_strikes():
-            for ability in ('mutilate', 'oh_killing_spree', 'oh_shadow_blade'):
-                if ability in attacks_per_second:
-                    if proc.procs_off_crit_only():
-                        triggers_per_second += attacks_per_second[ability] * crit_rates[ability]
-                    else:
-                        triggers_per_second += attacks_per_second[ability]
-        if proc.procs_off_harmful_spells():
-            for ability in ('instant_poison', 'wound_poison', 'venomous_wounds'):
-                if ability in attacks_per_second:
-                    if proc.procs_off_crit_only():
-                        triggers_per_second += attacks_per_second[ability] * crit_rates[ability]
-                    else:
-                        triggers_per_second += attacks_per_second[ability]
-        if proc.procs_off_periodic_spell_damage():
-            if 'deadly_poison' in attacks_per_second:
-                if proc.procs_off_crit_only():
-                    triggers_per_second += attacks_per_second['deadly_poison'] * crit_rates['deadly_poison']
-                else:
-                    triggers_per_second += attacks_per_second['deadly_poison']
-        if proc.procs_off_bleeds():
-            if 'rupture_ticks' in attacks_per_second:
-                if proc.procs_off_crit_only():
-                    triggers_per_second += sum(attacks_per_second['rupture_ticks']) * crit_rates['rupture']
-                else:
-                    triggers_per_second += sum(attacks_per_second['rupture_ticks'])
-            if 'garrote_ticks' in attacks_per_second:
-                if proc.procs_off_crit_only():
-                    triggers_per_second += attacks_per_second['garrote_ticks'] * crit_rates['garrote']
-                else:
-                    triggers_per_second += attacks_per_second['garrote_ticks']
-            if 'hemorrhage_ticks' in attacks_per_second and not proc.procs_off_crit_only():
-                triggers_per_second += attacks_per_second['hemorrhage_ticks']
-        return triggers_per_second
+        return triggers.triggers_per_second(triggers.get_weights(proc, 'rppm_trinket'), attacks_per_second, crit_rates)
 
     def get_mh_procs_per_second(self, proc, attacks_per_second, crit_rates):
         if proc.is_real_ppm():
             return proc.proc_rate(haste=self.buffs.spell_haste_multiplier() * self.true_haste_mod * self.stats.get_haste_multiplier_from_rating(self.base_stats['haste']))
-        triggers_per_second = 0
-        if proc.procs_off_auto_attacks():
-            if proc.procs_off_crit_only():
-                if 'mh_autoattacks' in attacks_per_second:
-                    triggers_per_second += attacks_per_second['mh_autoattacks'] * crit_rates['mh_autoattacks']
-            else:
-                if 'mh_autoattack_hits' in attacks_per_second:
-                    triggers_per_second += attacks_per_second['mh_autoattack_hits']
-        if proc.procs_off_strikes():
-            for ability in ('mutilate', 'dispatch', 'backstab', 'revealing_strike', 'sinister_strike', 'ambush', 'hemorrhage', 'mh_killing_spree', 'main_gauche', 'mh_shadow_blade', 'shuriken_toss'):
-                if ability == 'main_gauche' and not proc.procs_off_procced_strikes():
-                    pass
-                elif ability in attacks_per_second:
-                    if proc.procs_off_crit_only():
-                        triggers_per_second += attacks_per_second[ability] * crit_rates[ability]
-                    else:
-                        triggers_per_second += attacks_per_second[ability]
-            for ability in ('envenom', 'eviscerate'):
-                if ability in attacks_per_second:
-                    if proc.procs_off_crit_only():
-                        triggers_per_second += sum(attacks_per_second[ability]) * crit_rates[ability]
-                    else:
-                        triggers_per_second += sum(attacks_per_second[ability])
-        if proc.procs_off_apply_debuff() and not proc.procs_off_crit_only():
-            if 'rupture' in attacks_per_second:
-                triggers_per_second += attacks_per_second['rupture']
-            if 'garrote' in attacks_per_second:
-                triggers_per_second += attacks_per_second['garrote']
-            if 'hemorrhage_ticks' in attacks_per_second:
-                triggers_per_second += attacks_per_second['hemorrhage']
+        triggers_per_second = triggers.triggers_per_second(triggers.get_weights(proc, 'mh'), attacks_per_second, crit_rates)
         return triggers_per_second * proc.proc_rate(self.stats.mh.speed)
 
     def get_oh_procs_per_second(self, proc, attacks_per_second, crit_rates):
@@ -852,21 +752,7 @@ class AldrianasRogueDamageCalculator(RogueDamageCalculator):
             return proc.proc_rate(haste=self.buffs.spell_haste_multiplier() * self.true_haste_mod * self.stats.get_haste_multiplier_from_rating(self.base_stats['haste']))
         elif proc.is_real_ppm():
             return 0
-        triggers_per_second = 0
-        if proc.procs_off_auto_attacks():
-            if proc.procs_off_crit_only():
-                if 'oh_autoattacks' in attacks_per_second:
-                    triggers_per_second += attacks_per_second['oh_autoattacks'] * crit_rates['oh_autoattacks']
-            else:
-                if 'oh_autoattack_hits' in attacks_per_second:
-                    triggers_per_second += attacks_per_second['oh_autoattack_hits']
-        if proc.procs_off_strikes():
-            for ability in ('mutilate', 'oh_killing_spree', 'oh_shadow_blade'):
-                if ability in attacks_per_second:
-                    if proc.procs_off_crit_only():
-                        triggers_per_second += attacks_per_second[ability] * crit_rates[ability]
-                    else:
-                        triggers_per_second += attacks_per_second[ability]
+        triggers_per_second = triggers.triggers_per_second(triggers.get_weights(proc, 'oh'), attacks_per_second, crit_rates)
         return triggers_per_second * proc.proc_rate(self.stats.oh.speed)
 
     def get_other_procs_per_second(self, proc, attacks_per_second, crit_rates):
@@ -874,33 +760,7 @@ class AldrianasRogueDamageCalculator(RogueDamageCalculator):
             return proc.proc_rate()
         elif proc.is_real_ppm():
             return 0
-        triggers_per_second = 0
-        if proc.procs_off_harmful_spells():
-            for ability in ('instant_poison', 'wound_poison', 'venomous_wounds'):
-                if ability in attacks_per_second:
-                    if proc.procs_off_crit_only():
-                        triggers_per_second += attacks_per_second[ability] * crit_rates[ability]
-                    else:
-                        triggers_per_second += attacks_per_second[ability]
-        if proc.procs_off_periodic_spell_damage():
-            if 'deadly_poison' in attacks_per_second:
-                if proc.procs_off_crit_only():
-                    triggers_per_second += attacks_per_second['deadly_poison'] * crit_rates['deadly_poison']
-                else:
-                    triggers_per_second += attacks_per_second['deadly_poison']
-        if proc.procs_off_bleeds():
-            if 'rupture_ticks' in attacks_per_second:
-                if proc.procs_off_crit_only():
-                    triggers_per_second += sum(attacks_per_second['rupture_ticks']) * crit_rates['rupture']
-                else:
-                    triggers_per_second += sum(attacks_per_second['rupture_ticks'])
-            if 'garrote_ticks' in attacks_per_second:
-                if proc.procs_off_crit_only():
-                    triggers_per_second += attacks_per_second['garrote_ticks'] * crit_rates['garrote']
-                else:
-                    triggers_per_second += attacks_per_second['garrote_ticks']
-            if 'hemorrhage_ticks' in attacks_per_second and not proc.procs_off_crit_only():
-                triggers_per_second += attacks_per_second['hemorrhage_ticks']
+        triggers_per_second = triggers.triggers_per_second(triggers.get_weights(proc, 'other'), attacks_per_second, crit_rates)
         if proc.is_ppm():
             if triggers_per_second == 0:
                 return 0
@@ -1192,9 +1052,10 @@ class AldrianasRogueDamageCalculator(RogueDamageCalculator):
                     elif enchant == 'avalanche':
                         damage_procs.append(spell_component)
 
-        attacks_per_second, crit_rates = attack_counts_function(current_stats)
+        def initial():
+            return attack_counts_function(current_stats)
 
-        for _loop in range(20):
+        def step(attacks_per_second, crit_rates):
             current_stats = {
                 'agi': self.base_stats['agi'] * self.agi_multiplier * self.stats.agi_mod,
                 'ap': self.base_stats['ap'] * self.stats.ap_mod,
@@ -1247,12 +1108,15 @@ class AldrianasRogueDamageCalculator(RogueDamageCalculator):
                 for stat in stats:
                     current_stats[stat] += proc.uptime * proc.value * self.get_stat_mod(stat)
             
-            old_attacks_per_second = attacks_per_second
             attacks_per_second, crit_rates = attack_counts_function(current_stats)
+            return current_stats, attacks_per_second, crit_rates
+
+        # Rates carrying derivatives (get_ep_ad sets calculating_ep to a
+        # frozenset) are solved cold and plain so the derivatives converge
+        # along with the values.
+        accelerate = not isinstance(self.calculating_ep, frozenset)
+        current_stats, attacks_per_second, crit_rates = self.get_solver().solve(attack_counts_function.__name__, initial, step, accelerate)
 
-            if self.are_close_enough(old_attacks_per_second, attacks_per_second):
-                break
-            
         for proc in active_procs:
             if proc.icd:
                 self.set_uptime(proc, attacks_per_second, crit_rates)
@@ -1328,11 +1192,10 @@ class AldrianasRogueDamageCalculator(RogueDamageCalculator):
     ###########################################################################
 
     def init_assassination(self):
-        # Call this before calling any of the assassination_dps functions
-        # directly.  If you're just calling get_dps, you can ignore this as it
-        # happens automatically; however, if you're going to pull a damage
-        # breakdown or other sub-result, make sure to call this, as it
-        # initializes many values that are needed to perform the calculations.
+        # Initializes many values that are needed to perform the assassination
+        # calculations. get_dps and the phase breakdowns call it themselves,
+        # on the copy of the calculator they evaluate (see run_isolated), so
+        # there's no need to call it before pulling a damage breakdown.
 
         if not self.settings.is_assassination_rogue():
             raise InputNotModeledException(_('You must specify an assassination cycle to match your assassination spec.'))
@@ -1401,15 +1264,25 @@ class AldrianasRogueDamageCalculator(RogueDamageCalculator):
                 damage_breakdown[key] *= self.vendetta_mult
 
     def assassination_dps_breakdown_non_execute(self):
-        damage_breakdown = self.compute_damage(self.assassination_attack_counts_non_execute)
-        self.update_damage_breakdown_for_vendetta(damage_breakdown)
-        return damage_breakdown
+        return self.assassination_phase_breakdown(self.assassination_attack_counts_non_execute)
 
     def assassination_dps_breakdown_execute(self):
-        damage_breakdown = self.compute_damage(self.assassination_attack_counts_execute)
+        return self.assassination_phase_breakdown(self.assassination_attack_counts_execute)
+
+    def assassination_phase_breakdown(self, attack_counts_function):
+        # Called from outside an evaluation, the phase gets one of its own.
+        if not self.isolated:
+            return self.run_isolated(operator.methodcaller('evaluate_assassination_phase', attack_counts_function.__name__))
+        damage_breakdown = self.compute_damage(attack_counts_function)
         self.update_damage_breakdown_for_vendetta(damage_breakdown)
         return damage_breakdown
 
+    def evaluate_assassination_phase(self, attack_counts_name):
+        # Runs on an evaluation copy, so the attack counts function is looked
+        # up again on it rather than taken bound to the caller's calculator.
+        self.init_assassination()
+        return self.assassination_phase_breakdown(getattr(self, attack_counts_name))
+
     def assassination_attack_counts(self, current_stats, cpg, finisher_size):
         attacks_per_second = {}
         crit_rates = self.get_crit_rates(current_stats)
@@ -2148,7 +2021,7 @@ class AldrianasRogueDamageCalculator(RogueDamageCalculator):
         er_energy = 8. / 2 #8 energy every 2 seconds
         fw_duration = 10 #17.5s
         attacks_per_second['eviscerate'] = 0
-        shd_cd = 60 + self.settings.response_time + self.settings.adv_params['major_cd_delay']
+        shd_cd = 60 + self.settings.response_time + self.major_cd_delay
         cp_per_ambush = 2
         cp_per_cpg = 1
         if self.settings.cycle.stack_cds:
@@ -0,0 +1,160 @@
+import copy
+import itertools
+import multiprocessing
+
+from shadowcraft.calcs import cache
+from shadowcraft.calcs.rogue.Aldriana import settings
+from shadowcraft.core import exceptions
+
+# Finds the cycle settings that maximize a character's DPS. The discrete
+# choices of the character's spec are enumerated:
+#
+#     assassination  min_envenom_size_non_execute/execute,
+#                    prioritize_rupture_uptime_non_execute/execute, stack_cds
+#     combat         use_rupture, ksp_immediately, revealing_strike_pooling,
+#                    stack_cds
+#     subtlety       stack_cds, and use_hemorrhage 'always', 'never' or an
+#                    interval
+#
+# The hemorrhage interval is searched within hemorrhage_bounds: a grid of
+# grid_points intervals is evaluated, the bracket narrowed to the neighbours
+# of the best one, and so on until it is under tolerance seconds wide.
+# Encounter facts (blade_flurry, bf_targets, raid_crits_per_second) are kept
+# from the calculator's cycle. Every candidate is evaluated on a copy of the
+# calculator, memoized by its settings for the life of the tuner, and
+# workers > 1 spreads each batch of candidates over a process pool. Cycles
+# the model rejects (with an InvalidInputException) are skipped and the
+# reason kept in errors; any other exception is a bug in the model and ends
+# the search.
+
+def _pooled_cycle_helper(args):
+    # Runs in a worker process on its own pickled copy of the calculator.
+    calculator, cycles = args
+    return evaluate_cycles(calculator, cycles)
+
+def evaluate_cycles(calculator, cycles):
+    # (dps, error) for each cycle. dps is None for cycles the model rejects,
+    # and error the reason it gave.
+    results = []
+    for cycle in cycles:
+        candidate = calculator.what_if_copy()
+        candidate.settings = copy.copy(calculator.settings)
+        candidate.settings.cycle = cycle
+        try:
+            results.append((candidate.get_dps(), None))
+        except exceptions.InvalidInputException as e:
+            results.append((None, e.error_msg))
+    return results
+
+class CycleTuner(object):
+    choices = (True, False)
+
+    def __init__(self, calculator, workers=None, hemorrhage_bounds=(2., 24.), tolerance=.5, grid_points=5):
+        lower, upper = hemorrhage_bounds
+        upper = min(upper, calculator.settings.duration)
+        if lower <= 0 or lower >= upper:
+            raise exceptions.InvalidInputException(_('Hemorrhage bounds must be positive and no higher than the fight duration'))
+        if grid_points < 3:
+            raise exceptions.InvalidInputException(_('The hemorrhage search needs at least 3 grid points'))
+        self.calculator = calculator
+        self.workers = workers
+        self.hemorrhage_bounds = (float(lower), float(upper))
+        self.tolerance = tolerance
+        self.grid_points = grid_points
+        self.spec = calculator.settings.get_spec()
+        self.evaluated = {}
+        self.errors = {}
+
+    def get_cycles(self):
+        # Every discrete candidate for the calculator's spec.
+        current = self.calculator.settings.cycle
+        cycles = []
+        if self.spec == 'assassination':
+            values = settings.AssassinationCycle.allowed_values
+            for non_execute, execute, uptime_non_execute, uptime_execute, stack_cds in itertools.product(values, values, self.choices, self.choices, self.choices):
+                cycles.append(settings.AssassinationCycle(non_execute, execute, uptime_non_execute, uptime_execute, stack_cds))
+        elif self.spec == 'combat':
+            for use_rupture, ksp_immediately, revealing_strike_pooling, stack_cds in itertools.product(self.choices, repeat=4):
+                cycles.append(settings.CombatCycle(use_rupture, ksp_immediately, revealing_strike_pooling, current.blade_flurry, stack_cds, current.bf_targets))
+        elif self.spec == 'subtlety':
+            for stack_cds in self.choices:
+                for use_hemorrhage in ('always', 'never'):
+                    cycles.append(settings.SubtletyCycle(current.raid_crits_per_second, use_hemorrhage, stack_cds))
+        else:
+            raise exceptions.InvalidInputException(_('No cycle tuning for {spec}').format(spec=self.spec))
+        return cycles
+
+    def evaluate(self, cycles, pool=None):
+        # DPS for each of cycles, evaluating only the ones not seen before.
+        pending = []
+        pending_keys = set()
+        keys = [cache.canonical(cycle) for cycle in cycles]
+        for key, cycle in zip(keys, cycles):
+            if key not in self.evaluated and key not in pending_keys:
+                pending_keys.add(key)
+                pending.append(cycle)
+        if pending:
+            if pool is not None and len(pending) > 1:
+                chunks = [pending[i::self.workers] for i in xrange(self.workers)]
+                chunk_results = pool.map(_pooled_cycle_helper, [(self.calculator, chunk) for chunk in chunks if chunk], 1)
+                results = []
+                for chunk, chunk_result in zip(chunks, chunk_results):
+                    results.extend(zip(chunk, chunk_result))
+            else:
+                results = zip(pending, evaluate_cycles(self.calculator, pending))
+            for cycle, (dps, error) in results:
+                key = cache.canonical(cycle)
+                self.evaluated[key] = (dps, cycle)
+                if error is not None:
+                    self.errors[key] = error
+        return [self.evaluated[key][0] for key in keys]
+
+    def search_hemorrhage_interval(self, stack_cds, pool=None):
+        # Narrows the hemorrhage interval bracket around the best grid point.
+        raid_crits_per_second = self.calculator.settings.cycle.raid_crits_per_second
+        lower, upper = self.hemorrhage_bounds
+        while True:
+            step = (upper - lower) / (self.grid_points - 1)
+            intervals = [round(lower + i * step, 2) for i in xrange(self.grid_points)]
+            cycles = [settings.SubtletyCycle(raid_crits_per_second, '%g' % interval, stack_cds) for interval in intervals]
+            dps_values = self.evaluate(cycles, pool)
+            scored = [i for i in xrange(self.grid_points) if dps_values[i] is not None]
+            if not scored:
+                return
+            best = max(scored, key=lambda i: dps_values[i])
+            lower = intervals[max(best - 1, 0)]
+            upper = intervals[min(best + 1, self.grid_points - 1)]
+            if upper - lower <= self.tolerance:
+                return
+
+    def tune(self):
+        # Returns (dps, cycle) for the best cycle found.
+        pool = None
+        if self.workers and self.workers > 1:
+            pool = multiprocessing.Pool(self.workers)
+        try:
+            self.evaluate(self.get_cycles(), pool)
+            if self.spec == 'subtlety':
+                for stack_cds in self.choices:
+                    self.search_hemorrhage_interval(stack_cds, pool)
+        finally:
+            if pool is not None:
+                pool.close()
+                pool.join()
+
+        results = [(dps, cycle) for dps, cycle in self.evaluated.itervalues() if dps is not None]
+        if not results:
+            if self.errors:
+                raise exceptions.InvalidInputException(_('The model rejected every {spec} cycle: {error}').format(spec=self.spec, error=sorted(self.errors.values())[0]))
+            raise exceptions.InvalidInputException(_('The model rejected every {spec} cycle').format(spec=self.spec))
+        # On ties the calculator's own cycle wins.
+        current = cache.canonical(self.calculator.settings.cycle)
+        return max(results, key=lambda result: (result[0], cache.canonical(result[1]) == current, cache.canonical(result[1])))
+
+def tune_cycles(calculators, **options):
+    # The best (dps, cycle) for each of calculators, a dict of character name
+    # to calculator.
+    results = {}
+    for name in sorted(calculators):
+        results[name] = CycleTuner(calculators[name], **options).tune()
+    return results
@@ -80,44 +80,51 @@ class RogueDamageCalculator(DamageCalculator):
 
     def _set_constants_for_level(self):
         super(RogueDamageCalculator, self)._set_constants_for_level()
-        self.agi_per_crit = self.tools.get_agi_per_crit('rogue', self.level) * 100
         # We only check race here (instead of calcs) because we can assume it's an agi food buff and it applies to every possible rogue calc
         # Otherwise we would be obligated to have a series of conditions to check for classes
         if self.race.epicurean:
             self.stats.agi += self.buffs.buff_agi(just_food=True)
         if self.settings.is_pvp:
-            self.default_ep_stats.append('pvp_power')
+            self.default_ep_stats = self.default_ep_stats + ['pvp_power']
+
+    def build_level_constants(self):
+        level_constants = super(RogueDamageCalculator, self).build_level_constants()
+        level_constants['agi_per_crit'] = self.tools.get_agi_per_crit('rogue', self.level) * 100
 
         # These factors are taken from sc_spell_data.inc in SimulationCraft.
         # At some point we should automate the process to fetch them. Numbers
         # in comments show the id for the spell effect, not the spell itself,
         # unless otherwise stated.
-        self.spell_scaling_for_level = self.tools.get_spell_scaling('rogue', self.level)
-        self.bs_bonus_dmg =     self.get_factor(0.3070000112) # 30
-        self.dsp_bonus_dmg =    self.get_factor(0.4490000010) # 123503
-        self.mut_bonus_dmg =    self.get_factor(0.1790000051) # 1920, 17065
-        self.ss_bonus_dmg =     self.get_factor(0.1780000031) # 535
-        self.ambush_bonus_dmg = self.get_factor(0.5000000000) # 3612
-        self.vw_base_dmg =      self.get_factor(0.5500000119) # 68389
-        self.dp_base_dmg =      self.get_factor(0.6000000238) # 853
-        self.ip_base_dmg =      self.get_factor(0.3129999936, 0.2800000012) # 126788
-        self.wp_base_dmg =      self.get_factor(0.4169999957, 0.2800000012) # 3617
-        self.garrote_base_dmg = self.get_factor(0.1180000007) # 280
-        self.rup_base_dmg =     self.get_factor(0.1850000024) # 586
-        self.rup_bonus_dmg =    self.get_factor(0.0260000005) # 586 - 'unknown' field
-        self.evis_base_dmg =    self.get_factor(0.5336999953,  1.0000000000) # 622
-        self.evis_bonus_dmg =   self.get_factor(0.7860000134) # 622 - 'unknown' field
-        self.env_base_dmg =     self.get_factor(0.3849999905) # 22420
-        self.ct_base_dmg =      self.get_factor(0.4760000110) # 150471
-        self.fok_base_dmg =     self.get_factor(1.0000000000, 0.4000000060) # 44107
-        self.st_base_dmg =      self.get_factor(2.0000000000) # 127100
-        self.vw_percentage_dmg = .160 # spellID 79136
-        self.dp_percentage_dmg = .213 # spellID 2818
-        self.wp_percentage_dmg = .120 # spellID 8680
-        self.ip_percentage_dmg = .109 # spellID 113780
-
-    def get_factor(self, avg, delta=0):
-        avg_for_level = avg * self.spell_scaling_for_level
+        scaling = self.tools.get_spell_scaling('rogue', self.level)
+        level_constants['spell_scaling_for_level'] = scaling
+        level_constants['bs_bonus_dmg'] =     self.get_factor(0.3070000112, spell_scaling=scaling) # 30
+        level_constants['dsp_bonus_dmg'] =    self.get_factor(0.4490000010, spell_scaling=scaling) # 123503
+        level_constants['mut_bonus_dmg'] =    self.get_factor(0.1790000051, spell_scaling=scaling) # 1920, 17065
+        level_constants['ss_bonus_dmg'] =     self.get_factor(0.1780000031, spell_scaling=scaling) # 535
+        level_constants['ambush_bonus_dmg'] = self.get_factor(0.5000000000, spell_scaling=scaling) # 3612
+        level_constants['vw_base_dmg'] =      self.get_factor(0.5500000119, spell_scaling=scaling) # 68389
+        level_constants['dp_base_dmg'] =      self.get_factor(0.6000000238, spell_scaling=scaling) # 853
+        level_constants['ip_base_dmg'] =      self.get_factor(0.3129999936, 0.2800000012, scaling) # 126788
+        level_constants['wp_base_dmg'] =      self.get_factor(0.4169999957, 0.2800000012, scaling) # 3617
+        level_constants['garrote_base_dmg'] = self.get_factor(0.1180000007, spell_scaling=scaling) # 280
+        level_constants['rup_base_dmg'] =     self.get_factor(0.1850000024, spell_scaling=scaling) # 586
+        level_constants['rup_bonus_dmg'] =    self.get_factor(0.0260000005, spell_scaling=scaling) # 586 - 'unknown' field
+        level_constants['evis_base_dmg'] =    self.get_factor(0.5336999953,  1.0000000000, scaling) # 622
+        level_constants['evis_bonus_dmg'] =   self.get_factor(0.7860000134, spell_scaling=scaling) # 622 - 'unknown' field
+        level_constants['env_base_dmg'] =     self.get_factor(0.3849999905, spell_scaling=scaling) # 22420
+        level_constants['ct_base_dmg'] =      self.get_factor(0.4760000110, spell_scaling=scaling) # 150471
+        level_constants['fok_base_dmg'] =     self.get_factor(1.0000000000, 0.4000000060, scaling) # 44107
+        level_constants['st_base_dmg'] =      self.get_factor(2.0000000000, spell_scaling=scaling) # 127100
+        level_constants['vw_percentage_dmg'] = .160 # spellID 79136
+        level_constants['dp_percentage_dmg'] = .213 # spellID 2818
+        level_constants['wp_percentage_dmg'] = .120 # spellID 8680
+        level_constants['ip_percentage_dmg'] = .109 # spellID 113780
+        return level_constants
+
+    def get_factor(self, avg, delta=0, spell_scaling=None):
+        if spell_scaling is None:
+            spell_scaling = self.spell_scaling_for_level
+        avg_for_level = avg * spell_scaling
         if delta == 0:
             return round(avg_for_level)
         else:
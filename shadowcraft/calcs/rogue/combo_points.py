@@ -0,0 +1,137 @@
+from shadowcraft.core import exceptions
+
+# Combo point accumulation as an absorbing Markov chain. The states are the
+# combo points on the target (0-5); each combo point generator moves the chain
+# along cp_distribution_per_move, capped at 5, and the states at or above the
+# target finisher size absorb. Every move gains at least one combo point, so
+# the chain is absorbed within target moves: stepping the transient
+# distribution that many times gives the exact joint distribution of
+# (finisher size, moves) with no iterative dict expansion.
+#
+# With anticipation, combo points past 5 are banked (up to 5 more) instead of
+# wasted, so a cycle starts from whatever the previous finisher left over.
+# The chain then runs over total combo points (0-10) and is weighted by the
+# stationary distribution of the carried-over points.
+
+MAX_CP = 5
+MAX_ANTICIPATION = 5
+
+def cycle_distribution(cp_distribution_per_move, target_cp_quantity, anticipation=False):
+    # Returns (dist, time_spent_at_cp, avg_cp_per_cpg) in the format of
+    # get_cp_distribution_for_cycle: dist maps (combo points, moves) to the
+    # probability of finishing that way.
+    avg_cp_per_cpg = sum([key * cp_distribution_per_move[key] for key in cp_distribution_per_move])
+    moves = sorted(cp_distribution_per_move.items())
+    if moves and moves[0][0] < 1:
+        raise exceptions.InvalidInputException(_('Every combo point generator has to add at least one combo point'))
+    if anticipation:
+        # Every finisher spends what it has banked, so the finisher sizes
+        # are the time spent at each combo point count.
+        dist = anticipation_distribution(moves, target_cp_quantity)
+        time_spent_at_cp = [0] * (MAX_CP + 1)
+        for (cps, step), prob in dist.items():
+            time_spent_at_cp[cps] += prob
+        total_weight = sum(time_spent_at_cp)
+        for i in xrange(MAX_CP + 1):
+            time_spent_at_cp[i] /= total_weight
+        return dist, time_spent_at_cp, avg_cp_per_cpg
+
+    # Targets past the cap can't be reached: the old round-by-round expansion
+    # spent one more move at 5 combo points for each missing point.
+    target = min(target_cp_quantity, MAX_CP)
+    extra_moves = max(target_cp_quantity - MAX_CP, 0)
+
+    time_spent_at_cp = [0] * (MAX_CP + 1)
+    dist = {}
+    transient = {}
+    if target > 0:
+        transient[0] = 1
+    step = 0
+    while transient:
+        step += 1
+        new_transient = {}
+        for cps in sorted(transient):
+            prob = transient[cps]
+            for move_cp, move_prob in moves:
+                total_cps = min(cps + move_cp, MAX_CP)
+                weight = move_prob * prob
+                time_spent_at_cp[total_cps] += weight
+                if total_cps >= target:
+                    dist[(total_cps, step)] = dist.get((total_cps, step), 0) + weight
+                else:
+                    new_transient[total_cps] = new_transient.get(total_cps, 0) + weight
+        transient = new_transient
+    if target <= 0:
+        dist[(0, 0)] = 1
+
+    if extra_moves:
+        shifted = {}
+        for (cps, step), prob in dist.items():
+            shifted[(MAX_CP, step + extra_moves)] = shifted.get((MAX_CP, step + extra_moves), 0) + prob
+        time_spent_at_cp[MAX_CP] += extra_moves * sum(dist.values())
+        dist = shifted
+
+    for (cps, step), prob in dist.items():
+        time_spent_at_cp[cps] += prob
+
+    total_weight = sum(time_spent_at_cp)
+    for i in xrange(MAX_CP + 1):
+        time_spent_at_cp[i] /= total_weight
+
+    return dist, time_spent_at_cp, avg_cp_per_cpg
+
+def anticipation_distribution(moves, target_cp_quantity):
+    # Finishers go off once combo points plus anticipation charges reach the
+    # target and spend up to 5 of them; the rest carries into the next cycle.
+    target = max(min(target_cp_quantity, MAX_CP), 1)
+    cap = MAX_CP + MAX_ANTICIPATION
+
+    # outcomes[carry] lists (total, moves, probability) for a cycle starting
+    # with carry combo points banked.
+    outcomes = {}
+    def get_outcomes(carry):
+        if carry in outcomes:
+            return outcomes[carry]
+        finished = []
+        transient = {carry: 1}
+        if carry >= target:
+            finished.append((carry, 0, 1))
+            transient = {}
+        step = 0
+        while transient:
+            step += 1
+            new_transient = {}
+            for cps in sorted(transient):
+                for move_cp, move_prob in moves:
+                    total_cps = min(cps + move_cp, cap)
+                    weight = move_prob * transient[cps]
+                    if total_cps >= target:
+                        finished.append((total_cps, step, weight))
+                    else:
+                        new_transient[total_cps] = new_transient.get(total_cps, 0) + weight
+            transient = new_transient
+        outcomes[carry] = finished
+        return finished
+
+    # The carry-over chain has at most a handful of states; iterate it to its
+    # stationary distribution. Half of each step stays put so that periodic
+    # chains (e.g. two combo points a move towards 5) converge as well.
+    stationary = {0: 1.}
+    for iteration in xrange(1000):
+        new_stationary = {}
+        for carry, prob in stationary.items():
+            new_stationary[carry] = new_stationary.get(carry, 0) + .5 * prob
+            for total_cps, step, weight in get_outcomes(carry):
+                left = min(total_cps - min(total_cps, MAX_CP), MAX_ANTICIPATION)
+                new_stationary[left] = new_stationary.get(left, 0) + .5 * prob * weight
+        difference = max([abs(new_stationary.get(carry, 0) - stationary.get(carry, 0)) for carry in set(stationary) | set(new_stationary)])
+        stationary = new_stationary
+        if difference < 10 ** -15:
+            break
+
+    dist = {}
+    for carry, prob in stationary.items():
+        for total_cps, step, weight in get_outcomes(carry):
+            key = (min(total_cps, MAX_CP), step)
+            dist[key] = dist.get(key, 0) + prob * weight
+    return dist
@@ -0,0 +1,107 @@
+# Proc trigger weights. Which attacks can trigger a proc depends only on its
+# behaviour (trigger, on_crit, on_procced_strikes), so the rules that used to
+# be re-evaluated for every proc on every fixed-point iteration are compiled
+# once per behaviour into a sparse weight vector over the ability names: a
+# tuple of (rate, condition, crit_rate, finisher) terms. The trigger rate is
+# then a single pass over the terms:
+#     sum(attacks_per_second[rate] * crit_rates[crit_rate])
+# where a term only counts when `condition` is in attacks_per_second, the crit
+# factor only applies to on-crit procs, and finisher rates are summed over
+# combo points first. Terms keep the order of the original rules, so the
+# floating point sums come out exactly as before.
+
+mh_strikes = ('mutilate', 'dispatch', 'backstab', 'revealing_strike', 'sinister_strike', 'ambush', 'hemorrhage', 'mh_killing_spree', 'main_gauche', 'mh_shadow_blade', 'shuriken_toss')
+mh_finishers = ('envenom', 'eviscerate')
+oh_strikes = ('mutilate', 'oh_killing_spree', 'oh_shadow_blade')
+harmful_spells = ('instant_poison', 'wound_poison', 'venomous_wounds')
+
+def mh_terms(proc):
+    terms = []
+    crit_only = proc.procs_off_crit_only()
+    if proc.procs_off_auto_attacks():
+        if crit_only:
+            terms.append(('mh_autoattacks', 'mh_autoattacks', 'mh_autoattacks', False))
+        else:
+            terms.append(('mh_autoattack_hits', 'mh_autoattack_hits', None, False))
+    if proc.procs_off_strikes():
+        for ability in mh_strikes:
+            if ability == 'main_gauche' and not proc.procs_off_procced_strikes():
+                continue
+            terms.append(crit_term(ability, crit_only))
+        for ability in mh_finishers:
+            terms.append(crit_term(ability, crit_only, finisher=True))
+    if proc.procs_off_apply_debuff() and not crit_only:
+        terms.append(('rupture', 'rupture', None, False))
+        terms.append(('garrote', 'garrote', None, False))
+        terms.append(('hemorrhage', 'hemorrhage_ticks', None, False))
+    return terms
+
+def oh_terms(proc):
+    terms = []
+    crit_only = proc.procs_off_crit_only()
+    if proc.procs_off_auto_attacks():
+        if crit_only:
+            terms.append(('oh_autoattacks', 'oh_autoattacks', 'oh_autoattacks', False))
+        else:
+            terms.append(('oh_autoattack_hits', 'oh_autoattack_hits', None, False))
+    if proc.procs_off_strikes():
+        for ability in oh_strikes:
+            terms.append(crit_term(ability, crit_only))
+    return terms
+
+def other_terms(proc):
+    terms = []
+    crit_only = proc.procs_off_crit_only()
+    if proc.procs_off_harmful_spells():
+        for ability in harmful_spells:
+            terms.append(crit_term(ability, crit_only))
+    if proc.procs_off_periodic_spell_damage():
+        terms.append(crit_term('deadly_poison', crit_only))
+    if proc.procs_off_bleeds():
+        # Bleed ticks take the crit rate of the bleed itself.
+        if crit_only:
+            terms.append(('rupture_ticks', 'rupture_ticks', 'rupture', True))
+            terms.append(('garrote_ticks', 'garrote_ticks', 'garrote', False))
+        else:
+            terms.append(('rupture_ticks', 'rupture_ticks', None, True))
+            terms.append(('garrote_ticks', 'garrote_ticks', None, False))
+            terms.append(('hemorrhage_ticks', 'hemorrhage_ticks', None, False))
+    return terms
+
+def crit_term(ability, crit_only, finisher=False):
+    if crit_only:
+        return (ability, ability, ability, finisher)
+    return (ability, ability, None, finisher)
+
+sections = {
+    'mh': (mh_terms,),
+    'oh': (oh_terms,),
+    'other': (other_terms,),
+    'rppm_trinket': (mh_terms, oh_terms, other_terms),
+}
+
+compiled = {}
+
+def get_weights(proc, section):
+    key = (section, proc.trigger, bool(proc.on_crit), bool(proc.on_procced_strikes))
+    weights = compiled.get(key)
+    if weights is None:
+        terms = []
+        for section_terms in sections[section]:
+            terms.extend(section_terms(proc))
+        weights = tuple(terms)
+        compiled[key] = weights
+    return weights
+
+def triggers_per_second(weights, attacks_per_second, crit_rates):
+    total = 0
+    for rate, condition, crit_rate, finisher in weights:
+        if condition in attacks_per_second:
+            if finisher:
+                value = sum(attacks_per_second[rate])
+            else:
+                value = attacks_per_second[rate]
+            if crit_rate is not None:
+                value = value * crit_rates[crit_rate]
+            total += value
+    return total
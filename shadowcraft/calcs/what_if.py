@@ -0,0 +1,152 @@
+from shadowcraft.core import exceptions
+from shadowcraft.objects import procs
+
+# Declarative what-if changes to a calculator's inputs. A Delta says what to
+# change (stat increments, procs and gear buffs on or off at some upgrade
+# level, enchant swaps, weapon changes, buff/talent/glyph flags) and
+# DamageCalculator.evaluate applies it to a throwaway copy of the calculator,
+# so the baseline is never touched: there is nothing to undo if the model
+# raises, and any number of deltas can be evaluated, cached or sent to worker
+# processes against the same baseline.
+#
+#     stats       {stat: increment}; the hit/expertise pseudo-stats (see
+#                 pseudo_stats) are valued through calculating_ep instead
+#     procs       {proc: state}
+#     gear_buffs  {gear buff: state}
+#     enchants    {'mh'/'oh': enchant name, or None for no enchant}
+#     weapons     {'mh'/'oh': {'weapon_dps'/'speed'/'type': new value}}
+#     buffs, talents, glyphs
+#                 {name: True/False}
+#
+# A proc or gear buff state is False/None (off), True (on, at the upgrade
+# level it has or would get from the data) or an upgrade level (on, at that
+# level).
+
+pseudo_stats = frozenset(['dodge_exp', 'white_hit', 'spell_hit', 'yellow_hit', 'parry_exp', 'mh_dodge_exp', 'oh_dodge_exp', 'mh_parry_exp', 'oh_parry_exp', 'spell_exp'])
+
+class InvalidDeltaException(exceptions.InvalidInputException):
+    pass
+
+
+class Delta(object):
+    fields = ('stats', 'procs', 'gear_buffs', 'enchants', 'weapons', 'buffs', 'talents', 'glyphs')
+    weapon_attributes = frozenset(['weapon_dps', 'speed', 'type'])
+
+    def __init__(self, stats=None, procs=None, gear_buffs=None, enchants=None, weapons=None, buffs=None, talents=None, glyphs=None):
+        self.stats = dict(stats or {})
+        self.procs = dict(procs or {})
+        self.gear_buffs = dict(gear_buffs or {})
+        self.enchants = dict(enchants or {})
+        self.weapons = dict((hand, dict(changes)) for hand, changes in (weapons or {}).iteritems())
+        self.buffs = dict(buffs or {})
+        self.talents = dict(talents or {})
+        self.glyphs = dict(glyphs or {})
+        for hand in self.enchants.keys() + self.weapons.keys():
+            if hand not in ('mh', 'oh'):
+                raise InvalidDeltaException(_('Weapon changes go on mh or oh, not {hand}').format(hand=hand))
+        for changes in self.weapons.itervalues():
+            for attribute in changes:
+                if attribute not in self.weapon_attributes:
+                    raise InvalidDeltaException(_('Weapon attribute {attribute} can\'t be changed').format(attribute=attribute))
+        if len([stat for stat in self.stats if stat in pseudo_stats]) > 1:
+            raise InvalidDeltaException(_('Only one hit or expertise pseudo-stat can be valued at a time'))
+
+    def key(self):
+        # Hashable and canonical: equal deltas give equal keys.
+        key = []
+        for field in self.fields:
+            changes = getattr(self, field)
+            if field == 'weapons':
+                changes = dict((hand, tuple(sorted(weapon.items()))) for hand, weapon in changes.iteritems())
+            key.append(tuple(sorted(changes.items())))
+        return tuple(key)
+
+    def __eq__(self, other):
+        return isinstance(other, Delta) and self.key() == other.key()
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __hash__(self):
+        return hash(self.key())
+
+    def __repr__(self):
+        changes = ['{field}={changes!r}'.format(field=field, changes=getattr(self, field)) for field in self.fields if getattr(self, field)]
+        return 'Delta({changes})'.format(changes=', '.join(changes))
+
+    def is_empty(self):
+        for field in self.fields:
+            if getattr(self, field):
+                return False
+        return True
+
+    def merge(self, other):
+        # A new delta doing self, then other: stat increments add up, every
+        # other entry of other replaces the one in self.
+        merged = Delta(**dict((field, getattr(self, field)) for field in self.fields))
+        for stat, increment in other.stats.iteritems():
+            merged.stats[stat] = merged.stats.get(stat, 0) + increment
+        for field in ('procs', 'gear_buffs', 'enchants', 'buffs', 'talents', 'glyphs'):
+            getattr(merged, field).update(getattr(other, field))
+        for hand, changes in other.weapons.iteritems():
+            merged.weapons.setdefault(hand, {}).update(changes)
+        if len([stat for stat in merged.stats if stat in pseudo_stats]) > 1:
+            raise InvalidDeltaException(_('Only one hit or expertise pseudo-stat can be valued at a time'))
+        return merged
+
+    def apply(self, calculator):
+        # Applies the delta in place. Only ever call this on a copy (see
+        # DamageCalculator.what_if_copy).
+        stats = calculator.stats
+        for stat, increment in self.stats.iteritems():
+            if stat in pseudo_stats:
+                calculator.calculating_ep = stat
+            elif stat in calculator.fingerprint_stats:
+                setattr(stats, stat, getattr(stats, stat) + increment)
+            else:
+                raise InvalidDeltaException(_('{stat} is not a stat a delta can change').format(stat=stat))
+
+        for name, state in self.procs.iteritems():
+            if name not in stats.procs.allowed_procs:
+                raise procs.InvalidProcException(_('No data for proc {proc}').format(proc=name))
+            if state is None or state is False:
+                if getattr(stats.procs, name):
+                    delattr(stats.procs, name)
+                continue
+            if not getattr(stats.procs, name):
+                stats.procs.set_proc(name)
+            if state is not True:
+                getattr(stats.procs, name).upgrade_level = state
+
+        for name, state in self.gear_buffs.iteritems():
+            if name not in stats.gear_buffs.allowed_buffs:
+                raise InvalidDeltaException(_('Invalid gear buff {buff}').format(buff=name))
+            if state is None or state is False:
+                setattr(stats.gear_buffs, name, False)
+                continue
+            setattr(stats.gear_buffs, name, True)
+            if state is not True:
+                stats.gear_buffs.activated_boosts.writable(name)['upgrade_level'] = state
+
+        for hand, enchant in self.enchants.iteritems():
+            getattr(stats, hand).set_enchant(enchant)
+
+        for hand, changes in self.weapons.iteritems():
+            weapon = getattr(stats, hand)
+            for attribute, value in changes.iteritems():
+                setattr(weapon, attribute, value)
+
+        for name, value in self.buffs.iteritems():
+            if name not in calculator.buffs.allowed_buffs:
+                raise InvalidDeltaException(_('Invalid buff {buff}').format(buff=name))
+            setattr(calculator.buffs, name, value)
+
+        for name, value in self.talents.iteritems():
+            if not calculator.talents.is_allowed_talent(name):
+                raise InvalidDeltaException(_('Invalid talent {talent}').format(talent=name))
+            setattr(calculator.talents, name, value)
+
+        for name, value in self.glyphs.iteritems():
+            if name not in calculator.glyphs.allowed_glyphs:
+                raise InvalidDeltaException(_('Invalid glyph {glyph}').format(glyph=name))
+            setattr(calculator.glyphs, name, value)
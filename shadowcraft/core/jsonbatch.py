@@ -0,0 +1,190 @@
+import collections
+import json
+import multiprocessing
+import optparse
+import Queue
+import sys
+import traceback
+
+from shadowcraft.core import exceptions
+from shadowcraft.core import jsoninput
+from shadowcraft.core import persistent_cache
+
+# Evaluates a stream of profiles, one JSON object per line in the format
+# jsoninput.from_json takes, and writes one JSON object per record back:
+#
+#     {"index": 0, "id": "...", "results": {"dps": 170287.04}}
+#     {"index": 1, "id": null, "error": "...", "error_type": "InvalidJSONException"}
+#
+# index counts the non-blank input lines from 0 and id is copied from the
+# profile's optional "id" key. kinds are the result_methods of
+# persistent_cache. A profile the engine can't take (bad JSON, missing keys,
+# inputs it doesn't model) gets an error line and the stream goes on; so does
+# one the model crashes on, with the exception's class as error_type.
+#
+# Input is read a line at a time and at most max_in_flight records are
+# waiting on the pool, so memory stays flat however long the stream is.
+# Ordered output comes back in input order (a slow record holds back the
+# ones after it); unordered output is written as records finish. With a
+# cache_path each worker reads and fills a PersistentCache on that file.
+
+class InvalidBatchException(exceptions.InvalidInputException):
+    pass
+
+
+_caches = {}
+
+def get_cache(cache_path):
+    # One cache per process and file.
+    if cache_path not in _caches:
+        _caches[cache_path] = persistent_cache.PersistentCache(cache_path)
+    return _caches[cache_path]
+
+def read_records(stream):
+    # Lazily yields (index, line) for the non-blank lines of stream.
+    index = 0
+    for line in stream:
+        line = line.strip()
+        if line:
+            yield index, line
+            index += 1
+
+def get_record_id(line):
+    try:
+        profile = json.loads(line)
+    except ValueError:
+        return None
+    if isinstance(profile, dict):
+        return profile.get('id')
+    return None
+
+def evaluate_record(args):
+    # Runs in a worker process; returns the output object for one record.
+    index, line, kinds, cache_path = args
+    record = {'index': index, 'id': get_record_id(line)}
+    calculators = []
+    def factory(json_string):
+        if not calculators:
+            calculators.append(jsoninput.from_json(json_string))
+        return calculators[0]
+    try:
+        results = {}
+        for kind in kinds:
+            if cache_path is None:
+                results[kind] = getattr(factory(line), persistent_cache.result_methods[kind])()
+            else:
+                results[kind] = get_cache(cache_path).get_result(line, kind, factory)
+        record['results'] = results
+    except exceptions.InvalidInputException as e:
+        # InvalidJSONException, InputNotModeledException and the checks of
+        # the objects themselves.
+        record['error'] = e.error_msg
+        record['error_type'] = e.__class__.__name__
+    except Exception as e:
+        # A bug the record ran into; it shouldn't take the rest of the stream
+        # down with it.
+        record['error'] = str(e)
+        record['error_type'] = e.__class__.__name__
+    return record
+
+def _pooled_record_helper(args):
+    # Whatever still escapes evaluate_record is handed back with its
+    # traceback rather than raised, since apply_async would drop it from the
+    # unordered path's callback and leave the stream waiting.
+    try:
+        return evaluate_record(args), None
+    except Exception:
+        return None, (args[0], traceback.format_exc())
+
+def get_pooled_record(result):
+    record, failure = result
+    if failure is not None:
+        raise RuntimeError('Record {index} failed in a worker:\n{traceback}'.format(index=failure[0], traceback=failure[1]))
+    return record
+
+def write_record(output, record):
+    output.write(json.dumps(record, sort_keys=True) + '\n')
+
+def evaluate_stream(input_stream, output, kinds=('dps',), workers=None, max_in_flight=None, ordered=True, cache_path=None):
+    # Evaluates every record of input_stream, writing results to output as
+    # it goes. Returns (records, errors).
+    kinds = tuple(kinds)
+    for kind in kinds:
+        if kind not in persistent_cache.result_methods:
+            raise InvalidBatchException(_('No result of kind {kind}').format(kind=kind))
+    if max_in_flight is None:
+        max_in_flight = 4 * (workers or 1)
+    if max_in_flight < 1:
+        raise InvalidBatchException(_('A batch needs room for at least one record in flight'))
+
+    counts = {'records': 0, 'errors': 0}
+    def finish(record):
+        counts['records'] += 1
+        if 'error' in record:
+            counts['errors'] += 1
+        write_record(output, record)
+
+    records = ((index, line, kinds, cache_path) for index, line in read_records(input_stream))
+    if not workers or workers < 2:
+        for args in records:
+            finish(evaluate_record(args))
+        return counts['records'], counts['errors']
+
+    pool = multiprocessing.Pool(workers)
+    try:
+        if ordered:
+            pending = collections.deque()
+            for args in records:
+                if len(pending) >= max_in_flight:
+                    finish(get_pooled_record(pending.popleft().get()))
+                pending.append(pool.apply_async(_pooled_record_helper, (args,)))
+            while pending:
+                finish(get_pooled_record(pending.popleft().get()))
+        else:
+            finished = Queue.Queue()
+            in_flight = 0
+            for args in records:
+                if in_flight >= max_in_flight:
+                    finish(get_pooled_record(finished.get()))
+                    in_flight -= 1
+                pool.apply_async(_pooled_record_helper, (args,), callback=finished.put)
+                in_flight += 1
+            while in_flight:
+                finish(get_pooled_record(finished.get()))
+                in_flight -= 1
+    finally:
+        pool.close()
+        pool.join()
+    return counts['records'], counts['errors']
+
+def main(argv=None):
+    parser = optparse.OptionParser(usage='%prog [options] [input.jsonl]')
+    parser.add_option('-o', '--output', help='write results here instead of stdout')
+    parser.add_option('-k', '--kinds', default='dps', help='comma separated results to compute (default dps)')
+    parser.add_option('-w', '--workers', type='int', default=None, help='evaluate in a pool of this many processes')
+    parser.add_option('-n', '--max-in-flight', type='int', default=None, help='records waiting on the pool at once')
+    parser.add_option('-u', '--unordered', action='store_true', default=False, help='write results as they finish')
+    parser.add_option('-c', '--cache', default=None, help='persistent result cache file')
+    options, args = parser.parse_args(argv)
+    if len(args) > 1:
+        parser.error('at most one input file')
+
+    input_stream = sys.stdin
+    if args and args[0] != '-':
+        input_stream = open(args[0])
+    output = sys.stdout
+    if options.output:
+        output = open(options.output, 'w')
+    try:
+        records, errors = evaluate_stream(input_stream, output, options.kinds.split(','), options.workers, options.max_in_flight, not options.unordered, options.cache)
+    finally:
+        if input_stream is not sys.stdin:
+            input_stream.close()
+        if output is not sys.stdout:
+            output.close()
+    sys.stderr.write('{records} records, {errors} errors\n'.format(records=records, errors=errors))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
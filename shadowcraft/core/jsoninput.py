@@ -3,138 +3,137 @@ from shadowcraft.calcs.rogue.Aldriana import AldrianasRogueDamageCalculator
 from shadowcraft.calcs.rogue.Aldriana import settings
 from shadowcraft.core import exceptions
 from shadowcraft.objects import buffs
+from shadowcraft.objects import glyphs
 from shadowcraft.objects import procs
 from shadowcraft.objects import race
 from shadowcraft.objects import stats
-from shadowcraft.objects.rogue import rogue_glyphs
-from shadowcraft.objects.rogue import rogue_talents
+from shadowcraft.objects import talents
 
 class InvalidJSONException(exceptions.InvalidInputException):
     pass
 
+# The cycle and settings objects take their keyword arguments straight from
+# the input: settings holds the Settings arguments plus the spec under 'type'
+# and the cycle's own arguments under 'cycle'.
+cycles = {
+    'assassination': settings.AssassinationCycle,
+    'combat': settings.CombatCycle,
+    'subtlety': settings.SubtletyCycle
+}
+
+rating_stats = ('str', 'agi', 'int', 'spirit', 'stam', 'ap', 'crit', 'hit', 'exp', 'haste', 'mastery', 'pvp_power', 'pvp_resil')
+
+def keyword_arguments(options):
+    return dict((str(key), value) for key, value in options.iteritems())
+
 def from_json(json_string, character_class='rogue'):
-    j = json.loads(json_string)
-    try: 
-        race_object = race.Race(str(j['race']), character_class=character_class)
+    try:
+        j = json.loads(json_string)
+    except ValueError as e:
+        raise InvalidJSONException(_("Invalid JSON: {error}").format(error=str(e)))
+    try:
         level = int(j['level'])
-    
-        s = j['settings']
-        settings_type = s['type']
-        if settings_type == 'assassination':
-            # AssassinationCycle(self, min_envenom_size_mutilate=4, min_envenom_size_backstab=5, prioritize_rupture_uptime_mutilate=True, prioritize_rupture_uptime_backstab=True)
-            c = s.get('cycle', {})
-            cycle = settings.AssassinationCycle(c.get('min_envenom_size_mutilate', 4), c.get('min_envenom_size_backstab', 5),
-                c.get('prioritize_rupture_uptime_mutilate', True), c.get('prioritize_rupture_uptime_backstab', True))
-        elif settings_type == 'combat':
-            # CombatCycle(self, use_rupture=True, use_revealing_strike='sometimes', ksp_immediately=False)
-            c = s.get('cycle', {})
-            cycle = settings.CombatCycle(c.get('use_rupture', True), c.get('use_revealing_strike', 'sometimes'), c.get('ksp_immediately', False))
-        elif settings_type == 'subtlety':
-            # SubletySycle(raid_crits_per_second, clip_recuperate=False)
-            c = s['cycle']
-            cycle = settings.SubtletyCycle(c['raid_crits_per_second'], c.get('clip_recuperate', False))
-        else:
+        race_object = race.Race(str(j['race']), character_class=character_class)
+
+        s = dict(j['settings'])
+        settings_type = s.pop('type')
+        if settings_type not in cycles:
             raise InvalidJSONException(_("Missing settings"))
+        cycle = cycles[settings_type](**keyword_arguments(s.pop('cycle', {})))
+        settings_object = settings.Settings(cycle, **keyword_arguments(s))
 
-        # Settings(cycle, time_in_execute_range=.35, tricks_on_cooldown=True, response_time=.5, mh_poison='ip', oh_poison='dp', duration=300):
-        settings_object = settings.Settings(cycle, s.get('time_in_execute_range', .35), s.get('tricks_on_cooldown', True),
-            s.get('response_time', .5), s.get('mh_poison', 'ip'), s.get('oh_poison', 'dp'), s.get('duration', 300))
-    
         stats_dict = j['stats']
         # Weapon(damage, speed, weapon_type, enchant=None):
         mh_dict = stats_dict['mh']
         mh = stats.Weapon(mh_dict['damage'], mh_dict['speed'], mh_dict['type'], mh_dict.get('enchant'))
         oh_dict = stats_dict['oh']
         oh = stats.Weapon(oh_dict['damage'], oh_dict['speed'], oh_dict['type'], oh_dict.get('enchant'))
-        ranged_dict = stats_dict['ranged']
-        ranged = stats.Weapon(ranged_dict['damage'], ranged_dict['speed'], ranged_dict['type'], ranged_dict.get('enchant'))
-        procs_list = procs.ProcsList(*stats_dict['procs'])
-        gear_buffs = stats.GearBuffs(*stats_dict['gear_buffs'])
-        # Stats(str, agi, ap, crit, hit, exp, haste, mastery, mh, oh, ranged, procs, gear_buffs, level=85):
-        def s(stat):
-            return int(stats_dict[stat])
-        stats_object = stats.Stats(s('str'), s('agi'), s('ap'), s('crit'), s('hit'), s('exp'), s('haste'), s('mastery'), 
-            mh, oh, ranged, procs_list, gear_buffs, level)
-        glyphs = rogue_glyphs.RogueGlyphs(*j['glyphs'])
-        talents = rogue_talents.RogueTalents(*j['talents'])
-        buffs_object = buffs.Buffs(*j['buffs'])
+        # Procs and gear buffs are names or [name, upgrade level] pairs.
+        procs_list = procs.ProcsList(*[tuple(proc) if isinstance(proc, list) else proc for proc in stats_dict['procs']])
+        gear_buffs = stats.GearBuffs(*[tuple(buff) if isinstance(buff, list) else buff for buff in stats_dict['gear_buffs']])
+        rating = dict((stat, int(stats_dict[stat])) for stat in rating_stats if stat in stats_dict)
+        stats_object = stats.Stats(mh, oh, procs_list, gear_buffs, level=level, **rating)
+        glyphs_object = glyphs.Glyphs(character_class, *j['glyphs'])
+        talents_object = talents.Talents(str(j['talents']), character_class, level)
+        buffs_object = buffs.Buffs(*j['buffs'], level=level)
     except KeyError as e:
         raise InvalidJSONException(_("Missing required input {key}").format(key=str(e)))
+    except (TypeError, ValueError, AssertionError) as e:
+        # Wrong types, numbers that don't parse and the assertions of the
+        # cycle objects.
+        raise InvalidJSONException(_("Invalid input: {error}").format(error=str(e) or e.__class__.__name__))
     # Calculator(stats, talents, glyphs, buffs, race, settings=None, level=85):
-    return AldrianasRogueDamageCalculator(stats_object, talents, glyphs, buffs_object, race_object, settings=settings_object, level=level)
+    return AldrianasRogueDamageCalculator(stats_object, talents_object, glyphs_object, buffs_object, race_object, settings=settings_object, level=level)
 
 
 if __name__ == '__main__':
     json_string = """{
-        "level": 85, 
+        "level": 90,
         "stats": {
-            "str": 20,
-            "agi": 4756, 
-            "ap": 190, 
-            "crit": 1022, 
-            "hit": 1329, 
-            "exp": 159, 
-            "haste": 1291, 
-            "mastery": 1713, 
+            "str": 80,
+            "agi": 20131,
+            "stam": 25454,
+            "crit": 3278,
+            "hit": 2557,
+            "exp": 2549,
+            "haste": 13206,
+            "mastery": 6103,
             "gear_buffs": [
-                "rogue_t11_2pc", 
-                "leather_specialization", 
-                "potion_of_the_tolvir", 
-                "chaotic_metagem"
-            ], 
+                "rogue_t15_2pc",
+                "rogue_t15_4pc",
+                "leather_specialization",
+                "virmens_bite",
+                "virmens_bite_prepot"
+            ],
             "procs": [
-                "heroic_prestors_talisman_of_machination", 
-                "fluid_death", 
-                "rogue_t11_4pc"
-            ], 
+                ["heroic_talisman_of_bloodlust", 0],
+                ["heroic_bad_juju", 0],
+                "legendary_capacitive_meta"
+            ],
             "mh": {
-                "type": "dagger", 
-                "speed": 1.8, 
-                "damage": 939.5, 
-                "enchant": "landslide"
+                "type": "fist",
+                "speed": 2.6,
+                "damage": 10478.5,
+                "enchant": "dancing_steel"
             },
             "oh": {
-                "type": "dagger", 
-                "speed": 1.4, 
-                "damage": 730.5, 
-                "enchant": "landslide"
-            }, 
-            "ranged": {
-                "type": "thrown", 
-                "speed": 2.2, 
-                "damage": 1371.5
+                "type": "fist",
+                "speed": 2.6,
+                "damage": 10478.5,
+                "enchant": "dancing_steel"
             }
         },
         "buffs": [
-            "short_term_haste_buff", 
-            "stat_multiplier_buff", 
-            "crit_chance_buff", 
-            "all_damage_buff", 
-            "melee_haste_buff", 
-            "attack_power_buff", 
-            "str_and_agi_buff", 
-            "armor_debuff", 
-            "physical_vulnerability_debuff", 
-            "spell_damage_debuff", 
-            "spell_crit_debuff", 
-            "bleed_damage_debuff", 
-            "agi_flask", 
-            "guild_feast"
-        ], 
+            "short_term_haste_buff",
+            "stat_multiplier_buff",
+            "crit_chance_buff",
+            "mastery_buff",
+            "melee_haste_buff",
+            "attack_power_buff",
+            "spell_haste_buff",
+            "armor_debuff",
+            "physical_vulnerability_debuff",
+            "spell_damage_debuff",
+            "agi_flask_mop",
+            "food_300_agi"
+        ],
         "settings": {
-            "type": "assassination", 
-            "response_time": 1
-        }, 
-        "talents": [
-            "0333230113022110321", 
-            "0020000000000000000", 
-            "2030030000000000000"
-        ], 
-        "race": "night_elf", 
+            "type": "combat",
+            "cycle": {
+                "stack_cds": true
+            },
+            "response_time": 0.5,
+            "duration": 360,
+            "dmg_poison": "dp",
+            "utl_poison": "lp",
+            "stormlash": 1,
+            "tricks_on_cooldown": false
+        },
+        "talents": "322213",
+        "race": "pandaren",
         "glyphs": [
-            "backstab", 
-            "mutilate", 
-            "rupture"
+            "recuperate",
+            "adrenaline_rush"
         ]
     }"""
 
@@ -0,0 +1,263 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from shadowcraft.core import exceptions
+
+# On-disk result cache that outlives the process. Entries are keyed by a hash
+# of the canonical form of the JSON input (as taken by jsoninput.from_json),
+# the kind of result (see result_methods) and its arguments, plus a version
+# made of engine_version and a hash of the model's sources (every module of
+# shadowcraft.calcs and shadowcraft.objects, data tables included): editing
+# any of them drops every entry the next time a cache is opened on the file.
+#
+# Results are stored as JSON, so tuples come back as lists and strings as
+# unicode. The file is in WAL mode so any number of readers (threads or
+# processes) can go on while one of them writes; each thread gets its own
+# connection. Once the stored results go over max_bytes the least recently
+# read ones are evicted; the total is kept in the meta table so a put doesn't
+# have to add up the whole table. Reads never write: the time of each hit is
+# buffered and written along with the next put (or on close), so a reader
+# never waits on another process's write lock.
+
+engine_version = '0.1'
+
+result_methods = {
+    'dps': 'get_dps',
+    'dps_breakdown': 'get_dps_breakdown',
+    'ep': 'get_ep',
+    'other_ep': 'get_other_ep',
+    'upgrades_ep': 'get_upgrades_ep',
+    'weapon_ep': 'get_weapon_ep',
+    'glyphs_ranking': 'get_glyphs_ranking',
+    'talents_ranking': 'get_talents_ranking'
+}
+
+class InvalidCacheInputException(exceptions.InvalidInputException):
+    pass
+
+
+def canonical_json(json_string):
+    try:
+        value = json.loads(json_string)
+    except ValueError:
+        raise InvalidCacheInputException(_('The input is not valid JSON'))
+    return json.dumps(value, sort_keys=True, separators=(',', ':'))
+
+package_directory = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+model_directories = (os.path.join(package_directory, 'calcs'), os.path.join(package_directory, 'objects'))
+
+def get_source_version(directories=model_directories):
+    # Hash of every .py file under directories, by path relative to its
+    # directory and content.
+    digest = hashlib.sha1()
+    for directory in directories:
+        paths = []
+        for root, dirs, files in os.walk(directory):
+            for name in files:
+                if name.endswith('.py'):
+                    paths.append(os.path.relpath(os.path.join(root, name), directory))
+        for path in sorted(paths):
+            source_file = open(os.path.join(directory, path), 'rb')
+            try:
+                digest.update(path.replace(os.sep, '/') + '\0')
+                digest.update(hashlib.sha1(source_file.read()).hexdigest())
+            finally:
+                source_file.close()
+    return digest.hexdigest()
+
+class PersistentCache(object):
+
+    def __init__(self, path, max_bytes=64 * 1024 * 1024, version=None, timeout=10.):
+        if max_bytes < 1:
+            raise exceptions.InvalidInputException(_('A result cache must hold at least one byte'))
+        if version is None:
+            version = engine_version + ':' + get_source_version()
+        self.path = path
+        self.max_bytes = max_bytes
+        self.version = version
+        self.timeout = timeout
+        self.local = threading.local()
+        self.lock = threading.Lock()
+        self.accessed = {}
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        connection = self.get_connection()
+        self.begin(connection)
+        try:
+            connection.execute('CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value TEXT)')
+            connection.execute('CREATE TABLE IF NOT EXISTS results (key TEXT PRIMARY KEY, kind TEXT, value TEXT, size INTEGER, accessed REAL)')
+            connection.execute('CREATE INDEX IF NOT EXISTS results_accessed ON results (accessed)')
+            row = connection.execute('SELECT value FROM meta WHERE name = ?', ('version',)).fetchone()
+            if row is None or row[0] != version:
+                connection.execute('DELETE FROM results')
+                connection.execute('INSERT OR REPLACE INTO meta (name, value) VALUES (?, ?)', ('version', version))
+                self.set_total(connection, 0)
+            if self.get_total(connection) is None:
+                self.set_total(connection, connection.execute('SELECT COALESCE(SUM(size), 0) FROM results').fetchone()[0])
+            connection.execute('COMMIT')
+        except:
+            connection.execute('ROLLBACK')
+            raise
+
+    def get_connection(self):
+        connection = getattr(self.local, 'connection', None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=self.timeout, isolation_level=None)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            self.local.connection = connection
+        return connection
+
+    def begin(self, connection):
+        # Takes the write lock up front so two writers never deadlock
+        # upgrading read locks.
+        connection.execute('BEGIN IMMEDIATE')
+
+    def close(self):
+        # Writes the buffered access times and closes the calling thread's
+        # connection.
+        connection = getattr(self.local, 'connection', None)
+        if connection is not None:
+            if self.accessed:
+                self.begin(connection)
+                try:
+                    self.flush_accessed(connection)
+                    connection.execute('COMMIT')
+                except:
+                    connection.execute('ROLLBACK')
+                    raise
+            connection.close()
+            self.local.connection = None
+
+    def get_total(self, connection):
+        row = connection.execute('SELECT value FROM meta WHERE name = ?', ('bytes',)).fetchone()
+        if row is None:
+            return None
+        return int(row[0])
+
+    def set_total(self, connection, total):
+        connection.execute('INSERT OR REPLACE INTO meta (name, value) VALUES (?, ?)', ('bytes', str(total)))
+
+    def flush_accessed(self, connection):
+        # Inside a write transaction.
+        self.lock.acquire()
+        try:
+            accessed = self.accessed
+            self.accessed = {}
+        finally:
+            self.lock.release()
+        if accessed:
+            connection.executemany('UPDATE results SET accessed = ? WHERE key = ?', [(when, key) for key, when in accessed.iteritems()])
+
+    def get_key(self, json_string, kind, args=()):
+        key = json.dumps([self.version, kind, list(args), canonical_json(json_string)], sort_keys=True, separators=(',', ':'))
+        return hashlib.sha1(key).hexdigest()
+
+    def count(self, counter):
+        self.lock.acquire()
+        try:
+            setattr(self, counter, getattr(self, counter) + 1)
+        finally:
+            self.lock.release()
+
+    def get(self, json_string, kind, args=(), default=None):
+        key = self.get_key(json_string, kind, args)
+        connection = self.get_connection()
+        row = connection.execute('SELECT value FROM results WHERE key = ?', (key,)).fetchone()
+        if row is None:
+            self.count('misses')
+            return default
+        self.lock.acquire()
+        try:
+            self.hits += 1
+            self.accessed[key] = time.time()
+        finally:
+            self.lock.release()
+        return json.loads(row[0])
+
+    def put(self, json_string, kind, value, args=()):
+        key = self.get_key(json_string, kind, args)
+        value = json.dumps(value, sort_keys=True)
+        connection = self.get_connection()
+        self.begin(connection)
+        try:
+            self.flush_accessed(connection)
+            total = self.get_total(connection)
+            row = connection.execute('SELECT size FROM results WHERE key = ?', (key,)).fetchone()
+            if row is not None:
+                total -= row[0]
+            connection.execute('INSERT OR REPLACE INTO results (key, kind, value, size, accessed) VALUES (?, ?, ?, ?, ?)', (key, kind, value, len(value), time.time()))
+            self.set_total(connection, self.evict(connection, total + len(value)))
+            connection.execute('COMMIT')
+        except:
+            connection.execute('ROLLBACK')
+            raise
+
+    def evict(self, connection, total):
+        # Returns the total left.
+        while total > self.max_bytes:
+            oldest = connection.execute('SELECT key, size FROM results ORDER BY accessed LIMIT 64').fetchall()
+            if not oldest:
+                # The stored total was more than the table holds (a file
+                # written by another version, or edited by hand); go back to
+                # the real one.
+                return connection.execute('SELECT COALESCE(SUM(size), 0) FROM results').fetchone()[0]
+            for key, size in oldest:
+                if total <= self.max_bytes:
+                    break
+                connection.execute('DELETE FROM results WHERE key = ?', (key,))
+                total -= size
+                self.count('evictions')
+        return total
+
+    def get_result(self, json_string, kind, factory, args=()):
+        # The kind result for json_string, computed on a miss by calling the
+        # result_methods entry on factory(json_string) with args.
+        if kind not in result_methods:
+            raise InvalidCacheInputException(_('No result of kind {kind}').format(kind=kind))
+        value = self.get(json_string, kind, args)
+        if value is None:
+            calculator = factory(json_string)
+            value = getattr(calculator, result_methods[kind])(*args)
+            self.put(json_string, kind, value, args)
+            value = json.loads(json.dumps(value, sort_keys=True))
+        return value
+
+    def clear(self):
+        connection = self.get_connection()
+        self.begin(connection)
+        try:
+            connection.execute('DELETE FROM results')
+            self.set_total(connection, 0)
+            connection.execute('COMMIT')
+        except:
+            connection.execute('ROLLBACK')
+            raise
+        self.lock.acquire()
+        try:
+            self.accessed = {}
+            self.hits = 0
+            self.misses = 0
+            self.evictions = 0
+        finally:
+            self.lock.release()
+
+    def __len__(self):
+        return self.get_connection().execute('SELECT COUNT(*) FROM results').fetchone()[0]
+
+    def get_counters(self):
+        total = self.get_total(self.get_connection())
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'entries': len(self),
+            'bytes': total,
+            'max_bytes': self.max_bytes
+        }
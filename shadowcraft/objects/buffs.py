@@ -1,10 +1,12 @@
 from shadowcraft.core import exceptions
+from shadowcraft.objects import flags
 
 class InvalidBuffException(exceptions.InvalidInputException):
     pass
 
 
-class Buffs(object):
+class Buffs(flags.FlagSet):
+    __slots__ = ('level', 'mast_buff_bonus')
 
     allowed_buffs = frozenset([
         'short_term_haste_buff',            # Heroism/Blood Lust, Time Warp
@@ -51,18 +53,13 @@ class Buffs(object):
     buff_scaling = {80: 131, 85: 509, 90: 1710}
 
     def __init__(self, *args, **kwargs):
+        flags.FlagSet.__init__(self)
         for buff in args:
             if buff not in self.allowed_buffs:
                 raise InvalidBuffException(_('Invalid buff {buff}').format(buff=buff))
             setattr(self, buff, True)
         self.level = kwargs.get('level', 85)
 
-    def __getattr__(self, name):
-        # Any buff we haven't assigned a value to, we don't have.
-        if name in self.allowed_buffs:
-            return False
-        object.__getattribute__(self, name)
-
     def __setattr__(self, name, value):
         object.__setattr__(self, name, value)
         if name == 'level':
@@ -130,3 +127,5 @@ class Buffs(object):
 
     def buff_mast(self):
         return [0, self.mast_buff_bonus][self.mastery_buff]
+
+flags.add_flags(Buffs, Buffs.allowed_buffs)
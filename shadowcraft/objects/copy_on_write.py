@@ -0,0 +1,83 @@
+class CopyOnWriteTable(object):
+    # Per-instance view of one of the shared data tables (proc_data.allowed_procs,
+    # GearBuffs.activated_boosts, Race.activated_racial_data). Reads fall
+    # through to the shared entries; an entry is copied into the view the first
+    # time it is fetched with writable(), so instances never see each other's
+    # upgrade levels or level-dependent values and nothing is copied up front.
+    # source names the shared table as (module, attribute path) so a pickled
+    # view carries only its own entries and finds the table again on load.
+
+    def __init__(self, shared, source=None):
+        self.shared = shared
+        self.source = source
+        self.own = {}
+
+    def __getstate__(self):
+        if self.source is None:
+            return self.__dict__
+        return {'source': self.source, 'own': self.own}
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        if 'shared' not in state:
+            module_name, path = self.source
+            shared = __import__(module_name, globals(), locals(), [path.split('.')[0]])
+            for name in path.split('.'):
+                shared = getattr(shared, name)
+            self.shared = shared
+
+    def __getitem__(self, name):
+        if name in self.own:
+            return self.own[name]
+        return self.shared[name]
+
+    def get(self, name, default=None):
+        if name in self.own:
+            return self.own[name]
+        return self.shared.get(name, default)
+
+    def __contains__(self, name):
+        return name in self.shared
+
+    def __iter__(self):
+        return iter(self.shared)
+
+    def __len__(self):
+        return len(self.shared)
+
+    def keys(self):
+        return self.shared.keys()
+
+    def iterkeys(self):
+        return self.shared.iterkeys()
+
+    def writable(self, name):
+        entry = self.own.get(name)
+        if entry is None:
+            entry = dict(self.shared[name])
+            self.own[name] = entry
+        return entry
+
+    def copy(self):
+        view = CopyOnWriteTable(self.shared, self.source)
+        for name, entry in self.own.iteritems():
+            view.own[name] = dict(entry)
+        return view
+
+class SharedTableAttribute(object):
+    # Class attribute for a shared table on a class with __slots__, where the
+    # per-instance view can't go in an instance attribute of the same name:
+    # read on the class it is the shared table, read on an instance it is the
+    # view stored in `slot`.
+
+    def __init__(self, shared, slot):
+        self.shared = shared
+        self.slot = slot
+
+    def __get__(self, instance, owner):
+        if instance is None:
+            return self.shared
+        return getattr(instance, self.slot)
+
+    def __set__(self, instance, value):
+        setattr(instance, self.slot, value)
@@ -0,0 +1,85 @@
+# Boolean flags (buffs, gear buffs, talents, glyphs) packed into one integer.
+#
+# Every flag a container class knows about gets a bit and a property on the
+# class, so reading a flag that was never set is a plain attribute lookup
+# instead of a miss that falls through to __getattr__. Subclasses list their
+# own attributes in __slots__; the whole state is then the bitmask plus those
+# few slots, which makes copies cheap and gives a hashable key for free.
+#
+# Flags always read back as True or False: the model indexes with them
+# ([1, 1.05][buffs.stat_multiplier_buff]) and adds them up.
+
+def flag_property(bit):
+    mask = 1 << bit
+
+    def get_flag(self):
+        return self.flags & mask != 0
+
+    def set_flag(self, value):
+        if value:
+            self.flags |= mask
+        else:
+            self.flags &= ~mask
+
+    def clear_flag(self):
+        self.flags &= ~mask
+
+    return property(get_flag, set_flag, clear_flag)
+
+def add_flags(cls, names):
+    # Gives cls one bit per name, in sorted order so the bits (and
+    # cls.flag_names) don't depend on set ordering.
+    names = tuple(sorted(set(names)))
+    cls.flag_names = names
+    cls.flag_bits = dict((name, bit) for bit, name in enumerate(names))
+    for bit, name in enumerate(names):
+        setattr(cls, name, flag_property(bit))
+
+class FlagSet(object):
+    __slots__ = ('flags',)
+    flag_names = ()
+    flag_bits = {}
+
+    def __init__(self):
+        self.flags = 0
+
+    def __getattr__(self, name):
+        # Only reached for names that are neither flags nor set slots.
+        raise AttributeError(name)
+
+    def get_active_flags(self):
+        # Names of the flags that are set, sorted.
+        flags = self.flags
+        return tuple(name for bit, name in enumerate(self.flag_names) if flags >> bit & 1)
+
+    def has_flag(self, name):
+        bit = self.flag_bits.get(name)
+        return bit is not None and self.flags >> bit & 1 == 1
+
+    def get_slot_names(self):
+        names = []
+        for cls in self.__class__.__mro__:
+            for name in cls.__dict__.get('__slots__', ()):
+                if name not in names:
+                    names.append(name)
+        return names
+
+    def __getstate__(self):
+        state = {}
+        for name in self.get_slot_names():
+            try:
+                state[name] = object.__getattribute__(self, name)
+            except AttributeError:
+                pass
+        return state
+
+    def __setstate__(self, state):
+        # Straight through object.__setattr__, so setters with side effects
+        # (level) don't run again on a half-restored instance.
+        for name, value in state.iteritems():
+            object.__setattr__(self, name, value)
+
+    def __copy__(self):
+        flag_set = self.__class__.__new__(self.__class__)
+        flag_set.__setstate__(self.__getstate__())
+        return flag_set
@@ -1,16 +1,17 @@
+from shadowcraft.objects import flags
 from shadowcraft.objects import glyphs_data
 
-class Glyphs(object):
+class Glyphs(flags.FlagSet):
+    __slots__ = ('game_class', 'allowed_glyphs')
 
     def __init__(self, game_class='rogue', *args):
+        flags.FlagSet.__init__(self)
         self.game_class = game_class
         self.allowed_glyphs = glyphs_data.glyphs[game_class]
         for arg in args:
             if arg in self.allowed_glyphs:
                 setattr(self, arg, True)
 
-    def __getattr__(self, name):
-        # Any glyph we haven't assigned a value to, we don't have.
-        if name in self.allowed_glyphs:
-            return False
-        object.__getattribute__(self, name)
+# Any glyph we haven't assigned a value to, we don't have. Every class's
+# glyphs get a bit; only the allowed ones are ever set.
+flags.add_flags(Glyphs, [glyph for class_glyphs in glyphs_data.glyphs.values() for glyph in class_glyphs])
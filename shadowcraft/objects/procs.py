@@ -1,4 +1,7 @@
+import copy
+
 from shadowcraft.core import exceptions
+from shadowcraft.objects import copy_on_write
 from shadowcraft.objects import proc_data
 
 class InvalidProcException(exceptions.InvalidInputException):
@@ -164,13 +167,25 @@ class Proc(object):
 
 class ProcsList(object):
     allowed_procs = proc_data.allowed_procs
+    # Position of every proc in the data table, so the active index below
+    # lists procs in the same order a scan of allowed_procs would.
+    proc_order = dict((name, position) for position, name in enumerate(allowed_procs))
 
     def __init__(self, *args):
+        # Names of the procs we have, kept in proc_order as procs are set and
+        # removed, so lookups only touch those few procs instead of the whole
+        # proc database. There is no index by stat: the model reassigns
+        # proc.stat (matrix restabilizer, 'highest' stat procs), and filtering
+        # the active procs is just as cheap.
+        object.__setattr__(self, 'active_procs', [])
+        # Upgrade levels and level-dependent values go into a per-instance
+        # view of the proc table, never into proc_data itself.
+        self.allowed_procs = copy_on_write.CopyOnWriteTable(ProcsList.allowed_procs, (__name__, 'ProcsList.allowed_procs'))
         for arg in args:
             if not isinstance(arg, (list,tuple)):
                 arg = (arg,0)
             if arg[0] in self.allowed_procs:
-                proc_data = self.allowed_procs[arg[0]]
+                proc_data = self.allowed_procs.writable(arg[0])
                 proc_data['upgrade_level'] = arg[1]
                 setattr(self, arg[0], Proc(**proc_data))
             else:
@@ -179,6 +194,16 @@ class ProcsList(object):
     def set_proc(self, proc):
         setattr(self, proc, Proc(**self.allowed_procs[proc]))
 
+    def evaluation_copy(self):
+        # The model sets values, uptimes and stats on the procs it evaluates,
+        # so each active proc is copied; the data tables are not.
+        procs_list = copy.copy(self)
+        object.__setattr__(procs_list, 'active_procs', list(self.active_procs))
+        for proc_name, proc in self.__dict__.iteritems():
+            if isinstance(proc, Proc):
+                object.__setattr__(procs_list, proc_name, copy.copy(proc))
+        return procs_list
+
     def __getattr__(self, proc):
         # Any proc we haven't assigned a value to, we don't have.
         if proc in self.allowed_procs:
@@ -186,10 +211,33 @@ class ProcsList(object):
         object.__getattribute__(self, proc)
 
     def __setattr__(self, name, value):
+        if name in self.proc_order:
+            self._remove_from_index(name)
         object.__setattr__(self, name, value)
+        if name in self.proc_order and value:
+            self._add_to_index(name)
         if name == 'level':
             self._set_constants_for_level()
 
+    def __delattr__(self, name):
+        object.__delattr__(self, name)
+        if name in self.proc_order:
+            self._remove_from_index(name)
+
+    def _add_to_index(self, name):
+        position = self.proc_order[name]
+        index = len(self.active_procs)
+        while index > 0 and self.proc_order[self.active_procs[index - 1]] > position:
+            index -= 1
+        self.active_procs.insert(index, name)
+
+    def _remove_from_index(self, name):
+        if name in self.active_procs:
+            self.active_procs.remove(name)
+
+    def get_active_proc_names(self):
+        return list(self.active_procs)
+
     def _set_constants_for_level(self):
         self.set_swordguard_embroidery_value()
 
@@ -203,27 +251,31 @@ class ProcsList(object):
         ]
         for level, value in values:
             if self.level >= level:
-                self.allowed_procs['swordguard_embroidery']['value'] = value
+                self.allowed_procs.writable('swordguard_embroidery')['value'] = value
                 if proc:
                     proc.value = value
                 break
 
     def get_all_procs_for_stat(self, stat=None):
         procs = []
-        for proc_name in self.allowed_procs:
+        for proc_name in self.active_procs:
             proc = getattr(self, proc_name)
-            if proc:
-                if stat is None or proc.stat == stat:
-                    procs.append(proc)
+            if stat is None or proc.stat == stat:
+                procs.append(proc)
 
         return procs
 
     def get_all_damage_procs(self):
         procs = []
-        for proc_name in self.allowed_procs:
+        for proc_name in self.active_procs:
             proc = getattr(self, proc_name)
-            if proc:
-                if proc.stat in ('spell_damage', 'physical_damage'):
-                    procs.append(proc)
+            if proc.stat in ('spell_damage', 'physical_damage'):
+                procs.append(proc)
 
         return procs
+
+# A class-level False for every proc, shadowed by the instance attribute once
+# the proc is set, so reading a proc we don't have never falls through to
+# __getattr__.
+for proc_name in ProcsList.proc_order:
+    setattr(ProcsList, proc_name, False)
@@ -1,4 +1,5 @@
 from shadowcraft.core import exceptions
+from shadowcraft.objects import copy_on_write
 
 class InvalidRaceException(exceptions.InvalidInputException):
     pass
@@ -103,6 +104,7 @@ class Race(object):
     def __init__(self, race, character_class="rogue", level=85):
         self.character_class = str.lower(character_class)
         self.race_name = race
+        self.activated_racial_data = copy_on_write.CopyOnWriteTable(Race.activated_racial_data, (__name__, 'Race.activated_racial_data'))
         if self.race_name not in Race.racial_stat_offset.keys():
             raise InvalidRaceException(_('Unsupported race {race}').format(race=self.race_name))
         if self.character_class == "rogue":
@@ -133,8 +135,8 @@ class Race(object):
     def _set_constants_for_level(self):
         try:
             self.stats = self.stat_set[self.level]
-            self.activated_racial_data["blood_fury_physical"]["value"] = self.blood_fury_bonuses[self.level]["ap"]
-            self.activated_racial_data["blood_fury_spell"]["value"] = self.blood_fury_bonuses[self.level]["sp"]
+            self.activated_racial_data.writable("blood_fury_physical")["value"] = self.blood_fury_bonuses[self.level]["ap"]
+            self.activated_racial_data.writable("blood_fury_spell")["value"] = self.blood_fury_bonuses[self.level]["sp"]
             self.stats = map(sum, zip(self.stats, Race.racial_stat_offset[self.race_name]))
         except KeyError as e:
             raise InvalidRaceException(_('Unsupported class/level combination {character_class}/{level}').format(character_class=self.character_class, level=self.level))
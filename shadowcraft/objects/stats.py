@@ -1,3 +1,7 @@
+import copy
+
+from shadowcraft.objects import copy_on_write
+from shadowcraft.objects import flags
 from shadowcraft.objects import procs
 from shadowcraft.objects import proc_data
 from shadowcraft.core import exceptions
@@ -60,6 +64,17 @@ class Stats(object):
         object.__setattr__(self, name, value)
         if name == 'level' and value is not None:
             self._set_constants_for_level()
+
+    def evaluation_copy(self):
+        # Scratch copy for a single model evaluation: the calculator applies
+        # advanced parameters and rewrites proc and boost values on it, so
+        # the caller's objects come out of get_dps untouched.
+        stats = copy.copy(self)
+        stats.mh = self.mh.evaluation_copy()
+        stats.oh = self.oh.evaluation_copy()
+        stats.procs = self.procs.evaluation_copy()
+        stats.gear_buffs = self.gear_buffs.evaluation_copy()
+        return stats
     
     def get_max_health(self, rating=None):
         if rating is None:
@@ -152,6 +167,13 @@ class Weapon(object):
             if getattr(self, i):
                 delattr(self, i)
 
+    def evaluation_copy(self):
+        weapon = copy.copy(self)
+        for i in self.allowed_melee_enchants:
+            if getattr(self, i):
+                object.__setattr__(weapon, i, copy.copy(getattr(self, i)))
+        return weapon
+
     def __getattr__(self, name):
         # Any enchant we haven't assigned a value to, we don't have.
         if name in self.allowed_melee_enchants:
@@ -167,8 +189,16 @@ class Weapon(object):
     def normalized_damage(self, ap=0):
         return self.speed * self.weapon_dps + self._normalization_speed * ap / 14.
 
+# Enchants hold Proc objects, so instead of a bit each they get a class-level
+# default that an instance attribute shadows once set; reading one we don't
+# have then never falls through to __getattr__.
+for enchant in Weapon.allowed_melee_enchants:
+    setattr(Weapon, enchant, False)
+
 # Catch-all for non-proc gear based buffs (static or activated)
-class GearBuffs(object):
+class GearBuffs(flags.FlagSet):
+    __slots__ = ('activated_boosts_view', 'level')
+
     activated_boosts = {
         # Duration and cool down in seconds - name is mandatory for damage-on-use boosts
         'unsolvable_riddle':              {'stat': 'agi', 'value': 1605, 'duration': 20, 'cooldown': 120},
@@ -222,29 +252,37 @@ class GearBuffs(object):
     allowed_buffs = frozenset(other_gear_buffs + activated_boosts.keys())
     
     def __init__(self, *args):
+        # Upgrade levels and level-dependent values go into a per-instance
+        # view of the boosts table, never into the class-level one.
+        flags.FlagSet.__init__(self)
+        self.activated_boosts = copy_on_write.CopyOnWriteTable(GearBuffs.activated_boosts, (__name__, 'GearBuffs.activated_boosts'))
         for arg in args:
             if not isinstance(arg, (list,tuple)):
                 arg = (arg,0)
             if arg[0] in self.allowed_buffs:
                 if arg[0] in frozenset(self.activated_boosts.keys()):
-                    self.activated_boosts[arg[0]]['upgrade_level'] = arg[1]
+                    self.activated_boosts.writable(arg[0])['upgrade_level'] = arg[1]
                 setattr(self, arg[0], True)
-                
-
-    def __getattr__(self, name):
-        # Any gear buff we haven't assigned a value to, we don't have.
-        if name in self.allowed_buffs:
-            return False
-        object.__getattribute__(self, name)
 
     def __setattr__(self, name, value):
         object.__setattr__(self, name, value)
         if name == 'level':
             self._set_constants_for_level()
 
+    def evaluation_copy(self):
+        # Active boosts get their own dicts since the model writes their value
+        # (and the synapse springs stat); the rest stay shared.
+        gear_buffs = copy.copy(self)
+        activated_boosts = self.activated_boosts.copy()
+        for boost in activated_boosts:
+            if getattr(self, boost):
+                activated_boosts.writable(boost)
+        gear_buffs.activated_boosts = activated_boosts
+        return gear_buffs
+
     def _set_constants_for_level(self):
-        self.activated_boosts['synapse_springs']['value'] = self.tradeskill_bonus('synapse_springs')
-        self.activated_boosts['lifeblood']['value'] = self.tradeskill_bonus('master_of_anatomy')
+        self.activated_boosts.writable('synapse_springs')['value'] = self.tradeskill_bonus('synapse_springs')
+        self.activated_boosts.writable('lifeblood')['value'] = self.tradeskill_bonus('master_of_anatomy')
 
     def metagem_crit_multiplier(self):
         if self.chaotic_metagem:
@@ -365,9 +403,9 @@ class GearBuffs(object):
 
     def get_all_activated_boosts_for_stat(self, stat=None):
         boosts = []
-        for boost in GearBuffs.activated_boosts:
-            if getattr(self, boost) and (stat is None or GearBuffs.activated_boosts[boost]['stat'] == stat):
-                boosts.append(GearBuffs.activated_boosts[boost])
+        for boost in self.activated_boosts:
+            if getattr(self, boost) and (stat is None or self.activated_boosts[boost]['stat'] == stat):
+                boosts.append(self.activated_boosts[boost])
 
         return boosts
 
@@ -379,3 +417,8 @@ class GearBuffs(object):
     #This does too, but reinforces the fact that it's rating.
     def get_all_activated_haste_rating_boosts(self):
         return self.get_all_activated_boosts_for_stat('haste')
+
+flags.add_flags(GearBuffs, GearBuffs.allowed_buffs)
+# GearBuffs.activated_boosts stays the shared table; on an instance it is the
+# instance's view of it, kept in a slot.
+GearBuffs.activated_boosts = copy_on_write.SharedTableAttribute(GearBuffs.activated_boosts, 'activated_boosts_view')
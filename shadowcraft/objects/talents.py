@@ -1,13 +1,16 @@
 from shadowcraft.core import exceptions
+from shadowcraft.objects import flags
 from shadowcraft.objects import talents_data
 
 class InvalidTalentException(exceptions.InvalidInputException):
     pass
 
 
-class Talents(object):
+class Talents(flags.FlagSet):
+    __slots__ = ('game_class', 'class_talents', 'level', 'allowed_talents', 'allowed_talents_for_level')
 
     def __init__(self, talent_string, game_class='rogue', level='90'):
+        flags.FlagSet.__init__(self)
         self.game_class = game_class
         self.class_talents = talents_data.talents[game_class]
         self.level = level
@@ -15,16 +18,6 @@ class Talents(object):
         self.allowed_talents_for_level = self.get_allowed_talents_for_level()
         self.initialize_talents(talent_string)
 
-    def __setattr__(self, name, value):
-        object.__setattr__(self, name, value)
-
-    def __getattr__(self, name):
-        # If someone tries to access a talent not initialized (the talent
-        # string was shorter than 6) we return False
-        if name in self.allowed_talents:
-            return False
-        object.__getattribute__(self, name)
-
     def get_allowed_talents_for_level(self):
         allowed_talents_for_level = []
         for i in xrange(self.get_top_tier()):
@@ -85,4 +78,9 @@ class Talents(object):
             for talent in row:
                 if getattr(self, talent):
                     active_talents.append(talent)
-        return active_talents
\ No newline at end of file
+        return active_talents
+
+# If someone tries to access a talent not initialized (the talent string was
+# shorter than 6) they get False. Every class's talents get a bit; only the
+# allowed ones are ever set.
+flags.add_flags(Talents, [talent for class_talents in talents_data.talents.values() for tier in class_talents for talent in tier])
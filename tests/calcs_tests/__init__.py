@@ -1,11 +1,52 @@
 from shadowcraft import calcs
 import unittest
+from shadowcraft.calcs.rogue.Aldriana import AldrianasRogueDamageCalculator
+from shadowcraft.calcs.rogue.Aldriana import settings
 from shadowcraft.core import exceptions
 from shadowcraft.objects import buffs
 from shadowcraft.objects import race
 from shadowcraft.objects import stats
 from shadowcraft.objects import procs
 from shadowcraft.objects import glyphs
+from shadowcraft.objects import talents
+
+# The fixture the calcs tests share. make_calculator builds any calculator
+# class on a pair of plain daggers with nothing else equipped;
+# make_rogue_calculator builds the real model on raid buffed gear close to
+# the scripts' profiles, for checks against actual DPS numbers.
+
+raid_buffs = ('short_term_haste_buff', 'stat_multiplier_buff', 'crit_chance_buff', 'mastery_buff', 'melee_haste_buff', 'attack_power_buff',
+              'spell_haste_buff', 'armor_debuff', 'physical_vulnerability_debuff', 'spell_damage_debuff', 'agi_flask_mop', 'food_300_agi')
+
+rogue_ratings = {'str': 80, 'agi': 20131, 'stam': 25454, 'crit': 3278, 'hit': 2557, 'exp': 2549, 'haste': 13206, 'mastery': 6103}
+
+def make_calculator(calculator_class=calcs.DamageCalculator, cycle=None, mh=None, oh=None, procs_list=(), gear_buffs_list=(), buffs_list=(),
+                    glyphs_list=(), talent_string='322213', race_name='night_elf', level=90, target_level=None, settings_options={}, **ratings):
+    if cycle is None:
+        cycle = settings.CombatCycle()
+    if mh is None:
+        mh = stats.Weapon(737, 1.8, 'dagger')
+    if oh is None:
+        oh = stats.Weapon(573, 1.4, 'dagger')
+    test_stats = stats.Stats(mh, oh, procs.ProcsList(*procs_list), stats.GearBuffs(*gear_buffs_list), **ratings)
+    test_settings = settings.Settings(cycle, **settings_options)
+    test_talents = talents.Talents(talent_string, 'rogue', level)
+    test_glyphs = glyphs.Glyphs('rogue', *glyphs_list)
+    return calculator_class(test_stats, test_talents, test_glyphs, buffs.Buffs(*buffs_list), race.Race(race_name), test_settings, level=level, target_level=target_level)
+
+def make_rogue_calculator(cycle=None, glyphs_list=('recuperate',), **options):
+    # Daggers, so every spec can take it.
+    arguments = {
+        'mh': stats.Weapon(7254., 1.8, 'dagger', 'dancing_steel'),
+        'oh': stats.Weapon(7254., 1.8, 'dagger', 'dancing_steel'),
+        'gear_buffs_list': ('leather_specialization',),
+        'buffs_list': raid_buffs,
+        'race_name': 'pandaren',
+        'settings_options': {'duration': 360, 'utl_poison': 'lp'}
+    }
+    arguments.update(rogue_ratings)
+    arguments.update(options)
+    return make_calculator(AldrianasRogueDamageCalculator, cycle, glyphs_list=glyphs_list, **arguments)
 
 class TestDamageCalculator(unittest.TestCase):
     def make_calculator(self, buffs_list=[], gear_buffs_list=[], race_name='night_elf'):
@@ -0,0 +1,67 @@
+import unittest
+from shadowcraft import calcs
+from shadowcraft.calcs import builds
+from shadowcraft.core import exceptions
+from calcs_tests import make_calculator, make_rogue_calculator
+
+class BuildCalculator(calcs.DamageCalculator):
+    def get_dps(self):
+        if self.talents.subterfuge and self.glyphs.vendetta:
+            raise exceptions.InvalidInputException('not modeled')
+        dps = 1000.
+        dps += 100 * self.talents.anticipation + 50 * self.talents.marked_for_death
+        dps += 10 * self.talents.subterfuge + 20 * self.talents.shadow_focus
+        dps += 5 * self.glyphs.vendetta + 2 * self.glyphs.feint - 1 * self.glyphs.recuperate
+        return dps
+
+class TestBuildOptimizer(unittest.TestCase):
+    def setUp(self):
+        self.calculator = make_calculator(BuildCalculator, glyphs_list=('feint',))
+
+    def test_single_flips(self):
+        optimizer = builds.BuildOptimizer(self.calculator, glyph_slots=2)
+        single_flips = optimizer.get_single_flips()
+        self.assertEqual(100, single_flips['anticipation'])
+        self.assertEqual(-1, single_flips['recuperate'])
+        self.assertEqual(0, single_flips['nightstalker'])
+        # 3 * 3 talent choices, and no glyph, one of three or two of them.
+        self.assertEqual(9 * 7, len(optimizer.get_candidates()))
+
+    def test_optimize(self):
+        optimizer = builds.BuildOptimizer(self.calculator, glyph_slots=2, chunk_size=10)
+        calls = []
+        results = optimizer.optimize(top=3, progress=lambda evaluated, total: calls.append((evaluated, total)))
+        self.assertTrue(optimizer.complete)
+        self.assertEqual((63, 63), calls[-1])
+        self.assertEqual([(1127., '300003', ('feint', 'vendetta')), (1125., '300003', ('vendetta',)), (1124., '300003', ('recuperate', 'vendetta'))], results)
+        self.assertEqual(['shadow_focus', 'nerve_strike', 'leeching_poison', 'shadowstep', 'prey_on_the_weak', 'anticipation'], self.calculator.talents.get_active_talents())
+        self.assertTrue(self.calculator.glyphs.feint)
+        self.assertFalse(self.calculator.glyphs.vendetta)
+
+    def test_rejected_builds(self):
+        results = builds.BuildOptimizer(self.calculator, glyph_slots=1).optimize(top=100)
+        for dps, talent_string, build_glyphs in results:
+            self.assertFalse(talent_string[0] == '2' and 'vendetta' in build_glyphs)
+
+    def test_time_budget(self):
+        optimizer = builds.BuildOptimizer(self.calculator, chunk_size=1)
+        results = optimizer.optimize(top=1, time_budget=0)
+        self.assertFalse(optimizer.complete)
+        # Only the single-flip pass got evaluated.
+        self.assertEqual([(1100., '000003', ())], results)
+
+    def test_optimize_specs(self):
+        results = builds.optimize_specs({'combat': self.calculator}, top=1, glyph_slots=1)
+        self.assertEqual([(1125., '300003', ('vendetta',))], results['combat'])
+
+    def test_invalid_glyph(self):
+        self.assertRaises(exceptions.InvalidInputException, builds.BuildOptimizer, self.calculator, glyph_list=['fake_glyph'])
+
+    def test_real_model(self):
+        calculator = make_rogue_calculator()
+        baseline = calculator.get_dps()
+        single_flips = builds.BuildOptimizer(calculator, glyph_slots=1).get_single_flips()
+        empty_dps = make_rogue_calculator(talent_string='000000', glyphs_list=()).get_dps()
+        self.assertAlmostEqual(make_rogue_calculator(talent_string='000003', glyphs_list=()).get_dps() - empty_dps, single_flips['anticipation'])
+        self.assertAlmostEqual(make_rogue_calculator(talent_string='000000', glyphs_list=('adrenaline_rush',)).get_dps() - empty_dps, single_flips['adrenaline_rush'])
+        self.assertEqual(baseline, calculator.get_dps())
@@ -0,0 +1,112 @@
+import unittest
+from shadowcraft.calcs import cache
+from shadowcraft.calcs.rogue.Aldriana import settings
+from shadowcraft.core import exceptions
+from shadowcraft.objects import buffs
+from calcs_tests import make_rogue_calculator
+
+class TestResultCache(unittest.TestCase):
+    def setUp(self):
+        self.cache = cache.ResultCache(2)
+
+    def test_counters(self):
+        self.assertEqual(None, self.cache.get('a'))
+        self.cache.put('a', 1.)
+        self.assertEqual(1., self.cache.get('a'))
+        counters = self.cache.get_counters()
+        self.assertEqual(1, counters['hits'])
+        self.assertEqual(1, counters['misses'])
+        self.assertEqual(1, counters['entries'])
+
+    def test_eviction(self):
+        self.cache.put('a', 1.)
+        self.cache.put('b', 2.)
+        self.cache.get('a')
+        self.cache.put('c', 3.)
+        self.assertTrue('a' in self.cache)
+        self.assertFalse('b' in self.cache)
+        self.assertEqual(1, self.cache.get_counters()['evictions'])
+        self.cache.resize(1)
+        self.assertEqual(1, len(self.cache))
+        self.assertTrue('c' in self.cache)
+
+    def test_max_bytes(self):
+        size = cache.get_size('a') + cache.get_size(1.)
+        bounded = cache.ResultCache(10, max_bytes=2 * size)
+        bounded.put('a', 1.)
+        bounded.put('b', 2.)
+        bounded.get('a')
+        bounded.put('c', 3.)
+        self.assertEqual(['a', 'c'], sorted(bounded.links))
+        self.assertEqual(2 * size, bounded.get_counters()['bytes'])
+        bounded.put('d', range(100))
+        self.assertFalse('d' in bounded)
+        self.assertEqual(2, len(bounded))
+        self.cache.put('a', 1.)
+        self.cache.put('b', 2.)
+        self.cache.resize(2, max_bytes=size)
+        self.assertEqual(['b'], self.cache.links.keys())
+        self.assertEqual(size, self.cache.get_counters()['bytes'])
+
+    def test_get_size(self):
+        shared = range(10)
+        self.assertEqual(cache.get_size(shared), cache.get_size([shared, shared]) - cache.get_size([None, None]) + cache.get_size(None))
+        self.assertTrue(cache.get_size([shared, shared]) < cache.get_size([shared, range(10)]))
+        self.assertTrue(cache.get_size({'a': shared}) > cache.get_size(shared))
+
+    def test_exceptions(self):
+        self.assertRaises(exceptions.InvalidInputException, cache.ResultCache, 0)
+        self.assertRaises(exceptions.InvalidInputException, cache.ResultCache, 1, 0)
+        self.assertRaises(exceptions.InvalidInputException, self.cache.resize, 1, 0)
+
+class TestCachedResults(unittest.TestCase):
+    def setUp(self):
+        self.cache = cache.ResultCache()
+        self.calculator = make_rogue_calculator()
+        self.calculator.result_cache = self.cache
+
+    def test_get_dps(self):
+        dps = self.calculator.get_dps()
+        self.assertEqual(1, self.cache.get_counters()['misses'])
+        self.assertEqual(dps, self.calculator.get_dps())
+        other = make_rogue_calculator()
+        other.result_cache = self.cache
+        self.assertEqual(dps, other.get_dps())
+        self.assertEqual(2, self.cache.get_counters()['hits'])
+        self.assertEqual(dps, make_rogue_calculator().get_dps())
+
+    def test_fingerprint(self):
+        fingerprint = self.calculator.fingerprint()
+        self.assertEqual(fingerprint, make_rogue_calculator().fingerprint())
+        others = [
+            make_rogue_calculator(haste=13207),
+            make_rogue_calculator(cycle=settings.AssassinationCycle()),
+            make_rogue_calculator(glyphs_list=()),
+            make_rogue_calculator(talent_string='322212'),
+            make_rogue_calculator(race_name='night_elf'),
+            make_rogue_calculator(buffs_list=('agi_flask_mop',))
+        ]
+        enchant = make_rogue_calculator()
+        enchant.stats.oh.set_enchant(None)
+        others.append(enchant)
+        proc = make_rogue_calculator()
+        proc.stats.procs.set_proc('heroic_bottle_of_infinite_stars')
+        others.append(proc)
+        fingerprints = [fingerprint] + [other.fingerprint() for other in others]
+        self.assertEqual(len(fingerprints), len(set(fingerprints)))
+        self.calculator.get_dps()
+        for other in others:
+            other.result_cache = self.cache
+            other.get_dps()
+        self.assertEqual(len(fingerprints), self.cache.get_counters()['misses'])
+        self.assertEqual(0, self.cache.get_counters()['hits'])
+
+
+class TestFingerprintHelpers(unittest.TestCase):
+    def test_canonical(self):
+        self.assertEqual(cache.canonical({'b': [1, 2], 'a': {'c': 3}}), cache.canonical({'a': {'c': 3}, 'b': (1, 2)}))
+
+    def test_active_flags(self):
+        test_buffs = buffs.Buffs('mastery_buff', 'armor_debuff')
+        test_buffs.crit_chance_buff = False
+        self.assertEqual(('armor_debuff', 'mastery_buff'), cache.active_flags(test_buffs, test_buffs.allowed_buffs))
@@ -0,0 +1,35 @@
+import unittest
+from shadowcraft.calcs.rogue import combo_points
+from shadowcraft.core import exceptions
+
+class TestComboPoints(unittest.TestCase):
+    def assertDistEqual(self, expected, dist):
+        self.assertEqual(sorted(expected), sorted(dist))
+        for key in expected:
+            self.assertAlmostEqual(expected[key], dist[key])
+
+    def test_cycle_distribution(self):
+        dist, time_spent_at_cp, avg_cp_per_cpg = combo_points.cycle_distribution({1: .5, 2: .5}, 2)
+        self.assertDistEqual({(2, 1): .5, (2, 2): .25, (3, 2): .25}, dist)
+        for expected, actual in zip([0, .2, .6, .2, 0, 0], time_spent_at_cp):
+            self.assertAlmostEqual(expected, actual)
+        self.assertAlmostEqual(1.5, avg_cp_per_cpg)
+
+    def test_cap(self):
+        dist, time_spent_at_cp, avg_cp_per_cpg = combo_points.cycle_distribution({3: 1}, 5)
+        self.assertDistEqual({(5, 2): 1}, dist)
+        dist, time_spent_at_cp, avg_cp_per_cpg = combo_points.cycle_distribution({3: 1}, 6)
+        self.assertDistEqual({(5, 3): 1}, dist)
+        dist, time_spent_at_cp, avg_cp_per_cpg = combo_points.cycle_distribution({1: 1}, 0)
+        self.assertDistEqual({(0, 0): 1}, dist)
+        self.assertEqual([1, 0, 0, 0, 0, 0], time_spent_at_cp)
+
+    def test_anticipation(self):
+        dist, time_spent_at_cp, avg_cp_per_cpg = combo_points.cycle_distribution({2: 1}, 5, anticipation=True)
+        self.assertDistEqual({(5, 3): .5, (5, 2): .5}, dist)
+        self.assertEqual([0, 0, 0, 0, 0, 1], time_spent_at_cp)
+        dist, time_spent_at_cp, avg_cp_per_cpg = combo_points.cycle_distribution({1: .7, 2: .3}, 5, anticipation=True)
+        self.assertAlmostEqual(5 / avg_cp_per_cpg, sum([moves * prob for (cps, moves), prob in dist.items()]))
+
+    def test_invalid(self):
+        self.assertRaises(exceptions.InvalidInputException, combo_points.cycle_distribution, {0: .5, 1: .5}, 5)
@@ -0,0 +1,72 @@
+import pickle
+import unittest
+from shadowcraft.calcs import constants
+from shadowcraft.core import exceptions
+from calcs_tests import make_calculator, make_rogue_calculator
+
+class TestConstantsTable(unittest.TestCase):
+    def setUp(self):
+        self.table = constants.ConstantsTable()
+        self.builds = 0
+
+    def build(self):
+        self.builds += 1
+        return {'value': 3}
+
+    def build_invalid(self):
+        raise exceptions.InvalidInputException('no')
+
+    def test_get(self):
+        entry = self.table.get(('rogue', 90), self.build)
+        self.assertEqual(3, entry.value)
+        self.assertEqual(3, entry['value'])
+        self.assertTrue(entry is self.table.get(('rogue', 90), self.build))
+        self.assertEqual(1, self.builds)
+        self.table.get(('rogue', 85), self.build)
+        self.assertEqual(2, self.builds)
+        self.table.clear()
+        self.assertEqual(0, len(self.table))
+
+    def test_failed_build(self):
+        self.assertRaises(exceptions.InvalidInputException, self.table.get, 'key', self.build_invalid)
+        self.assertFalse('key' in self.table)
+
+    def test_read_only(self):
+        entry = self.table.get('key', self.build)
+        self.assertRaises(AttributeError, setattr, entry, 'value', 4)
+        self.assertRaises(AttributeError, delattr, entry, 'value')
+        self.assertRaises(AttributeError, getattr, entry, 'missing')
+
+    def test_pickle(self):
+        entry = pickle.loads(pickle.dumps(self.table.get('key', self.build), 2))
+        self.assertEqual(3, entry.value)
+
+class TestLevelConstants(unittest.TestCase):
+    def make_calculator(self, is_pvp=False, target_level=None):
+        return make_calculator(target_level=target_level, settings_options={'is_pvp': is_pvp})
+
+    def test_shared(self):
+        calculator = self.make_calculator()
+        self.assertTrue(calculator.level_constants is self.make_calculator().level_constants)
+        self.assertEqual(3, calculator.level_difference)
+        self.assertEqual(24835., calculator.target_base_armor)
+        self.assertAlmostEqual(.075, calculator.base_one_hand_miss_rate)
+        self.assertAlmostEqual(.265, calculator.base_dw_miss_rate)
+
+    def test_pvp(self):
+        calculator = self.make_calculator(is_pvp=True)
+        self.assertFalse(calculator.level_constants is self.make_calculator().level_constants)
+        self.assertEqual(0, calculator.level_difference)
+        self.assertAlmostEqual(.05, calculator.base_parry_chance)
+
+    def test_invalid_target_level(self):
+        self.assertRaises(exceptions.InvalidInputException, self.make_calculator, target_level=91)
+
+    def test_real_model(self):
+        calculator = make_rogue_calculator()
+        dps = calculator.get_dps()
+        self.assertTrue(calculator.level_constants is make_rogue_calculator().level_constants)
+        self.assertFalse(calculator.level_constants is self.make_calculator().level_constants)
+        # A rebuilt table gives the same numbers.
+        constants.level_constants.clear()
+        self.assertEqual(dps, make_rogue_calculator().get_dps())
@@ -0,0 +1,44 @@
+import math
+import unittest
+from shadowcraft.calcs import armor_mitigation
+from shadowcraft.calcs import dual
+
+class TestDual(unittest.TestCase):
+    def setUp(self):
+        self.x = dual.Dual(3., {'agi': 1.})
+        self.y = dual.Dual(2., {'haste': 1.})
+
+    def test_arithmetic(self):
+        z = self.x * self.y + 4 - self.x / 2
+        self.assertAlmostEqual(8.5, z.value)
+        self.assertAlmostEqual(1.5, z.derivative('agi'))
+        self.assertAlmostEqual(3., z.derivative('haste'))
+        z = 1 / self.y
+        self.assertAlmostEqual(-.25, z.derivative('haste'))
+        z = 10 - self.x
+        self.assertAlmostEqual(-1., z.derivative('agi'))
+        self.assertEqual(0., z.derivative('mastery'))
+
+    def test_powers(self):
+        z = self.x ** 2
+        self.assertAlmostEqual(6., z.derivative('agi'))
+        z = math.e ** self.x
+        self.assertAlmostEqual(math.e ** 3, z.derivative('agi'))
+        z = self.x ** self.y
+        self.assertAlmostEqual(6., z.derivative('agi'))
+        self.assertAlmostEqual(9 * math.log(3), z.derivative('haste'))
+
+    def test_comparisons(self):
+        self.assertTrue(self.x > self.y)
+        self.assertTrue(self.x > 2)
+        self.assertEqual(self.x, max(self.x, 0))
+        self.assertEqual(0, max(-self.x, 0))
+        self.assertEqual(3., abs(-self.x).value)
+        self.assertEqual(1., abs(-self.x).derivative('agi'))
+
+    def test_armor_multiplier(self):
+        armor = dual.Dual(11977., {'armor': 1.})
+        parameter = armor_mitigation.parameter(85)
+        multiplier = armor_mitigation.multiplier(armor, 85)
+        self.assertAlmostEqual(armor_mitigation.multiplier(11977., 85), multiplier.value)
+        self.assertAlmostEqual(-parameter / (11977. + parameter) ** 2, multiplier.derivative('armor'))
@@ -0,0 +1,37 @@
+import unittest
+from shadowcraft.calcs import fixed_point
+from shadowcraft.calcs.rogue.Aldriana import settings
+from calcs_tests import make_rogue_calculator
+
+class TestEP(unittest.TestCase):
+    def setUp(self):
+        self.calculator = make_rogue_calculator()
+        self.ep_stats = ['agi', 'crit', 'haste', 'mastery', 'yellow_hit']
+
+    def test_pool(self):
+        ep = self.calculator.get_ep(self.ep_stats)
+        self.assertEqual(ep, self.calculator.get_ep(self.ep_stats, workers=2))
+        self.assertEqual(self.calculator.get_ep(self.ep_stats, 'dps'), self.calculator.get_ep(self.ep_stats, 'dps', workers=3))
+        baseline_dps = self.calculator.get_dps()
+        self.assertEqual(ep, self.calculator.get_ep(self.ep_stats, baseline_dps=baseline_dps, workers=2))
+
+    def test_ep_ad(self):
+        ep_stats = self.ep_stats + ['dodge_exp', 'str', 'ap']
+        for cycle in (None, settings.AssassinationCycle()):
+            calculator = make_rogue_calculator(cycle=cycle)
+            dps = calculator.get_dps()
+            ep = calculator.get_ep(ep_stats)
+            ep_ad = calculator.get_ep_ad(ep_stats)
+            for stat in ep_stats:
+                self.assertAlmostEqual(ep[stat], ep_ad[stat], delta=1e-4 * ep[stat])
+            self.assertEqual(dps, calculator.get_dps())
+
+    def test_ep_ad_solver(self):
+        # Derivatives are solved cold whatever solver the calculator has.
+        for cycle in (None, settings.AssassinationCycle()):
+            calculator = make_rogue_calculator(cycle=cycle)
+            ep_ad = calculator.get_ep_ad(['agi', 'haste', 'mastery'])
+            calculator.solver = fixed_point.FixedPointSolver(precision=calculator.PRECISION_REQUIRED, warm_start=True, acceleration='anderson')
+            calculator.get_dps()
+            self.assertEqual(ep_ad, calculator.get_ep_ad(['agi', 'haste', 'mastery']))
+            self.assertFalse(calculator.solver.get_trace()[-1]['warm_started'])
@@ -0,0 +1,72 @@
+import unittest
+from shadowcraft.calcs import fixed_point
+from shadowcraft.core import exceptions
+
+class TestFixedPointSolver(unittest.TestCase):
+    # A contraction with fixed point mh_autoattacks = 2, rupture_ticks = [1, 3].
+    def initial(self):
+        return {'mh_autoattacks': 0., 'rupture_ticks': [0., 0.]}, {'mh_autoattacks': .2}
+
+    def step(self, attacks_per_second, crit_rates):
+        self.calls += 1
+        mh = attacks_per_second['mh_autoattacks']
+        new_rates = {'mh_autoattacks': .8 * mh + .4, 'rupture_ticks': [.5 * mh, .5 * mh + 2]}
+        return {'agi': mh}, new_rates, crit_rates
+
+    def setUp(self):
+        self.calls = 0
+
+    def check_solution(self, rates):
+        self.assertAlmostEqual(2., rates['mh_autoattacks'], places=5)
+        self.assertAlmostEqual(1., rates['rupture_ticks'][0], places=5)
+        self.assertAlmostEqual(3., rates['rupture_ticks'][1], places=5)
+
+    def test_plain(self):
+        solver = fixed_point.FixedPointSolver(max_iterations=200, precision=10 ** -9)
+        state, rates, crit_rates = solver.solve('test', self.initial, self.step)
+        self.check_solution(rates)
+        self.assertEqual({'mh_autoattacks': .2}, crit_rates)
+        trace = solver.get_trace()
+        self.assertEqual(1, len(trace))
+        self.assertTrue(trace[0]['converged'])
+        self.assertEqual(self.calls, trace[0]['iterations'])
+        self.assertEqual(trace[0]['iterations'], len(trace[0]['residuals']))
+
+    def test_max_iterations(self):
+        solver = fixed_point.FixedPointSolver(max_iterations=3)
+        solver.solve('test', self.initial, self.step)
+        self.assertEqual(3, self.calls)
+        self.assertFalse(solver.get_trace()[0]['converged'])
+
+    def test_acceleration(self):
+        plain = fixed_point.FixedPointSolver(max_iterations=200, precision=10 ** -9)
+        plain.solve('test', self.initial, self.step)
+        for acceleration in ('aitken', 'anderson'):
+            solver = fixed_point.FixedPointSolver(max_iterations=200, precision=10 ** -9, acceleration=acceleration)
+            state, rates, crit_rates = solver.solve('test', self.initial, self.step)
+            self.check_solution(rates)
+            self.assertTrue(solver.get_trace()[0]['iterations'] < plain.get_trace()[0]['iterations'])
+
+    def test_warm_start(self):
+        solver = fixed_point.FixedPointSolver(max_iterations=200, precision=10 ** -9, warm_start=True)
+        solver.solve('test', self.initial, self.step)
+        state, rates, crit_rates = solver.solve('test', self.initial, self.step)
+        self.check_solution(rates)
+        trace = solver.get_trace()
+        self.assertFalse(trace[0]['warm_started'])
+        self.assertTrue(trace[1]['warm_started'])
+        self.assertEqual(1, trace[1]['iterations'])
+        solver.solve('test', self.initial, self.step, accelerate=False)
+        self.assertFalse(solver.get_trace()[2]['warm_started'])
+
+    def test_trace_length(self):
+        solver = fixed_point.FixedPointSolver(trace_length=2)
+        for i in range(3):
+            solver.solve(i, self.initial, self.step)
+        self.assertEqual([1, 2], [record['key'] for record in solver.get_trace()])
+        solver.clear()
+        self.assertEqual([], solver.get_trace())
+
+    def test_invalid(self):
+        self.assertRaises(exceptions.InvalidInputException, fixed_point.FixedPointSolver, acceleration='newton')
+        self.assertRaises(exceptions.InvalidInputException, fixed_point.FixedPointSolver, max_iterations=0)
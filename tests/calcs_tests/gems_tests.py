@@ -0,0 +1,93 @@
+import itertools
+import unittest
+from shadowcraft import calcs
+from shadowcraft.calcs import gems
+from calcs_tests import make_calculator, make_rogue_calculator
+
+class GemCalculator(calcs.DamageCalculator):
+    def get_dps(self):
+        dps = 2 * self.stats.agi + self.stats.haste + 300 * self.stats.gear_buffs.chaotic_metagem
+        dps += 100 * bool(self.stats.mh.dancing_steel) + 50 * bool(self.stats.oh.windsong)
+        if self.stats.mh.dancing_steel and self.stats.oh.dancing_steel:
+            dps += 70
+        return dps
+
+class TestGemOptimizer(unittest.TestCase):
+    def setUp(self):
+        self.calculator = make_calculator(GemCalculator, agi=1000, haste=1000)
+        self.items = {
+            'head': {'sockets': ['red', 'meta'], 'bonus_stat': 'agi', 'bonus_value': 60},
+            'chest': {'sockets': ['blue', 'yellow'], 'bonus_stat': 'haste', 'bonus_value': 120},
+            'neck': {'agi': 100}
+        }
+        self.gems = {
+            'Meta': (['meta'], {'agi': 100, 'gear_buff': ['chaotic_metagem']}),
+            'Red': (['red'], {'agi': 100}),
+            'Blue': (['blue'], {'haste': 150}),
+            'Purple': (['red', 'blue'], {'agi': 50, 'haste': 75}),
+            'Orange': (['red', 'yellow'], {'agi': 50, 'haste': 75})
+        }
+        self.requirements = {'Meta': {'blue': 2}}
+
+    def test_stats(self):
+        optimizer = gems.GemOptimizer(self.calculator, self.items, self.gems)
+        self.assertEqual({'agi': 360, 'haste': 150}, optimizer.get_stats({'head': ['Red', 'Meta'], 'chest': ['Blue', 'Red']}))
+        self.assertEqual({'agi': 150, 'haste': 345}, optimizer.get_stats({'head': ['Orange', None], 'chest': ['Purple', 'Orange']}))
+        self.assertRaises(gems.InvalidGemException, optimizer.get_stats, {'head': ['Meta', 'Red']})
+        self.assertRaises(gems.InvalidGemException, optimizer.get_stats, {'head': ['Red']})
+        self.assertRaises(gems.InvalidGemException, optimizer.get_stats, {'head': ['Fake', 'Meta']})
+
+    def test_requirements(self):
+        optimizer = gems.GemOptimizer(self.calculator, self.items, self.gems, self.requirements)
+        self.assertFalse(optimizer.is_active('Meta', {'head': ['Red', 'Meta'], 'chest': ['Blue', 'Red']}))
+        self.assertTrue(optimizer.is_active('Meta', {'head': ['Purple', 'Meta'], 'chest': ['Blue', 'Red']}))
+        for layout in optimizer.get_layouts():
+            if 'Meta' in layout['head']:
+                self.assertTrue(optimizer.is_active('Meta', layout))
+
+    def test_optimize(self):
+        optimizer = gems.GemOptimizer(self.calculator, self.items, self.gems, self.requirements, current_gems={'head': ['Red', 'Meta']})
+        self.calculator.stats.agi += 260
+        self.calculator.stats.gear_buffs.chaotic_metagem = True
+        baseline = self.calculator.get_dps()
+        dps, layout, enchants = optimizer.optimize()
+        self.assertEqual(('dancing_steel', 'dancing_steel'), enchants)
+        self.assertEqual(['head', 'chest'], sorted(layout, reverse=True))
+        self.assertEqual(baseline, self.calculator.get_dps())
+
+        # Nothing beats it.
+        sockets = [(slot, socket) for slot in optimizer.slots for socket in self.items[slot]['sockets']]
+        best = None
+        for choice in itertools.product(*[[None] + [gem for gem in sorted(self.gems) if gems.fits(self.gems[gem], socket)] for slot, socket in sockets]):
+            brute_layout = {}
+            for (slot, socket), gem in zip(sockets, choice):
+                brute_layout.setdefault(slot, []).append(gem)
+            best = max(best, self.calculator.evaluate(optimizer.get_delta(brute_layout, enchants)))
+        self.assertAlmostEqual(best, dps)
+
+    def test_pool(self):
+        optimizer = gems.GemOptimizer(self.calculator, self.items, self.gems, self.requirements)
+        self.assertEqual(optimizer.optimize(), gems.GemOptimizer(self.calculator, self.items, self.gems, self.requirements, workers=2).optimize())
+
+    def test_invalid_enchant(self):
+        self.assertRaises(gems.InvalidGemException, gems.GemOptimizer, self.calculator, self.items, self.gems, enchant_list=['fake_enchant'])
+
+    def test_real_model(self):
+        calculator = make_rogue_calculator()
+        baseline = calculator.get_dps()
+        items = {
+            'head': {'sockets': ['red', 'meta'], 'bonus_stat': 'agi', 'bonus_value': 60},
+            'chest': {'sockets': ['blue', 'yellow'], 'bonus_stat': 'haste', 'bonus_value': 120}
+        }
+        gem_list = {
+            'Meta': (['meta'], {'agi': 216, 'gear_buff': ['chaotic_metagem']}),
+            'Red': (['red'], {'agi': 160}),
+            'Blue': (['blue'], {'haste': 320}),
+            'Orange': (['red', 'yellow'], {'agi': 80, 'haste': 160})
+        }
+        optimizer = gems.GemOptimizer(calculator, items, gem_list)
+        dps, layout, enchants = optimizer.optimize()
+        self.assertTrue(dps > baseline)
+        self.assertAlmostEqual(calculator.evaluate(optimizer.get_delta(layout, enchants)), dps)
+        self.assertEqual('Meta', layout['head'][1])
+        self.assertEqual(baseline, calculator.get_dps())
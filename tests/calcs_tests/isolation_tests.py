@@ -0,0 +1,67 @@
+import threading
+import unittest
+from shadowcraft.calcs.rogue.Aldriana import settings
+from calcs_tests import make_rogue_calculator
+
+class TestIsolatedEvaluation(unittest.TestCase):
+    def setUp(self):
+        self.calculator = make_rogue_calculator(settings.AssassinationCycle())
+        self.agi = self.calculator.stats.agi
+
+    def assertUntouched(self):
+        self.assertEqual(self.agi, self.calculator.stats.agi)
+        self.assertFalse(hasattr(self.calculator.stats, 'agi_mod'))
+        self.assertFalse(self.calculator.isolated)
+
+    def test_repeated(self):
+        dps = self.calculator.get_dps()
+        self.assertEqual(dps, self.calculator.get_dps())
+        self.assertUntouched()
+
+    def test_nested(self):
+        copies = []
+        def inner(calculator):
+            copies.append(calculator)
+        def outer(calculator):
+            copies.append(calculator)
+            calculator.run_isolated(inner)
+            self.assertTrue(calculator.isolated)
+        self.calculator.run_isolated(outer)
+        self.assertTrue(copies[0] is copies[1])
+        self.assertFalse(copies[0] is self.calculator)
+        self.assertFalse(copies[0].stats is self.calculator.stats)
+        self.assertUntouched()
+
+    def test_threads(self):
+        dps = self.calculator.get_dps()
+        breakdown = self.calculator.get_dps_breakdown()
+        attributes = set(self.calculator.__dict__)
+        results = []
+        errors = []
+        def worker():
+            try:
+                for i in xrange(50):
+                    results.append((self.calculator.get_dps(), self.calculator.get_dps_breakdown()))
+            except Exception as e:
+                errors.append(e)
+        threads = [threading.Thread(target=worker) for i in xrange(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual([], errors)
+        self.assertEqual([(dps, breakdown)] * 200, results)
+        self.assertEqual(attributes, set(self.calculator.__dict__))
+        self.assertUntouched()
+
+    def test_phase_breakdowns(self):
+        dps = self.calculator.get_dps()
+        breakdown = self.calculator.get_dps_breakdown()
+        non_execute = self.calculator.assassination_dps_breakdown_non_execute()
+        execute = self.calculator.assassination_dps_breakdown_execute()
+        execute_weight = self.calculator.settings.time_in_execute_range
+        for source in breakdown:
+            self.assertAlmostEqual(breakdown[source], non_execute.get(source, 0) * (1 - execute_weight) + execute.get(source, 0) * execute_weight)
+        self.assertAlmostEqual(dps, sum(non_execute.values()) * (1 - execute_weight) + sum(execute.values()) * execute_weight)
+        self.assertEqual(non_execute, self.calculator.assassination_dps_breakdown_non_execute())
+        self.assertUntouched()
@@ -0,0 +1,87 @@
+import itertools
+import unittest
+from shadowcraft import calcs
+from shadowcraft.calcs import reforge
+from shadowcraft.calcs import what_if
+from calcs_tests import make_calculator, make_rogue_calculator
+
+class ReforgeCalculator(calcs.DamageCalculator):
+    hit_chance_bonus = 0
+
+    def get_dps(self):
+        dps = 100000 * self.one_hand_melee_hit_chance()
+        dps += 2 * self.stats.crit + self.stats.haste + 1.5 * self.stats.mastery
+        return dps
+
+class TestReforgeOptimizer(unittest.TestCase):
+    def setUp(self):
+        self.calculator = make_calculator(ReforgeCalculator, crit=3000, hit=2400, exp=2600, haste=4000, mastery=3000)
+        self.items = {
+            'head': {'agi': 1000, 'crit': 1000, 'haste': 600},
+            'chest': {'hit': 500, 'mastery': 800},
+            'legs': {'exp': 1000, 'haste': 700},
+            'neck': {'agi': 500}
+        }
+
+    def test_options(self):
+        options = reforge.get_reforge_options(reforge.get_item_stats(self.items['chest']))
+        self.assertEqual(6, len(options))
+        self.assertTrue(('hit', 'exp', 200) in options)
+        self.assertTrue(('mastery', 'crit', 320) in options)
+        self.assertEqual([], reforge.get_reforge_options(reforge.get_item_stats(self.items['neck'])))
+
+    def test_capped_value(self):
+        segments = [(100, 2.), (300, 1.)]
+        self.assertEqual(100, reforge.capped_value(50, segments))
+        self.assertEqual(300, reforge.capped_value(200, segments))
+        self.assertEqual(400, reforge.capped_value(1000, segments))
+
+    def test_caps(self):
+        caps = reforge.ReforgeOptimizer(self.calculator, self.items).get_caps()
+        self.assertAlmostEqual(2550, caps['yellow_hit'])
+        self.assertAlmostEqual(2550, caps['mh_dodge_exp'])
+
+    def test_optimize(self):
+        optimizer = reforge.ReforgeOptimizer(self.calculator, self.items)
+        baseline = self.calculator.get_dps()
+        dps, reforges = optimizer.optimize()
+        self.assertEqual(sorted(self.items), sorted(reforges))
+        self.assertEqual(None, reforges['neck'])
+        self.assertAlmostEqual(self.calculator.evaluate(what_if.Delta(stats=optimizer.get_stat_changes(reforges))), dps)
+        self.assertEqual(baseline, self.calculator.get_dps())
+
+        # Nothing beats it.
+        best = None
+        for choices in itertools.product(*[optimizer.options[slot] for slot in optimizer.slots]):
+            changes = optimizer.get_changes(dict(zip(optimizer.slots, choices)))
+            best = max(best, self.calculator.evaluate(what_if.Delta(stats=changes)))
+        self.assertAlmostEqual(best, dps)
+
+    def test_current_reforges(self):
+        current_reforges = {'chest': ('hit', 'crit')}
+        self.calculator.stats.hit -= 200
+        self.calculator.stats.crit += 200
+        optimizer = reforge.ReforgeOptimizer(self.calculator, self.items, current_reforges)
+        self.assertEqual(2400, optimizer.base_stats['hit'])
+        self.assertEqual(3000, optimizer.base_stats['crit'])
+
+    def test_invalid_reforge(self):
+        optimizer = reforge.ReforgeOptimizer(self.calculator, self.items)
+        self.assertRaises(reforge.InvalidReforgeException, optimizer.get_stat_changes, {'chest': ('crit', 'hit')})
+        self.assertRaises(reforge.InvalidReforgeException, optimizer.get_stat_changes, {'feet': ('crit', 'hit')})
+
+    def test_real_model(self):
+        calculator = make_rogue_calculator()
+        baseline = calculator.get_dps()
+        items = dict((slot, self.items[slot]) for slot in ('head', 'chest', 'legs'))
+        optimizer = reforge.ReforgeOptimizer(calculator, items)
+        dps, reforges = optimizer.optimize()
+        self.assertTrue(dps >= baseline)
+        self.assertAlmostEqual(calculator.evaluate(what_if.Delta(stats=optimizer.get_stat_changes(reforges))), dps)
+        # No single extra reforge improves on the result.
+        for slot in items:
+            for from_stat, to_stat, amount in reforge.get_reforge_options(reforge.get_item_stats(items[slot])):
+                other = dict(reforges)
+                other[slot] = (from_stat, to_stat)
+                self.assertTrue(calculator.evaluate(what_if.Delta(stats=optimizer.get_stat_changes(other))) <= dps + 1e-6)
+        self.assertEqual(baseline, calculator.get_dps())
@@ -0,0 +1,39 @@
+import unittest
+from shadowcraft.calcs.rogue import triggers
+from shadowcraft.objects import procs
+
+class TestTriggers(unittest.TestCase):
+    def setUp(self):
+        self.attacks_per_second = {
+            'mh_autoattacks': 1., 'mh_autoattack_hits': .8, 'oh_autoattacks': 2., 'oh_autoattack_hits': 1.5,
+            'mutilate': .3, 'envenom': [0, 0, 0, 0, .1, .2], 'rupture': .05, 'rupture_ticks': [0, 0, 0, 0, .1, .4]
+        }
+        self.crit_rates = {'mh_autoattacks': .5, 'oh_autoattacks': .25, 'mutilate': .5, 'envenom': .5, 'rupture': .5}
+        self.procs_list = procs.ProcsList('relic_of_xuen', 'corens_cold_chromium_coaster')
+
+    def test_crit_only(self):
+        proc = self.procs_list.relic_of_xuen
+        mh = triggers.triggers_per_second(triggers.get_weights(proc, 'mh'), self.attacks_per_second, self.crit_rates)
+        self.assertAlmostEqual(1. * .5 + .3 * .5 + .3 * .5, mh)
+        oh = triggers.triggers_per_second(triggers.get_weights(proc, 'oh'), self.attacks_per_second, self.crit_rates)
+        self.assertAlmostEqual(2. * .25 + .3 * .5, oh)
+        both = triggers.triggers_per_second(triggers.get_weights(proc, 'rppm_trinket'), self.attacks_per_second, self.crit_rates)
+        self.assertAlmostEqual(mh + oh, both)
+
+    def test_all_hits(self):
+        proc = self.procs_list.relic_of_xuen
+        proc.on_crit = False
+        mh = triggers.triggers_per_second(triggers.get_weights(proc, 'mh'), self.attacks_per_second, self.crit_rates)
+        self.assertAlmostEqual(.8 + .3 + .3 + .05, mh)
+
+    def test_bleeds(self):
+        proc = self.procs_list.corens_cold_chromium_coaster
+        proc.trigger = 'bleeds'
+        other = triggers.triggers_per_second(triggers.get_weights(proc, 'other'), self.attacks_per_second, self.crit_rates)
+        self.assertAlmostEqual(.5 * .5, other)
+        self.assertEqual((), triggers.get_weights(proc, 'mh'))
+
+    def test_compiled_once(self):
+        first = triggers.get_weights(self.procs_list.relic_of_xuen, 'mh')
+        second = procs.ProcsList('relic_of_xuen').relic_of_xuen
+        self.assertTrue(first is triggers.get_weights(second, 'mh'))
@@ -0,0 +1,118 @@
+import unittest
+from shadowcraft import calcs
+from shadowcraft.calcs.rogue.Aldriana import settings
+from shadowcraft.calcs.rogue.Aldriana import tuner
+from shadowcraft.core import exceptions
+from calcs_tests import make_calculator, make_rogue_calculator
+
+class CycleCalculator(calcs.DamageCalculator):
+    def get_dps(self):
+        cycle = self.settings.cycle
+        if self.settings.is_combat_rogue():
+            if cycle.revealing_strike_pooling and not cycle.use_rupture:
+                raise exceptions.InvalidInputException('not modeled')
+            return 1000. + 10 * cycle.use_rupture - 5 * cycle.ksp_immediately + 3 * cycle.stack_cds + cycle.bf_targets
+        if self.settings.is_subtlety_rogue():
+            if cycle.use_hemorrhage == 'always':
+                dps = 900.
+            elif cycle.use_hemorrhage == 'never':
+                dps = 950.
+            else:
+                dps = 1000. - (float(cycle.use_hemorrhage) - 7.3) ** 2
+            return dps + cycle.stack_cds
+        return 1000. + cycle.min_envenom_size_non_execute - cycle.min_envenom_size_execute
+
+class RejectingCalculator(CycleCalculator):
+    def get_dps(self):
+        raise exceptions.InvalidInputException('no combat')
+
+class BrokenCalculator(CycleCalculator):
+    def get_dps(self):
+        if self.settings.cycle.min_envenom_size_non_execute == 2:
+            return 1 / 0
+        return CycleCalculator.get_dps(self)
+
+class TestCycleTuner(unittest.TestCase):
+    def get_calculator(self, cycle):
+        return make_calculator(CycleCalculator, cycle)
+
+    def test_combat(self):
+        calculator = self.get_calculator(settings.CombatCycle(bf_targets=3))
+        cycle_tuner = tuner.CycleTuner(calculator)
+        dps, cycle = cycle_tuner.tune()
+        self.assertEqual(1016., dps)
+        self.assertTrue(cycle.use_rupture)
+        self.assertFalse(cycle.ksp_immediately)
+        self.assertTrue(cycle.stack_cds)
+        self.assertEqual(3, cycle.bf_targets)
+        self.assertEqual(16, len(cycle_tuner.evaluated))
+        self.assertEqual(4, len([1 for dps, cycle in cycle_tuner.evaluated.itervalues() if dps is None]))
+        self.assertTrue(calculator.settings.cycle.ksp_immediately)
+
+    def test_ties(self):
+        calculator = self.get_calculator(settings.AssassinationCycle(4, 4, False, True, True))
+        dps, cycle = tuner.CycleTuner(calculator).tune()
+        self.assertEqual(1004., dps)
+        self.assertEqual((5, 1), (cycle.min_envenom_size_non_execute, cycle.min_envenom_size_execute))
+        calculator = self.get_calculator(settings.AssassinationCycle(5, 1, False, True, False))
+        dps, cycle = tuner.CycleTuner(calculator).tune()
+        self.assertFalse(cycle.prioritize_rupture_uptime_non_execute)
+        self.assertFalse(cycle.stack_cds)
+
+    def test_hemorrhage_interval(self):
+        calculator = self.get_calculator(settings.SubtletyCycle(5))
+        cycle_tuner = tuner.CycleTuner(calculator, tolerance=.1)
+        dps, cycle = cycle_tuner.tune()
+        self.assertTrue(cycle.stack_cds)
+        self.assertAlmostEqual(7.3, float(cycle.use_hemorrhage), delta=.1)
+        self.assertEqual(5, cycle.raid_crits_per_second)
+        evaluated = len(cycle_tuner.evaluated)
+        cycle_tuner.tune()
+        self.assertEqual(evaluated, len(cycle_tuner.evaluated))
+
+    def test_pool(self):
+        calculator = self.get_calculator(settings.SubtletyCycle(5))
+        dps, cycle = tuner.CycleTuner(calculator).tune()
+        pooled_dps, pooled_cycle = tuner.CycleTuner(calculator, workers=2).tune()
+        self.assertEqual(dps, pooled_dps)
+        self.assertEqual(cycle.use_hemorrhage, pooled_cycle.use_hemorrhage)
+
+    def test_tune_cycles(self):
+        results = tuner.tune_cycles({'combat': self.get_calculator(settings.CombatCycle()), 'subtlety': self.get_calculator(settings.SubtletyCycle(5))})
+        self.assertEqual(['combat', 'subtlety'], sorted(results))
+        self.assertEqual(1014., results['combat'][0])
+
+    def test_invalid_bounds(self):
+        calculator = self.get_calculator(settings.SubtletyCycle(5))
+        self.assertRaises(exceptions.InvalidInputException, tuner.CycleTuner, calculator, hemorrhage_bounds=(0, 10))
+        self.assertRaises(exceptions.InvalidInputException, tuner.CycleTuner, calculator, hemorrhage_bounds=(400, 500))
+
+    def test_real_model(self):
+        for cycle in (settings.CombatCycle(False, False, False), settings.AssassinationCycle(5, 5, False, False, True)):
+            calculator = make_rogue_calculator(cycle)
+            baseline = calculator.get_dps()
+            dps, best_cycle = tuner.CycleTuner(calculator).tune()
+            self.assertTrue(dps >= baseline)
+            self.assertAlmostEqual(make_rogue_calculator(best_cycle).get_dps(), dps)
+            self.assertTrue(calculator.settings.cycle is cycle)
+            self.assertEqual(baseline, calculator.get_dps())
+
+    def test_rejections(self):
+        cycle_tuner = tuner.CycleTuner(self.get_calculator(settings.CombatCycle()))
+        cycle_tuner.tune()
+        self.assertEqual(4, len(cycle_tuner.errors))
+        for key, error in cycle_tuner.errors.iteritems():
+            dps, cycle = cycle_tuner.evaluated[key]
+            self.assertEqual(None, dps)
+            self.assertTrue(cycle.revealing_strike_pooling and not cycle.use_rupture)
+            self.assertEqual('not modeled', error)
+        cycle_tuner = tuner.CycleTuner(make_calculator(RejectingCalculator, settings.CombatCycle()))
+        self.assertRaises(exceptions.InvalidInputException, cycle_tuner.tune)
+        self.assertEqual(16, len(cycle_tuner.errors))
+        self.assertEqual(set(['no combat']), set(cycle_tuner.errors.values()))
+
+    def test_model_bugs(self):
+        # Anything but a rejection ends the search, with or without a pool.
+        for workers in (None, 2):
+            cycle_tuner = tuner.CycleTuner(make_calculator(BrokenCalculator, settings.AssassinationCycle()), workers=workers)
+            self.assertRaises(ZeroDivisionError, cycle_tuner.tune)
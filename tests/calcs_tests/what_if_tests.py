@@ -0,0 +1,107 @@
+import unittest
+from shadowcraft import calcs
+from shadowcraft.calcs import what_if
+from shadowcraft.objects import procs
+from calcs_tests import make_calculator, make_rogue_calculator
+
+class FlagCalculator(calcs.DamageCalculator):
+    def get_dps_breakdown(self):
+        if self.stats.agi < 0:
+            raise ValueError('negative agi')
+        breakdown = {'agi': self.stats.agi, 'crit': 2 * self.stats.crit}
+        breakdown['buffs'] = 100 * self.buffs.crit_chance_buff
+        breakdown['procs'] = sum([1000 * (1 + getattr(self.stats.procs, name).upgrade_level) for name in self.stats.procs.get_active_proc_names()])
+        breakdown['gear_buffs'] = 10000 * self.stats.gear_buffs.rogue_t16_2pc
+        breakdown['glyphs'] = 100000 * self.glyphs.vendetta
+        breakdown['weapon'] = self.stats.mh.weapon_dps + bool(self.stats.mh.dancing_steel)
+        breakdown['hit'] = [0, 7][self.calculating_ep == 'yellow_hit']
+        return breakdown
+
+    def get_dps(self):
+        return sum(self.get_dps_breakdown().values())
+
+class TestDelta(unittest.TestCase):
+    def test_key(self):
+        self.assertEqual(what_if.Delta(stats={'agi': 1.}, procs={'relic_of_xuen': 2}), what_if.Delta(procs={'relic_of_xuen': 2}, stats={'agi': 1.}))
+        self.assertEqual(1, len(set([what_if.Delta(weapons={'mh': {'speed': 2.6}}), what_if.Delta(weapons={'mh': {'speed': 2.6}})])))
+        self.assertNotEqual(what_if.Delta(stats={'agi': 1.}), what_if.Delta(stats={'agi': 2.}))
+        self.assertTrue(what_if.Delta().is_empty())
+
+    def test_merge(self):
+        delta = what_if.Delta(stats={'agi': 1.}, procs={'relic_of_xuen': False}).merge(what_if.Delta(stats={'agi': 2.}, procs={'relic_of_xuen': 1}))
+        self.assertEqual(what_if.Delta(stats={'agi': 3.}, procs={'relic_of_xuen': 1}), delta)
+
+    def test_invalid(self):
+        self.assertRaises(what_if.InvalidDeltaException, what_if.Delta, enchants={'ranged': None})
+        self.assertRaises(what_if.InvalidDeltaException, what_if.Delta, weapons={'mh': {'damage': 1}})
+        self.assertRaises(what_if.InvalidDeltaException, what_if.Delta, stats={'yellow_hit': 1, 'white_hit': 1})
+
+class TestEvaluate(unittest.TestCase):
+    def setUp(self):
+        self.calculator = make_calculator(FlagCalculator, procs_list=(('heroic_bad_juju', 1),), agi=100, crit=10)
+        self.baseline = self.calculator.get_dps()
+
+    def assertUntouched(self):
+        self.assertEqual(self.baseline, self.calculator.get_dps())
+        self.assertEqual(100, self.calculator.stats.agi)
+        self.assertEqual(['heroic_bad_juju'], self.calculator.stats.procs.get_active_proc_names())
+        self.assertEqual(1, self.calculator.stats.procs.heroic_bad_juju.upgrade_level)
+        self.assertFalse(self.calculator.calculating_ep)
+
+    def test_stats(self):
+        self.assertAlmostEqual(self.baseline + 1, self.calculator.evaluate(what_if.Delta(stats={'agi': 1.})))
+        self.assertAlmostEqual(self.baseline + 7, self.calculator.evaluate(what_if.Delta(stats={'yellow_hit': 1.})))
+        self.assertAlmostEqual(self.baseline, self.calculator.evaluate())
+        self.assertUntouched()
+
+    def test_procs_and_gear_buffs(self):
+        self.assertAlmostEqual(self.baseline - 2000, self.calculator.evaluate(what_if.Delta(procs={'heroic_bad_juju': False})))
+        self.assertAlmostEqual(self.baseline + 1000, self.calculator.evaluate(what_if.Delta(procs={'heroic_bad_juju': 2})))
+        self.assertAlmostEqual(self.baseline + 1000, self.calculator.evaluate(what_if.Delta(procs={'relic_of_xuen': 0})))
+        self.assertAlmostEqual(self.baseline + 10000, self.calculator.evaluate(what_if.Delta(gear_buffs={'rogue_t16_2pc': True})))
+        self.assertRaises(procs.InvalidProcException, self.calculator.evaluate, what_if.Delta(procs={'fake_proc': True}))
+        self.assertUntouched()
+
+    def test_flags_and_weapons(self):
+        self.assertAlmostEqual(self.baseline + 100, self.calculator.evaluate(what_if.Delta(buffs={'crit_chance_buff': True})))
+        self.assertAlmostEqual(self.baseline + 100000, self.calculator.evaluate(what_if.Delta(glyphs={'vendetta': True})))
+        self.assertAlmostEqual(self.baseline + 1, self.calculator.evaluate(what_if.Delta(enchants={'mh': 'dancing_steel'})))
+        self.assertAlmostEqual(self.baseline + 1, self.calculator.evaluate(what_if.Delta(weapons={'mh': {'weapon_dps': self.calculator.stats.mh.weapon_dps + 1}})))
+        self.assertRaises(what_if.InvalidDeltaException, self.calculator.evaluate, what_if.Delta(talents={'fake_talent': True}))
+        self.assertFalse(self.calculator.buffs.crit_chance_buff)
+        self.assertFalse(self.calculator.glyphs.vendetta)
+        self.assertFalse(self.calculator.stats.mh.dancing_steel)
+        self.assertUntouched()
+
+    def test_failed_evaluation(self):
+        self.assertRaises(ValueError, self.calculator.evaluate, what_if.Delta(stats={'agi': -1000.}, procs={'heroic_bad_juju': False}))
+        self.assertUntouched()
+
+    def test_breakdown(self):
+        breakdown = self.calculator.evaluate(what_if.Delta(stats={'crit': 1.}), breakdown=True)
+        self.assertEqual(22, breakdown['crit'])
+
+    def test_evaluate_deltas(self):
+        deltas = [what_if.Delta(stats={'agi': 1.}), None, what_if.Delta(stats={'agi': 1.}), what_if.Delta(glyphs={'vendetta': True})]
+        self.assertEqual([self.baseline + 1, self.baseline, self.baseline + 1, self.baseline + 100000], self.calculator.evaluate_deltas(deltas))
+        self.assertUntouched()
+
+    def test_upgrades_ep(self):
+        upgrades = self.calculator.get_upgrades_ep(['heroic_bad_juju', 'relic_of_xuen', 'fake_trinket'], normalize_ep_stat='agi')
+        self.assertEqual(u'not allowed', upgrades['fake_trinket'])
+        self.assertAlmostEqual(1000., upgrades['relic_of_xuen'][0])
+        self.assertAlmostEqual(1000., upgrades['heroic_bad_juju'][0])
+        self.assertEqual(upgrades, self.calculator.get_upgrades_ep(['heroic_bad_juju', 'relic_of_xuen', 'fake_trinket'], normalize_ep_stat='agi', workers=2))
+        self.assertUntouched()
+
+    def test_real_model(self):
+        calculator = make_rogue_calculator()
+        baseline = calculator.get_dps()
+        agi = calculator.stats.agi
+        self.assertAlmostEqual(make_rogue_calculator(agi=20631).get_dps(), calculator.evaluate(what_if.Delta(stats={'agi': 500.})))
+        self.assertAlmostEqual(make_rogue_calculator(procs_list=(('heroic_bad_juju', 0),)).get_dps(), calculator.evaluate(what_if.Delta(procs={'heroic_bad_juju': 0})))
+        self.assertAlmostEqual(make_rogue_calculator(glyphs_list=('recuperate', 'adrenaline_rush')).get_dps(), calculator.evaluate(what_if.Delta(glyphs={'adrenaline_rush': True})))
+        self.assertEqual(baseline, calculator.get_dps())
+        self.assertEqual(agi, calculator.stats.agi)
+        self.assertEqual([], calculator.stats.procs.get_active_proc_names())
+        self.assertFalse(calculator.glyphs.adrenaline_rush)
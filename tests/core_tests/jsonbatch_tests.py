@@ -0,0 +1,90 @@
+import copy
+import json
+import os
+import shutil
+import StringIO
+import tempfile
+import unittest
+from shadowcraft.core import jsonbatch
+from shadowcraft.core import jsoninput
+
+class TestJSONBatch(unittest.TestCase):
+    profile = {
+        'level': 90,
+        'stats': {
+            'agi': 20131, 'crit': 3278, 'hit': 2557, 'exp': 2549, 'haste': 13206, 'mastery': 6103,
+            'gear_buffs': ['leather_specialization'],
+            'procs': [],
+            'mh': {'type': 'fist', 'speed': 2.6, 'damage': 10478.5, 'enchant': 'dancing_steel'},
+            'oh': {'type': 'fist', 'speed': 2.6, 'damage': 10478.5, 'enchant': 'dancing_steel'}
+        },
+        'buffs': ['stat_multiplier_buff', 'crit_chance_buff', 'attack_power_buff', 'agi_flask_mop'],
+        'settings': {'type': 'combat', 'cycle': {'stack_cds': True}, 'duration': 360},
+        'talents': '322213',
+        'race': 'pandaren',
+        'glyphs': []
+    }
+
+    def get_lines(self):
+        combat = dict(self.profile, id='combat')
+        haste = copy.deepcopy(combat)
+        haste['id'] = 'haste'
+        haste['stats']['haste'] += 1000
+        # Fist weapons can't be modeled for assassination.
+        assassination = copy.deepcopy(combat)
+        assassination['id'] = 'assassination'
+        assassination['settings'] = {'type': 'assassination'}
+        missing = dict(combat)
+        del missing['race']
+        level = dict(combat, level='abc')
+        envenom = dict(combat, settings={'type': 'assassination', 'cycle': {'min_envenom_size_non_execute': 9}})
+        # Gets past the input checks and crashes the model.
+        crash = copy.deepcopy(combat)
+        crash['id'] = 'crash'
+        crash['settings']['duration'] = 0
+        return [json.dumps(combat), '', json.dumps(crash), json.dumps(haste), '{"level": ', json.dumps(assassination), json.dumps(level), json.dumps(envenom), json.dumps(missing)]
+
+    def run_batch(self, **options):
+        output = StringIO.StringIO()
+        counts = jsonbatch.evaluate_stream(StringIO.StringIO('\n'.join(self.get_lines()) + '\n'), output, **options)
+        return counts, [json.loads(line) for line in output.getvalue().splitlines()]
+
+    def test_records(self):
+        self.assertEqual([(0, 'a'), (1, 'b')], list(jsonbatch.read_records(iter(['a\n', '  \n', 'b']))))
+
+    def test_stream(self):
+        counts, records = self.run_batch()
+        self.assertEqual((8, 6), counts)
+        self.assertEqual(range(8), [record['index'] for record in records])
+        self.assertEqual(['combat', 'crash', 'haste', None, 'assassination', 'combat', 'combat', 'combat'], [record['id'] for record in records])
+        self.assertAlmostEqual(jsoninput.from_json(json.dumps(self.profile)).get_dps(), records[0]['results']['dps'])
+        self.assertEqual('ZeroDivisionError', records[1]['error_type'])
+        self.assertTrue(records[2]['results']['dps'] > records[0]['results']['dps'])
+        self.assertEqual('InvalidJSONException', records[3]['error_type'])
+        self.assertEqual('InputNotModeledException', records[4]['error_type'])
+        for record in records[5:]:
+            self.assertEqual('InvalidJSONException', record['error_type'])
+
+    def test_pool(self):
+        counts, records = self.run_batch()
+        self.assertEqual((counts, records), self.run_batch(workers=2, max_in_flight=2))
+        unordered_counts, unordered = self.run_batch(workers=2, max_in_flight=1, ordered=False)
+        self.assertEqual(counts, unordered_counts)
+        self.assertEqual(records, sorted(unordered, key=lambda record: record['index']))
+
+    def test_cache(self):
+        directory = tempfile.mkdtemp()
+        try:
+            path = os.path.join(directory, 'results.db')
+            counts, records = self.run_batch(kinds=('dps', 'ep'), cache_path=path)
+            self.assertEqual(4, len(jsonbatch.get_cache(path)))
+            self.assertEqual((counts, records), self.run_batch(kinds=('dps', 'ep'), cache_path=path))
+            self.assertEqual(4, jsonbatch.get_cache(path).get_counters()['hits'])
+            jsonbatch.get_cache(path).close()
+            del jsonbatch._caches[path]
+        finally:
+            shutil.rmtree(directory)
+
+    def test_exceptions(self):
+        self.assertRaises(jsonbatch.InvalidBatchException, self.run_batch, kinds=('fake',))
+        self.assertRaises(jsonbatch.InvalidBatchException, self.run_batch, max_in_flight=0)
@@ -0,0 +1,152 @@
+import os
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+from shadowcraft.core import exceptions
+from shadowcraft.core import persistent_cache
+
+class FakeCalculator(object):
+    calls = 0
+
+    def __init__(self, json_string):
+        FakeCalculator.calls += 1
+
+    def get_dps(self):
+        return 1234.5
+
+    def get_ep(self, ep_stats=None):
+        return dict((stat, 1.5) for stat in ep_stats or ['agi'])
+
+class TestPersistentCache(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'results.db')
+        self.cache = persistent_cache.PersistentCache(self.path, version='test')
+
+    def tearDown(self):
+        self.cache.close()
+        shutil.rmtree(self.directory)
+
+    def test_round_trip(self):
+        self.assertEqual(None, self.cache.get('{"level": 90}', 'ep'))
+        self.cache.put('{"level": 90, "race": "human"}', 'ep', {'agi': 1., 'hit': (1, 2)})
+        self.assertEqual({'agi': 1., 'hit': [1, 2]}, self.cache.get('{ "race": "human",  "level": 90}', 'ep'))
+        self.assertEqual(None, self.cache.get('{"level": 90, "race": "human"}', 'ep', ['agi']))
+        self.assertEqual(None, self.cache.get('{"level": 90, "race": "orc"}', 'ep'))
+        counters = self.cache.get_counters()
+        self.assertEqual(1, counters['hits'])
+        self.assertEqual(3, counters['misses'])
+        self.assertEqual(1, counters['entries'])
+
+    def test_persistence(self):
+        self.cache.put('{}', 'dps', 1000.25)
+        self.assertEqual(1000.25, persistent_cache.PersistentCache(self.path, version='test').get('{}', 'dps'))
+        self.assertEqual(None, persistent_cache.PersistentCache(self.path, version='other').get('{}', 'dps'))
+        self.assertEqual(0, len(self.cache))
+
+    def test_eviction(self):
+        cache = persistent_cache.PersistentCache(self.path, max_bytes=15, version='test')
+        cache.put('{"a": 1}', 'dps', 1000.)
+        time.sleep(.01)
+        cache.put('{"b": 1}', 'dps', 2000.)
+        time.sleep(.01)
+        cache.get('{"a": 1}', 'dps')
+        time.sleep(.01)
+        cache.put('{"c": 1}', 'dps', 3000.)
+        self.assertEqual(1000., cache.get('{"a": 1}', 'dps'))
+        self.assertEqual(None, cache.get('{"b": 1}', 'dps'))
+        self.assertEqual(1, cache.get_counters()['evictions'])
+        self.assertTrue(cache.get_counters()['bytes'] <= 15)
+        cache.close()
+
+    def get_size(self):
+        return self.cache.get_connection().execute('SELECT COALESCE(SUM(size), 0) FROM results').fetchone()[0]
+
+    def test_buffered_access(self):
+        self.cache.put('{"a": 1}', 'dps', 1000.)
+        connection = self.cache.get_connection()
+        accessed = connection.execute('SELECT accessed FROM results').fetchone()[0]
+        time.sleep(.01)
+        # A hit holding another connection's write lock still goes through.
+        other = persistent_cache.PersistentCache(self.path, version='test', timeout=0.)
+        self.cache.begin(connection)
+        try:
+            self.assertEqual(1000., other.get('{"a": 1}', 'dps'))
+        finally:
+            connection.execute('COMMIT')
+        self.assertEqual(accessed, connection.execute('SELECT accessed FROM results').fetchone()[0])
+        other.close()
+        self.assertTrue(connection.execute('SELECT accessed FROM results').fetchone()[0] > accessed)
+
+    def test_size_total(self):
+        cache = persistent_cache.PersistentCache(self.path, max_bytes=40, version='test')
+        for i in xrange(10):
+            cache.put('{"a": %d}' % (i % 4), 'dps', 10. ** i)
+            self.assertEqual(self.get_size(), cache.get_counters()['bytes'])
+        self.assertTrue(cache.get_counters()['evictions'] > 0)
+        self.assertEqual(self.get_size(), persistent_cache.PersistentCache(self.path, version='test').get_counters()['bytes'])
+        cache.clear()
+        self.assertEqual(0, cache.get_counters()['bytes'])
+        cache.put('{}', 'dps', 1.)
+        self.assertEqual(0, persistent_cache.PersistentCache(self.path, version='other').get_counters()['bytes'])
+        cache.close()
+
+    def test_size_drift(self):
+        cache = persistent_cache.PersistentCache(self.path, max_bytes=40, version='test')
+        cache.put('{"a": 1}', 'dps', 1.)
+        connection = cache.get_connection()
+        cache.set_total(connection, 1000)
+        cache.put('{"a": 2}', 'dps', 2.)
+        self.assertEqual(self.get_size(), cache.get_counters()['bytes'])
+        self.assertEqual(0, cache.get_counters()['bytes'])
+        cache.put('{"a": 3}', 'dps', 3.)
+        self.assertEqual(1, len(cache))
+        self.assertEqual(self.get_size(), cache.get_counters()['bytes'])
+        cache.close()
+
+    def test_get_result(self):
+        FakeCalculator.calls = 0
+        self.assertEqual(1234.5, self.cache.get_result('{}', 'dps', FakeCalculator))
+        self.assertEqual(1234.5, self.cache.get_result('{}', 'dps', FakeCalculator))
+        self.assertEqual({'haste': 1.5}, self.cache.get_result('{}', 'ep', FakeCalculator, [['haste']]))
+        self.assertEqual(2, FakeCalculator.calls)
+        self.assertRaises(persistent_cache.InvalidCacheInputException, self.cache.get_result, '{}', 'fake', FakeCalculator)
+        self.assertRaises(persistent_cache.InvalidCacheInputException, self.cache.get, '{', 'dps')
+
+    def test_threads(self):
+        errors = []
+        def worker(i):
+            try:
+                for j in xrange(20):
+                    self.cache.put('{"i": %d, "j": %d}' % (i, j), 'dps', float(j))
+                    self.cache.get('{"i": %d, "j": %d}' % (i, j), 'dps')
+                self.cache.close()
+            except Exception as e:
+                errors.append(e)
+        threads = [threading.Thread(target=worker, args=(i,)) for i in xrange(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual([], errors)
+        self.assertEqual(80, len(self.cache))
+
+    def test_source_version(self):
+        source_directory = os.path.join(self.directory, 'calcs')
+        os.makedirs(os.path.join(source_directory, 'rogue'))
+        source_path = os.path.join(source_directory, 'rogue', 'model.py')
+        open(source_path, 'w').write('a = 1\n')
+        version = persistent_cache.get_source_version([source_directory])
+        self.assertEqual(version, persistent_cache.get_source_version([source_directory]))
+        open(os.path.join(source_directory, 'rogue', 'model.pyc'), 'w').write('compiled')
+        self.assertEqual(version, persistent_cache.get_source_version([source_directory]))
+        open(source_path, 'w').write('a = 2\n')
+        self.assertNotEqual(version, persistent_cache.get_source_version([source_directory]))
+        default = persistent_cache.get_source_version()
+        self.assertEqual(40, len(default))
+        self.assertTrue(persistent_cache.PersistentCache(self.path).version.endswith(default))
+
+    def test_exceptions(self):
+        self.assertRaises(exceptions.InvalidInputException, persistent_cache.PersistentCache, self.path, max_bytes=0)
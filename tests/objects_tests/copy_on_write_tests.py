@@ -0,0 +1,57 @@
+import pickle
+import unittest
+from shadowcraft.objects import copy_on_write
+from shadowcraft.objects import proc_data
+from shadowcraft.objects import procs
+from shadowcraft.objects import stats
+
+class TestCopyOnWriteTable(unittest.TestCase):
+    def setUp(self):
+        self.shared = {'a': {'value': 1}, 'b': {'value': 2}}
+        self.table = copy_on_write.CopyOnWriteTable(self.shared)
+
+    def test_writable(self):
+        self.table.writable('a')['value'] = 10
+        self.assertEqual(10, self.table['a']['value'])
+        self.assertEqual(1, self.shared['a']['value'])
+        self.assertEqual(2, self.table['b']['value'])
+        self.assertEqual(['a', 'b'], sorted(self.table))
+
+    def test_copy(self):
+        self.table.writable('a')['value'] = 10
+        view = self.table.copy()
+        view.writable('a')['value'] = 20
+        self.assertEqual(10, self.table['a']['value'])
+        self.assertEqual(20, view['a']['value'])
+
+    def test_pickle(self):
+        table = copy_on_write.CopyOnWriteTable(proc_data.allowed_procs, ('shadowcraft.objects.proc_data', 'allowed_procs'))
+        table.writable('relic_of_xuen')['upgrade_level'] = 2
+        table = pickle.loads(pickle.dumps(table, 2))
+        self.assertTrue(table.shared is proc_data.allowed_procs)
+        self.assertEqual(2, table['relic_of_xuen']['upgrade_level'])
+
+
+class TestDataIsolation(unittest.TestCase):
+    def test_procs_list(self):
+        first = procs.ProcsList(('relic_of_xuen', 1))
+        second = procs.ProcsList(('relic_of_xuen', 2))
+        first.set_proc('relic_of_xuen')
+        self.assertEqual(1, first.relic_of_xuen.upgrade_level)
+        self.assertEqual(2, second.relic_of_xuen.upgrade_level)
+        self.assertFalse('upgrade_level' in proc_data.allowed_procs['relic_of_xuen'])
+
+    def test_swordguard_embroidery(self):
+        first = procs.ProcsList('swordguard_embroidery')
+        second = procs.ProcsList('swordguard_embroidery')
+        first.level = 85
+        second.level = 90
+        self.assertEqual(1000, first.allowed_procs['swordguard_embroidery']['value'])
+        self.assertEqual(4000, second.allowed_procs['swordguard_embroidery']['value'])
+
+    def test_gear_buffs(self):
+        first = stats.GearBuffs(('jade_bandit_figurine', 1))
+        second = stats.GearBuffs(('jade_bandit_figurine', 2))
+        self.assertEqual(1, first.activated_boosts['jade_bandit_figurine']['upgrade_level'])
+        self.assertEqual(2, second.activated_boosts['jade_bandit_figurine']['upgrade_level'])
+        self.assertFalse('upgrade_level' in stats.GearBuffs.activated_boosts['jade_bandit_figurine'])
@@ -0,0 +1,59 @@
+import copy
+import pickle
+import unittest
+from shadowcraft.objects import buffs
+from shadowcraft.objects import glyphs
+from shadowcraft.objects import stats
+from shadowcraft.objects import talents
+
+class TestFlagSet(unittest.TestCase):
+    def setUp(self):
+        self.buffs = buffs.Buffs('crit_chance_buff', 'mastery_buff', level=90)
+
+    def test_flags(self):
+        self.assertTrue(self.buffs.crit_chance_buff is True)
+        self.assertTrue(self.buffs.armor_debuff is False)
+        self.buffs.armor_debuff = True
+        self.assertTrue(self.buffs.armor_debuff)
+        self.buffs.armor_debuff = False
+        self.assertFalse(self.buffs.armor_debuff)
+        del self.buffs.crit_chance_buff
+        self.assertFalse(self.buffs.crit_chance_buff)
+        self.assertRaises(AttributeError, getattr, self.buffs, 'fake_buff')
+        self.assertRaises(AttributeError, setattr, self.buffs, 'fake_buff', True)
+
+    def test_active_flags(self):
+        self.assertEqual(('crit_chance_buff', 'mastery_buff'), self.buffs.get_active_flags())
+        self.assertTrue(self.buffs.has_flag('mastery_buff'))
+        self.assertFalse(self.buffs.has_flag('armor_debuff'))
+        self.assertFalse(self.buffs.has_flag('fake_buff'))
+        self.assertEqual(self.buffs.flags, buffs.Buffs('mastery_buff', 'crit_chance_buff', level=90).flags)
+
+    def test_copy(self):
+        buffs_copy = copy.copy(self.buffs)
+        buffs_copy.armor_debuff = True
+        self.assertFalse(self.buffs.armor_debuff)
+        self.assertEqual(self.buffs.mast_buff_bonus, buffs_copy.mast_buff_bonus)
+
+    def test_pickle(self):
+        for protocol in (0, 2):
+            buffs_copy = pickle.loads(pickle.dumps(self.buffs, protocol))
+            self.assertEqual(self.buffs.get_active_flags(), buffs_copy.get_active_flags())
+            self.assertEqual(90, buffs_copy.level)
+
+    def test_talents_and_glyphs(self):
+        test_talents = talents.Talents('322213', 'rogue', 90)
+        self.assertTrue(test_talents.anticipation)
+        self.assertFalse(test_talents.shuriken_toss)
+        test_talents = pickle.loads(pickle.dumps(test_talents, 2))
+        self.assertEqual(sorted(test_talents.get_active_talents()), list(test_talents.get_active_flags()))
+        test_glyphs = glyphs.Glyphs('rogue', 'vendetta')
+        self.assertTrue(test_glyphs.vendetta)
+        self.assertFalse(test_glyphs.feint)
+
+    def test_gear_buffs(self):
+        gear_buffs = stats.GearBuffs('chaotic_metagem', ('jade_bandit_figurine', 2))
+        gear_buffs_copy = gear_buffs.evaluation_copy()
+        self.assertTrue(gear_buffs_copy.chaotic_metagem)
+        self.assertEqual(2, gear_buffs_copy.activated_boosts['jade_bandit_figurine']['upgrade_level'])
+        self.assertFalse(gear_buffs_copy.activated_boosts is gear_buffs.activated_boosts)
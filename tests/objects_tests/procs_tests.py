@@ -26,6 +26,37 @@ class TestProcsList(unittest.TestCase):
         self.assertEqual(len(self.procsList.get_all_damage_procs()), 0)
 
 
+class TestActiveProcIndex(unittest.TestCase):
+    def setUp(self):
+        self.procsList = procs.ProcsList('relic_of_xuen', 'corens_cold_chromium_coaster')
+
+    def scan(self, procs_list):
+        return [name for name in procs_list.allowed_procs if getattr(procs_list, name)]
+
+    def test_order(self):
+        self.assertEqual(self.scan(self.procsList), self.procsList.get_active_proc_names())
+
+    def test_set_and_remove(self):
+        self.procsList.set_proc('searing_words')
+        self.assertEqual(self.scan(self.procsList), self.procsList.get_active_proc_names())
+        delattr(self.procsList, 'relic_of_xuen')
+        self.procsList.corens_cold_chromium_coaster = False
+        self.assertEqual(['searing_words'], self.procsList.get_active_proc_names())
+        self.assertEqual(1, len(self.procsList.get_all_procs_for_stat()))
+
+    def test_stat_lookup(self):
+        proc = self.procsList.relic_of_xuen
+        self.assertTrue(proc in self.procsList.get_all_procs_for_stat(proc.stat))
+        proc.stat = 'haste'
+        self.assertTrue(proc in self.procsList.get_all_procs_for_stat('haste'))
+
+    def test_evaluation_copy(self):
+        procs_list = self.procsList.evaluation_copy()
+        delattr(procs_list, 'relic_of_xuen')
+        self.assertEqual(2, len(self.procsList.get_active_proc_names()))
+        self.assertEqual(['corens_cold_chromium_coaster'], procs_list.get_active_proc_names())
+
+
 class TestProc(unittest.TestCase):
     def setUp(self):
         self.proc = procs.Proc(**procs.ProcsList.allowed_procs['prestors_talisman_of_machination'])
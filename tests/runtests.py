@@ -6,13 +6,30 @@ sys.path.append(path.abspath(path.join(path.dirname(__file__), '..')))
 
 from calcs_tests import TestDamageCalculator
 from calcs_tests.armor_mitigation_tests import TestArmorMitigation
+from calcs_tests.builds_tests import TestBuildOptimizer
+from calcs_tests.cache_tests import TestResultCache, TestFingerprintHelpers, TestCachedResults
+from calcs_tests.combo_points_tests import TestComboPoints
+from calcs_tests.constants_tests import TestConstantsTable, TestLevelConstants
+from calcs_tests.dual_tests import TestDual
+from calcs_tests.ep_tests import TestEP
+from calcs_tests.fixed_point_tests import TestFixedPointSolver
+from calcs_tests.gems_tests import TestGemOptimizer
+from calcs_tests.isolation_tests import TestIsolatedEvaluation
+from calcs_tests.reforge_tests import TestReforgeOptimizer
+from calcs_tests.triggers_tests import TestTriggers
+from calcs_tests.tuner_tests import TestCycleTuner
+from calcs_tests.what_if_tests import TestDelta, TestEvaluate
 from calcs_tests.rogue_tests import TestRogueDamageCalculator
 from calcs_tests.rogue_tests import TestRogueDamageCalculatorLevels
 from calcs_tests.rogue_tests.Aldriana_tests import TestAldrianasRogueDamageCalculator
 from core_tests.exceptions_tests import TestInvalidInputException
+from core_tests.jsonbatch_tests import TestJSONBatch
+from core_tests.persistent_cache_tests import TestPersistentCache
 from objects_tests.buffs_tests import TestBuffsTrue, TestBuffsFalse, TestBuffsLevel
 from objects_tests.stats_tests import TestStats, TestWeapon, TestGearBuffs
-from objects_tests.procs_tests import TestProcsList, TestProc
+from objects_tests.copy_on_write_tests import TestCopyOnWriteTable, TestDataIsolation
+from objects_tests.flags_tests import TestFlagSet
+from objects_tests.procs_tests import TestProcsList, TestActiveProcIndex, TestProc
 from objects_tests.race_tests import TestRace
 from objects_tests.rogue_tests.rogue_glyphs_tests import TestRogueGlyphs
 from objects_tests.rogue_tests.rogue_talents_tests import TestAssassinationTalents